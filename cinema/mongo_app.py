@@ -1,12 +1,43 @@
 # mongo_app.py
 
+import atexit
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from flask_cors import CORS
 from routes.customer import customer_bp
 from routes.staff import staff_bp
 from db import db
 from services.logging_service import init_logging_service
+from services.hall_layout_cache import init_hall_layout_cache
+from services.seat_occupancy import init_seat_occupancy_store
+from services.seat_events import init_seat_event_broker
+from services.seat_lock_service import expire_seat_locks, SEAT_LOCK_SWEEP_SECONDS
+from services.background_jobs import start_background_job
+from services.idempotency_service import init_idempotency_store
+from services.index_service import bootstrap_indexes
+from services.catalog_cache import init_catalog_cache
+from services.movie_search import init_movie_search_index
+from services.recommendation_service import build_recommendations, RECOMMENDATION_REFRESH_SECONDS
+from services.view_counter import init_view_counter, VIEW_FLUSH_SECONDS
 init_logging_service(db)
+bootstrap_indexes(db)
+init_idempotency_store(db)
+hall_layout_cache = init_hall_layout_cache(db)
+seat_event_broker = init_seat_event_broker()
+init_seat_occupancy_store(db, hall_layout_cache, event_broker=seat_event_broker)
+init_catalog_cache()
+init_movie_search_index(db)
+
+# Seat lock hết hạn: lockedSeats do TTL index xóa, seatlocks do job này cập nhật
+start_background_job("seat-lock-sweeper", SEAT_LOCK_SWEEP_SECONDS, lambda: expire_seat_locks(db))
+
+# Model gợi ý phim/suất chiếu dựng lại định kỳ, lần đầu ngay khi khởi động
+start_background_job("recommendation-builder", RECOMMENDATION_REFRESH_SECONDS,
+                     lambda: build_recommendations(db), run_immediately=True)
+
+# Lượt xem phim: gom trong bộ nhớ, ghi $inc theo lô; flush lần cuối khi tắt app
+view_counter = init_view_counter(db)
+start_background_job("movie-view-flush", VIEW_FLUSH_SECONDS, view_counter.flush)
+atexit.register(view_counter.flush)
 
 # 🧠 Tạo Flask app
 app = Flask(__name__)
@@ -6,6 +6,8 @@ Admin Routes for Cinema Management System
 from flask import Blueprint, request, jsonify, render_template
 from services.auth_service import require_auth
 from services.logging_service import get_logging_service
+from services.catalog_cache import CatalogCache
+from services.pagination import fetch_keyset_page, InvalidCursorError
 from datetime import datetime, timedelta
 from bson import ObjectId
 import traceback
@@ -14,14 +16,23 @@ import json
 
 admin_bp = Blueprint('admin', __name__)
 
+# Tổng số user theo filter, xóa khi thêm/sửa/xóa user (cùng cơ chế LRU + TTL với catalog cache)
+user_count_cache = CatalogCache(max_entries=128, ttl_seconds=60)
+
 # User Management Endpoints
 @admin_bp.route('/api/users', methods=['GET'])
 @require_auth('admin')
 def get_users(payload):
-    """Get users with pagination and filters"""
+    """
+    Get users with pagination and filters
+
+    ?page= (không có cursor): skip/limit theo thứ tự tự nhiên như trước, next_cursor là null.
+    Không có ?page=, hoặc có ?cursor=: keyset theo _id mới nhất trước, trang sau dùng next_cursor
+    """
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 10))
+        cursor = request.args.get('cursor')
         role = request.args.get('role')
         status = request.args.get('status')
         name = request.args.get('name')
@@ -38,12 +49,19 @@ def get_users(payload):
                 {'email': {'$regex': name, '$options': 'i'}}
             ]
         
-        # Get total count
-        total = db.users.count_documents(query)
+        # Get total count (cache theo filter)
+        total = user_count_cache.get_or_load(
+            json.dumps(query, sort_keys=True),
+            lambda: db.users.count_documents(query)
+        )
         
-        # Get users with pagination
-        skip = (page - 1) * page_size
-        users = list(db.users.find(query).skip(skip).limit(page_size))
+        if 'page' in request.args and not cursor:
+            # Client cũ (admin.html) phân trang bằng ?page=: giữ thứ tự tự nhiên như trước
+            users = list(db.users.find(query).skip((page - 1) * page_size).limit(page_size))
+            next_cursor = None
+        else:
+            # Keyset theo _id (mới nhất trước), trang đầu không gửi page/cursor
+            users, next_cursor = fetch_keyset_page(db.users, query, '_id', page_size, cursor=cursor)
         
         # Convert ObjectId to string
         for user in users:
@@ -63,9 +81,12 @@ def get_users(payload):
             'users': users,
             'page': page,
             'page_size': page_size,
-            'total': total
+            'total': total,
+            'next_cursor': next_cursor
         })
         
+    except InvalidCursorError:
+        return jsonify({"error": "Invalid cursor"}), 400
     except Exception as e:
         print(f"❌ Error getting users: {e}")
         return jsonify({"error": str(e)}), 500
@@ -102,6 +123,7 @@ def create_user(payload):
             user['password_hash'] = data['password']  # Lưu plain text
         
         result = db.users.insert_one(user)
+        user_count_cache.invalidate()
         user['_id'] = str(result.inserted_id)
         
         return jsonify({
@@ -149,6 +171,7 @@ def update_user(payload, user_id):
         
         if result.modified_count == 0:
             return jsonify({"error": "User not found"}), 404
+        user_count_cache.invalidate()
         
         return jsonify({
             'message': 'User updated successfully'
@@ -167,6 +190,7 @@ def delete_user(payload, user_id):
         
         if result.deleted_count == 0:
             return jsonify({"error": "User not found"}), 404
+        user_count_cache.invalidate()
         
         return jsonify({
             'message': 'User deleted successfully'
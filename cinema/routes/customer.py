@@ -1,14 +1,52 @@
 # 📁 routes/customer.py
-from flask import Blueprint, request, jsonify, render_template
-from services.auth_service import verify_password, generate_token, require_auth
+from flask import Blueprint, request, jsonify, render_template, Response, stream_with_context
+from services.auth_service import verify_password, generate_token, require_auth, optional_customer_id
+from services.seat_map_service import get_showtime_hall_id, showtime_id_candidates
+from services.hall_layout_cache import get_hall_layout_cache
+from services.seat_occupancy import get_seat_occupancy_store, AVAILABLE, PENDING, PAID
+from services.seat_events import get_seat_event_broker
+from services.ticket_service import build_tickets, format_tickets
+from services.idempotency_service import idempotent
+from services.pagination import parse_limit, encode_cursor, keyset_filter, keyset_sort, fetch_keyset_page, InvalidCursorError
+from services.ticket_view_service import (
+    build_ticket_view, write_ticket_view, load_movie_for_showtime,
+    mark_ticket_views_cancelled, repair_customer_ticket_views
+)
+from services.booking_service import commit_paid_booking, find_seat_conflicts, BookingConflictError
+from services.dashboard_counters import record_paid_booking
+from services.catalog_cache import cached_catalog
+from services.movie_search import get_movie_search_index, fold_text
+from services.recommendation_service import get_recommendations, TOP_N as RECOMMENDATION_TOP_N
+from services.view_counter import get_view_counter
+from services.seat_lock_service import acquire_seat_locks, release_seat_locks, expire_seat_locks, SEAT_LOCK_MINUTES
 from db import db
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
 import bcrypt
+import json
 
 
 customer_bp = Blueprint("customer", __name__)
 
+# Phân trang /api/my-tickets (theo booking)
+MY_TICKETS_PAGE_SIZE = 50
+MY_TICKETS_MAX_PAGE_SIZE = 100
+MY_TICKETS_BOOKING_FIELDS = ("cinema", "movie_title", "movie_poster", "hall", "date", "time", "total_amount")
+
+# ?sort= của /api/movies: (field, giảm dần), mặc định theo _id
+MOVIE_SORT_FIELDS = {
+    "views": ("views", True),
+    "rating": ("rating", True),
+    "release_date": ("release_date", True)
+}
+
+# ?status= của tìm kiếm phim, dữ liệu có cả hai cách ghi status
+MOVIE_STATUS_GROUPS = {
+    "showing": ["showing", "Active"],
+    "coming_soon": ["coming_soon", "Coming Soon"],
+    "Coming Soon": ["coming_soon", "Coming Soon"]
+}
+
 # 1. Register
 @customer_bp.route("/api/register", methods=["POST"])
 def register():
@@ -163,69 +201,79 @@ def get_movies():
     if not status:
         filter_query = {}
     
-    movies = []
-    if db is not None:
-        # Apply sorting
-        sort_query = []
-        if sort == "views":
-            sort_query.append(("views", -1))
-        elif sort == "rating":
-            sort_query.append(("rating", -1))
-        elif sort == "release_date":
-            sort_query.append(("release_date", -1))
-        
-        # Get total count for pagination
-        total_movies = db.movies.count_documents(filter_query)
-        total_pages = (total_movies + limit - 1) // limit
-        
-        # Get movies with pagination
-        cursor = db.movies.find(filter_query)
-        if sort_query:
-            cursor = cursor.sort(sort_query)
-        cursor = cursor.skip((page - 1) * limit).limit(limit)
-        
-        movies = list(cursor)
-        for m in movies:
-            m["_id"] = str(m["_id"])
+    cursor = request.args.get('cursor')
     
-    # Return with pagination info
-    return jsonify({
-        "movies": movies,
-        "page": page,
-        "totalPages": total_pages,
-        "totalMovies": total_movies
-    }), 200
+    # Sort field + _id làm tie-breaker cho keyset pagination
+    sort_field, descending = MOVIE_SORT_FIELDS.get(sort, ("_id", False))
+    # ?page= không có sort/cursor: thứ tự tự nhiên như trước (giống admin get_users), nextCursor là null
+    legacy_order = sort not in MOVIE_SORT_FIELDS and 'page' in request.args and not cursor
+    
+    def load_movies():
+        movies = []
+        total_movies = 0
+        next_cursor = None
+        if db is not None:
+            # Tổng số phim cache riêng theo filter, dùng chung cho mọi trang
+            total_movies = cached_catalog(
+                ("movies-count", json.dumps(filter_query, sort_keys=True)),
+                lambda: db.movies.count_documents(filter_query)
+            )
+            
+            if legacy_order:
+                movies = list(db.movies.find(filter_query).skip((page - 1) * limit).limit(limit))
+            else:
+                # ?cursor= đọc tiếp sau phim cuối trang trước, ?page= có sort vẫn dùng skip
+                movies, next_cursor = fetch_keyset_page(
+                    db.movies, filter_query, sort_field, limit,
+                    cursor=cursor, descending=descending, skip=(page - 1) * limit
+                )
+            for m in movies:
+                m["_id"] = str(m["_id"])
+        
+        return {
+            "movies": movies,
+            "page": page,
+            "totalPages": (total_movies + limit - 1) // limit,
+            "totalMovies": total_movies,
+            "nextCursor": next_cursor
+        }
+    
+    try:
+        # Catalog ít thay đổi: mỗi tổ hợp filter/sort/trang là một key trong cache
+        cache_key = ("movies", status, genre, country, year, sort, page, limit, cursor)
+        return jsonify(cached_catalog(cache_key, load_movies)), 200
+    except InvalidCursorError:
+        return jsonify({"error": "Invalid cursor"}), 400
 
 # 5. Book multiple seats
 @customer_bp.route("/api/book-multi", methods=["POST"])
 @require_auth(role="customer")
+@idempotent("book-multi")
 def book_multi(current_user):
     data = request.json or {}
     showtime_id = data.get("showtime_id")
     seat_codes = data.get("seat_codes", [])
 
-    showtime = None
+    occupancy = None
     if db is not None:
-        showtime = db.showtimes.find_one({"_id": showtime_id})
-    if not showtime:
+        occupancy = get_seat_occupancy_store().get(showtime_id)
+    if not occupancy:
         return jsonify({"error": "Showtime not found"}), 404
+    showtime = occupancy.showtime
 
-    hall_id = showtime["hall_id"]
-    seats = []
-    if db is not None:
-        seats = list(db.seats.find({"hall_id": hall_id, "seat_code": {"$in": seat_codes}}))
+    # Layout ghế lấy từ cache thay vì query db.seats
+    layout = occupancy.layout
+    seats = layout.seats_for_codes(seat_codes)
     seat_ids = [seat["_id"] for seat in seats]
 
-    # Check if any seat already booked
-    conflict = None
-    if db is not None:
-        conflict = db.bookings.find_one({
-            "showtime_id": showtime_id,
-            "seats": {"$in": seat_ids},
-            "status": {"$in": ["pending", "paid"]}
-        })
+    # Check if any seat already booked (ghế do chính user này lock thì vẫn được đặt)
+    # Bitmap trong bộ nhớ chỉ loại nhanh, sau đó luôn kiểm tra lại trên db
+    # (booking từ worker khác hoặc trong khoảng TTL của cache không có trong bitmap)
+    conflict = occupancy.conflicts(seat_codes, user_id=current_user["_id"])
+    if not conflict:
+        conflict = find_seat_conflicts(db, showtime_id, seats, current_user["_id"])
     if conflict:
-        return jsonify({"error": "Some seats already booked"}), 400
+        return jsonify({"error": "Some seats already booked", "conflict_seats": conflict}), 400
 
     # Tính tổng tiền theo loại ghế
     base_price = showtime.get("base_price", 90000)
@@ -271,36 +319,24 @@ def book_multi(current_user):
     if booking_id is None:
         return jsonify({"error": "Failed to generate unique booking ID"}), 500
 
-    for sid in seat_ids:
-        ticket_id = str(ObjectId())
-        
-        # Lấy thông tin seat để tạo barcode
-        seat = db.seats.find_one({"_id": sid})
-        seat_code = seat["seat_code"] if seat else "A1"
-        
-        # Generate barcode data từ thông tin thật
-        barcode_data = f"{showtime['cinema_name'][:2].upper()}{showtime['movie_id'][:4].upper()}{seat_code}{showtime['hall_name'][-1]}{showtime['date'].replace('-', '')}"
-        
-        ticket = {
-            "_id": ticket_id,
-            "booking_id": booking_id,
-            "seat_id": sid,
-            "status": "valid",
-            "checkin_time": None,
-            "checked_by": None,
-            "barcode_data": barcode_data,
-            "created_at": datetime.now(timezone.utc)
-        }
-        
-        if db is not None:
-            db.tickets.insert_one(ticket)
+    # Tạo tickets từ danh sách ghế đã có, ghi bằng một insert_many
+    tickets = build_tickets(showtime, booking_id, seats)
+    movie = None
+    if db is not None:
+        if tickets:
+            db.tickets.insert_many(tickets)
+
+        # Ticket view cho my-tickets và soát vé
+        movie = load_movie_for_showtime(db, showtime)
+        write_ticket_view(db, build_ticket_view(booking, tickets, seats, showtime, movie))
+
+    # Cập nhật occupancy trong bộ nhớ
+    get_seat_occupancy_store().set_status(showtime_id, seat_codes, PENDING)
 
     # Log booking activity
     from services.logging_service import get_logging_service
     logging_service = get_logging_service()
     if logging_service:
-        # Get movie and showtime info for logging
-        movie = db.movies.find_one({"_id": showtime["movie_id"]}) if db else None
         movie_title = movie.get("title", "Unknown Movie") if movie else "Unknown Movie"
         showtime_info = f"{showtime.get('date', 'Unknown')} {showtime.get('time', 'Unknown')}"
         
@@ -321,6 +357,7 @@ def book_multi(current_user):
 # 6. Payment
 @customer_bp.route("/api/payment", methods=["POST"])
 @require_auth(role="customer")
+@idempotent("payment")
 def payment(current_user):
     data = request.json or {}
     showtime_id = data.get("showtime_id")
@@ -346,154 +383,45 @@ def payment(current_user):
         # Không return error, tiếp tục xử lý
 
     # Tạo booking thật từ seat lock
-    from bson import ObjectId
     try:
-        # Thử tìm với ObjectId trước
-        showtime = db.showtimes.find_one({"_id": ObjectId(showtime_id)})
-        if not showtime:
-            # Nếu không tìm thấy, thử với string
-            showtime = db.showtimes.find_one({"_id": showtime_id})
+        # Showtime _id có thể là ObjectId hoặc string
+        showtime = db.showtimes.find_one({"_id": {"$in": showtime_id_candidates(showtime_id)}})
         if not showtime:
             return jsonify({"error": "Showtime not found"}), 404
     except Exception as e:
         return jsonify({"error": f"Invalid showtime_id: {e}"}), 400
 
-    hall_id = showtime["hall_id"]
-    seats = list(db.seats.find({"hall_id": hall_id, "seat_code": {"$in": seat_codes}}))
-    seat_ids = [seat["_id"] for seat in seats]
+    layout = get_hall_layout_cache().get(get_showtime_hall_id(showtime))
+    seats = layout.seats_for_codes(seat_codes)
 
-    # Tính tổng tiền theo loại ghế
-    base_price = showtime.get("base_price", 90000)
-    
-    total_amount = 0
-    for seat in seats:
-        seat_type = seat.get("seat_type", "NORMAL")
-        if seat_type and seat_type.strip().upper() == "VIP":
-            total_amount += base_price + 30000
-        else:
-            total_amount += base_price
+    # Thông tin phim cho ticket view và response
+    movie = load_movie_for_showtime(db, showtime)
 
-    # Tạo booking thật
-    booking_id = f"bk{str(ObjectId())}"
-    booking = {
-        "_id": booking_id,
-        "customer_id": current_user["_id"],
-        "showtime_id": showtime_id,
-        "seats": seat_ids,
-        "total_amount": total_amount,
-        "status": "pending",
-        "created_at": datetime.now(timezone.utc)
-    }
-    
-    if db is not None:
-        db.bookings.insert_one(booking)
+    # Lock, booking, tickets, ticket view, payment trong một transaction
+    try:
+        result = commit_paid_booking(
+            db, showtime, showtime_id, seats,
+            user_id=current_user["_id"],
+            payment_method=method,
+            seat_lock=seat_lock,
+            movie=movie
+        )
+    except BookingConflictError as e:
+        return jsonify({"error": "Some seats already booked", "conflict_seats": e.seat_codes}), 409
 
-    # Generate unique payment_id to avoid duplicates
-    payment_id = f"pay{str(ObjectId())}"
-    payment = {
-        "_id": payment_id,
-        "booking_id": booking_id,
-        "payment_method": method,
-        "status": "success",
-        "amount": booking["total_amount"],
-        "time": datetime.now(timezone.utc)
-    }
-    if db is not None:
-        # Tạo tickets cho booking
-        for sid in seat_ids:
-            ticket_id = str(ObjectId())
-            
-            # Lấy thông tin seat để tạo barcode
-            seat = db.seats.find_one({"_id": sid})
-            seat_code = seat["seat_code"] if seat else "A1"
-            
-            # Generate barcode data từ thông tin thật
-            cinema_code = showtime.get('cinema', 'CN')[:2].upper()
-            hall_code = showtime.get('hall', 'H1')[-1]
-            barcode_data = f"{cinema_code}{showtime['movie_id'][:4].upper()}{seat_code}{hall_code}{showtime['date'].replace('-', '')}"
-            
-            ticket = {
-                "_id": ticket_id,
-                "booking_id": booking_id,
-                "seat_id": sid,
-                "status": "valid",
-                "checkin_time": None,
-                "checked_by": None,
-                "barcode_data": barcode_data,
-                "created_at": datetime.now(timezone.utc)
-            }
-            
-            db.tickets.insert_one(ticket)
-        
-        # Tạo payment record
-        db.payments.insert_one(payment)
-        
-        # Update booking status thành paid
-        db.bookings.update_one({"_id": booking_id}, {"$set": {"status": "paid"}})
-        
-        # Xóa seat lock (nếu có)
-        if seat_lock:
-            db.seatlocks.update_one(
-                {"_id": seat_lock["_id"]},
-                {"$set": {"status": "completed", "completed_at": datetime.now(timezone.utc)}}
-            )
-        
-        # Lấy tickets và thông tin booking để trả về
-        tickets = list(db.tickets.find({"booking_id": booking_id}))
-        showtime = db.showtimes.find_one({"_id": booking["showtime_id"]})
-        movie = None
-        if showtime:
-            movie_id = showtime.get("movie_id")
-            if isinstance(movie_id, ObjectId):
-                movie_id = str(movie_id)
-            movie = db.movies.find_one({"_id": movie_id})
-        
-        # Format tickets cho frontend
-        formatted_tickets = []
-        for ticket in tickets:
-            seat = db.seats.find_one({"_id": ticket["seat_id"]})
-            seat_code = seat["seat_code"] if seat else "A1"
-            
-            formatted_tickets.append({
-                "ticket_id": str(ticket["_id"]),
-                "seat_code": seat_code,
-                "seat_id": str(ticket["seat_id"]),
-                "barcode_data": ticket["barcode_data"],
-                "status": ticket["status"]
-            })
-        
-        # Log payment activity
-        from services.logging_service import get_logging_service
-        logging_service = get_logging_service()
-        if logging_service:
-            logging_service.log_payment(
-                user_id=str(current_user["_id"]),
-                user_email=current_user.get("email"),
-                booking_id=booking_id,
-                payment_method=method,
-                amount=booking["total_amount"],
-                transaction_id=payment_id,
-                ip_address=request.remote_addr,
-                success=True
-            )
+    booking = result["booking"]
+    tickets = result["tickets"]
+    booking_id = booking["_id"]
+    payment_id = result["payment"]["_id"]
 
-        return jsonify({
-            "message": "Payment successful",
-            "payment_id": payment_id,
-            "booking_id": booking_id,
-            "tickets": formatted_tickets,
-            "booking_info": {
-                "cinema": showtime.get("cinema", "Storia Cinema") if showtime else "Storia Cinema",
-                "movie_title": movie["title"] if movie and "title" in movie else "Unknown Movie",
-                "movie_poster": movie.get("poster", movie.get("thumbnail_url", f"/static/img/{movie_id}.jpg")) if movie else (f"/static/img/{movie_id if 'movie_id' in locals() else 'default'}.jpg"),
-                "hall": showtime.get("hall", "Hall 1") if showtime else "Hall 1",
-                "date": showtime.get("date", "2024-01-01") if showtime else "2024-01-01",
-                "time": showtime.get("time", "20:00") if showtime else "20:00",
-                "total_amount": booking["total_amount"]
-            }
-        }), 200
-    
-    # Log payment activity for simple case
+    # Cập nhật occupancy trong bộ nhớ (sau khi transaction đã commit)
+    get_seat_occupancy_store().set_status(showtime_id, seat_codes, PAID)
+    record_paid_booking(db, result["ticket_view"])
+
+    # Format tickets cho frontend, không query lại tickets/seats
+    formatted_tickets = format_tickets(tickets, seats)
+
+    # Log payment activity
     from services.logging_service import get_logging_service
     logging_service = get_logging_service()
     if logging_service:
@@ -502,46 +430,118 @@ def payment(current_user):
             user_email=current_user.get("email"),
             booking_id=booking_id,
             payment_method=method,
-            amount=total_amount,
+            amount=booking["total_amount"],
             transaction_id=payment_id,
             ip_address=request.remote_addr,
             success=True
         )
-    
-    return jsonify({"message": "Payment successful", "payment_id": payment_id}), 200
+
+    return jsonify({
+        "message": "Payment successful",
+        "payment_id": payment_id,
+        "booking_id": booking_id,
+        "tickets": formatted_tickets,
+        "booking_info": result["ticket_view"]["booking_info"]
+    }), 200
 
 # 7. Booking history
 @customer_bp.route("/api/booking-history", methods=["GET"])
 @require_auth(role="customer")
 def booking_history(current_user):
-    bookings = []
-    if db is not None:
-        bookings = list(db.bookings.find({"customer_id": current_user["_id"]}))
-        for b in bookings:
-            b["_id"] = str(b["_id"])
-            # Lấy title phim từ movie_id
-            movie = db.movies.find_one({"_id": b.get("movie_id")})
-            b["movie_title"] = movie["title"] if movie and "title" in movie else b.get("movie_id", "")
-    return jsonify(bookings), 200
+    """
+    Lịch sử đặt vé
+
+    Có ?limit= hoặc ?cursor=: phân trang keyset theo (created_at, _id), mới nhất trước,
+    cursor trang sau trong header X-Next-Cursor. Không có cả hai: trả toàn bộ như cũ
+    (showBookingHistory trong login.js gọi không tham số)
+    """
+    paged = "limit" in request.args or "cursor" in request.args
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        cursor_filter = keyset_filter(request.args.get("cursor"), "created_at")
+    except (ValueError, InvalidCursorError):
+        return jsonify({"error": "limit hoặc cursor không hợp lệ"}), 400
+
+    if db is None:
+        return jsonify([]), 200
+
+    query = {"customer_id": current_user["_id"]}
+    if paged:
+        if cursor_filter:
+            query.update(cursor_filter)
+        bookings = list(db.bookings.find(query).sort(keyset_sort("created_at")).limit(limit + 1))
+        has_more = len(bookings) > limit
+        bookings = bookings[:limit]
+    else:
+        bookings = list(db.bookings.find(query))
+        has_more = False
+
+    # Showtime rồi movie của cả trang, mỗi loại một query $in
+    showtime_keys = []
+    for b in bookings:
+        showtime_keys.extend(showtime_id_candidates(b.get("showtime_id")))
+    showtimes = {
+        str(st["_id"]): st
+        for st in db.showtimes.find({"_id": {"$in": showtime_keys}}, {"movie_id": 1, "date": 1, "time": 1})
+    } if showtime_keys else {}
+    movie_ids = list({str(st.get("movie_id")) for st in showtimes.values() if st.get("movie_id")})
+    movies = {
+        m["_id"]: m for m in db.movies.find({"_id": {"$in": movie_ids}}, {"title": 1})
+    } if movie_ids else {}
+
+    result = []
+    for b in bookings:
+        showtime = showtimes.get(str(b.get("showtime_id")), {})
+        movie_id = str(showtime.get("movie_id", "")) if showtime else b.get("movie_id", "")
+        movie = movies.get(movie_id)
+        b["_id"] = str(b["_id"])
+        b["seats"] = [str(sid) for sid in b.get("seats", [])]
+        b["movie_id"] = movie_id
+        b["movie_title"] = movie["title"] if movie and "title" in movie else movie_id
+        b["show_date"] = showtime.get("date")
+        b["show_time"] = showtime.get("time")
+        result.append(b)
+
+    # Giữ response là array, cursor trang sau nằm trong header
+    response = jsonify(result)
+    if has_more and bookings:
+        response.headers["X-Next-Cursor"] = encode_cursor(bookings[-1], "created_at")
+    return response, 200
 
 # 8. Recommend movies
 @customer_bp.route("/api/recommend/movies", methods=["GET"])
 def recommend_movies():
+    """Top-N phim từ model gợi ý: theo khách (nếu có token), theo ?movie_id=, hoặc phổ biến"""
+    try:
+        limit = parse_limit(request.args.get("limit"), default=3, maximum=RECOMMENDATION_TOP_N)
+    except ValueError:
+        return jsonify({"error": "limit phải là số"}), 400
     movies = []
     if db is not None:
-        movies = list(db.movies.aggregate([{ "$sample": {"size": 3}}]))
-        for m in movies:
-            m["_id"] = str(m["_id"])
+        movies = get_recommendations(
+            db, "movies",
+            customer_id=optional_customer_id(),
+            movie_id=request.args.get("movie_id"),
+            limit=limit
+        )
     return jsonify(movies), 200
 
 # 9. Recommend showtimes
 @customer_bp.route("/api/recommend/showtimes", methods=["GET"])
 def recommend_showtimes():
+    """Top-N suất chiếu sắp tới từ model gợi ý"""
+    try:
+        limit = parse_limit(request.args.get("limit"), default=3, maximum=RECOMMENDATION_TOP_N)
+    except ValueError:
+        return jsonify({"error": "limit phải là số"}), 400
     shows = []
     if db is not None:
-        shows = list(db.showtimes.aggregate([{ "$sample": {"size": 3}}]))
-        for s in shows:
-            s["_id"] = str(s["_id"])
+        shows = get_recommendations(
+            db, "showtimes",
+            customer_id=optional_customer_id(),
+            movie_id=request.args.get("movie_id"),
+            limit=limit
+        )
     return jsonify(shows), 200
 
 @customer_bp.route('/movie/<movie_id>')
@@ -612,102 +612,77 @@ def get_showtime(showtime_id):
 
 @customer_bp.route('/api/showtime/<showtime_id>/seats', methods=['GET'])
 def get_seats_for_showtime(showtime_id):
-    from bson import ObjectId
     try:
-        # Thử tìm với ObjectId trước
-        showtime = db.showtimes.find_one({"_id": ObjectId(showtime_id)})
-        if not showtime:
-            # Nếu không tìm thấy, thử với string
-            showtime = db.showtimes.find_one({"_id": showtime_id})
-        if not showtime:
+        # Layout ghế từ cache + trạng thái ghế từ occupancy (bookings, locks trong một aggregation)
+        occupancy = get_seat_occupancy_store().get(showtime_id)
+        if not occupancy:
             return jsonify({"error": "Showtime not found"}), 404
     except Exception as e:
         return jsonify({"error": f"Invalid showtime_id: {e}"}), 400
 
-    # Fix tại đây
-    hall_id = showtime.get("hall_id") or showtime.get("hall")
+    # ?format=compact: chỉ trả chuỗi trạng thái theo ordinal, layout lấy từ /layout
+    if request.args.get("format") == "compact":
+        return jsonify({
+            "layout_version": occupancy.layout.version,
+            "states": occupancy.encode(),
+            "base_price": occupancy.showtime.get("base_price", 90000)
+        }), 200
 
-    # Lấy tất cả ghế trong phòng, loại trừ ghế hỏng
-    seats = list(db.seats.find({
-        "hall_id": hall_id, 
-        "is_broken": {"$ne": True},  # Loại trừ ghế hỏng
-        "status": {"$ne": "broken"}  # Thêm điều kiện status
-    }))
-    
-    # Kiểm tra ghế đã đặt (bookings)
-    booked_seats = {}
-    
-    # Thử tìm với ObjectId trước
-    bookings = list(db.bookings.find({"showtime_id": ObjectId(showtime_id), "status": {"$in": ["pending", "paid"]}}))
-    if not bookings:
-        # Nếu không tìm thấy, thử với string
-        bookings = list(db.bookings.find({"showtime_id": showtime_id, "status": {"$in": ["pending", "paid"]}}))
-    
-    for booking in bookings:
-        for seat_ref in booking.get("seats", []):
-            # seat_ref có thể là seat_id (ObjectId) hoặc seat_code (string)
-            if isinstance(seat_ref, str):
-                # Nếu là string, có thể là seat_code
-                if '_' in seat_ref:  # Format: hall_seat (e.g., "hn_hall1_A1")
-                    booked_seats[seat_ref] = booking["status"]
-                else:
-                    # Có thể là seat_id string
-                    booked_seats[seat_ref] = booking["status"]
-            else:
-                # Nếu là ObjectId
-                booked_seats[str(seat_ref)] = booking["status"]
-    
-    # Kiểm tra ghế bị lock (seat locks)
-    locked_seats = {}
-    current_time = datetime.now(timezone.utc)
-    for lock in db.seatlocks.find({
-        "showtime_id": showtime_id,
-        "status": "active",
-        "expires_at": {"$gt": current_time}
-    }):
-        for seat_code in lock.get("seat_codes", []):
-            # Tìm seat_id từ seat_code
-            seat = db.seats.find_one({"hall_id": hall_id, "seat_code": seat_code})
-            if seat:
-                locked_seats[str(seat["_id"])] = "locked"
+    return jsonify({
+        "seats": occupancy.seat_list(),
+        "base_price": occupancy.showtime.get("base_price", 90000)
+    }), 200
 
-    result = []
-    for seat in seats:
-        seat_id = seat["_id"]
-        seat_code = seat["seat_code"].strip().upper()  # chuẩn hóa nếu cần
-        
-        # Kiểm tra trạng thái: locked > booked > available
-        status = "available"
-        
-        # Kiểm tra locked trước
-        if str(seat_id) in locked_seats:
-            status = "locked"
-        # Kiểm tra booked - có thể là seat_id hoặc seat_code
-        elif str(seat_id) in booked_seats:
-            status = booked_seats[str(seat_id)]
-        elif seat_code in booked_seats:
-            status = booked_seats[seat_code]
-        # Kiểm tra seat_code với format hall_seat
-        elif f"{hall_id}_{seat_code}" in booked_seats:
-            status = booked_seats[f"{hall_id}_{seat_code}"]
-        
-        # Kiểm tra thêm trạng thái hỏng
-        if seat.get("is_broken") or seat.get("status") == "broken":
-            status = "broken"
-        
-        result.append({
-            "seat_id": str(seat_id),  # Convert ObjectId to string
-            "seat_code": seat_code,
-            "seat_type": seat.get("seat_type", "NORMAL"),
-            "status": status,
-            "is_broken": seat.get("is_broken", False)
-        })
+@customer_bp.route('/api/showtime/<showtime_id>/layout', methods=['GET'])
+def get_layout_for_showtime(showtime_id):
+    """Layout ghế theo ordinal, dùng cùng với /seats?format=compact"""
+    try:
+        occupancy = get_seat_occupancy_store().get(showtime_id)
+        if not occupancy:
+            return jsonify({"error": "Showtime not found"}), 404
+    except Exception as e:
+        return jsonify({"error": f"Invalid showtime_id: {e}"}), 400
 
+    layout = occupancy.layout
     return jsonify({
-        "seats": result,
-        "base_price": showtime.get("base_price", 90000)
+        "layout_version": layout.version,
+        "seat_codes": [seat["seat_code"] for seat in layout.seats],
+        "seat_types": [seat["seat_type"] for seat in layout.seats],
+        "seat_ids": [str(seat["_id"]) for seat in layout.seats]
     }), 200
 
+@customer_bp.route('/api/showtime/<showtime_id>/seat-events', methods=['GET'])
+def stream_seat_events(showtime_id):
+    """Server-sent events: đẩy delta trạng thái ghế thay vì để booking.js poll toàn bộ sơ đồ"""
+    # Showtime đã có occupancy trong bộ nhớ thì không cần đọc db
+    exists = get_seat_occupancy_store().peek(showtime_id) is not None
+    if not exists and db is not None:
+        exists = db.showtimes.find_one({"_id": {"$in": showtime_id_candidates(showtime_id)}}, {"_id": 1}) is not None
+    if not exists:
+        return jsonify({"error": "Showtime not found"}), 404
+
+    broker = get_seat_event_broker()
+    subscription = broker.subscribe(showtime_id)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=15)
+                if event is None:
+                    # Giữ kết nối qua proxy
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Debug API - kiểm tra customer data
 @customer_bp.route("/api/debug/customer-info", methods=["GET"])
 @require_auth(role="customer")
@@ -757,102 +732,69 @@ def debug_customer_info(current_user):
 @customer_bp.route("/api/my-tickets", methods=["GET"])
 @require_auth(role="customer")
 def get_my_tickets(current_user):
-    """Lấy tất cả vé hợp lệ của customer (chưa check-in)"""
+    """
+    Lấy vé hợp lệ của customer (chưa check-in), booking mới nhất trước
+
+    Có ?page= hoặc ?limit=: phân trang, thông tin trang trong header X-Page/X-Limit/X-Has-More.
+    Không có cả hai: trả toàn bộ như cũ (ticket.js gọi không tham số)
+    """
+    paged = "page" in request.args or "limit" in request.args
     try:
-        if db is not None:
-            # Bước 1: Lấy tất cả bookings của customer
-            bookings = list(db.bookings.find({
-                "customer_id": current_user["_id"],
-                "status": "paid"  # Chỉ lấy booking đã thanh toán
-            }))
-            
+        page = max(int(request.args.get("page", 1)), 1)
+        limit = min(max(int(request.args.get("limit", MY_TICKETS_PAGE_SIZE)), 1), MY_TICKETS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "page và limit phải là số"}), 400
 
-            
-            if not bookings:
-                return jsonify([]), 200
-            
-            result = []
-            
-            for booking in bookings:
-                booking_id = booking["_id"]
-                
-                # Lấy tickets cho booking này (chỉ lấy valid tickets)
-                tickets = list(db.tickets.find({
-                    "booking_id": booking_id,
-                    "status": "valid"  # Chỉ lấy vé chưa check-in
-                }))
-                
-                if not tickets:
-                    continue
-                
-                # Lấy thông tin showtime
-                from bson import ObjectId
-                try:
-                    # Thử tìm với ObjectId trước
-                    showtime = db.showtimes.find_one({"_id": ObjectId(booking["showtime_id"])})
-                    if not showtime:
-                        # Nếu không tìm thấy, thử với string
-                        showtime = db.showtimes.find_one({"_id": booking["showtime_id"]})
-                    if not showtime:
-                        continue
-                except Exception as e:
-                    continue
-                
-                # Lấy thông tin movie
-                movie_id = showtime.get("movie_id")
-                movie = None
-                if isinstance(movie_id, ObjectId):
-                    movie_id = str(movie_id)
-                movie = db.movies.find_one({"_id": movie_id})
-                
-                # Format tickets
-                formatted_tickets = []
-                for ticket in tickets:
-                    # Lấy thông tin seat
-                    seat = db.seats.find_one({"_id": ticket["seat_id"]})
-                    seat_code = seat["seat_code"] if seat else "A1"
-                    
-                    try:
-                        formatted_tickets.append({
-                            "ticket_id": str(ticket["_id"]),
-                            "seat_code": seat_code,
-                            "seat_id": str(ticket["seat_id"]),
-                            "barcode_data": ticket.get("barcode_data"),
-                            "status": ticket["status"],
-                            "created_at": str(ticket.get("created_at", datetime.now(timezone.utc)))
-                        })
-                    except Exception as e:
-                        continue
-                
-                # Tạo booking group
-                try:
-                    booking_group = {
-                        "booking_id": str(booking_id),
-                        "booking_info": {
-                            "cinema": showtime.get("cinema", "Storia Cinema"),
-                            "movie_title": movie["title"] if movie and "title" in movie else "Unknown Movie",
-                            "movie_poster": movie.get("poster_url", movie.get("poster", movie.get("thumbnail_url", f"/static/img/{movie_id}.jpg"))) if movie else f"/static/img/{movie_id if movie_id else 'default'}.jpg",
-                            "hall": showtime.get("hall", "Hall 1"),
-                            "date": showtime.get("date", "2024-01-01"),
-                            "time": showtime.get("time", "20:00"),
-                            "total_amount": booking.get("total_amount", 0)
-                        },
-                        "tickets": formatted_tickets
-                    }
-                    
-                    result.append(booking_group)
-                except Exception as e:
-                    continue
-            
-            # Sort theo thời gian booking mới nhất
-            result.sort(key=lambda x: x["tickets"][0]["created_at"] if x["tickets"] else "1900-01-01", reverse=True)
-            
-            return jsonify(result), 200
-        
+    try:
+        if db is None:
+            return jsonify([]), 200
+
+        # Một query trên ticket_views (đã denormalize movie, showtime, seat code)
+        def load_views():
+            cursor = db.ticket_views.find(
+                {"customer_id": current_user["_id"], "status": "paid", "tickets.status": "valid"},
+                {"booking_info": 1, "tickets": 1}
+            ).sort("created_at", -1)
+            if paged:
+                # Lấy dư một booking để biết còn trang sau hay không
+                return list(cursor.skip((page - 1) * limit).limit(limit + 1))
+            return list(cursor)
+
+        views = load_views()
+        # View được ghi cùng booking (commit_paid_booking), dữ liệu cũ do backfill_ticket_views.py dựng.
+        # Trang đầu rỗng có thể là khách chỉ có booking cũ bị sót: dựng lại rồi đọc lại
+        if not views and page == 1 and repair_customer_ticket_views(db, current_user["_id"]):
+            views = load_views()
+
+        has_more = paged and len(views) > limit
+        if paged:
+            views = views[:limit]
+
+        result = []
+        for view in views:
+            result.append({
+                "booking_id": str(view["_id"]),
+                "booking_info": {field: view["booking_info"].get(field) for field in MY_TICKETS_BOOKING_FIELDS},
+                "tickets": [{
+                    "ticket_id": ticket["ticket_id"],
+                    "seat_code": ticket["seat_code"],
+                    "seat_id": ticket["seat_id"],
+                    "barcode_data": ticket.get("barcode_data"),
+                    "status": ticket["status"],
+                    "created_at": str(ticket.get("created_at", ""))
+                } for ticket in view["tickets"] if ticket.get("status") == "valid"]
+            })
+
+        # Giữ response là array như ticket.js đang dùng, thông tin trang nằm trong header
+        response = jsonify(result)
+        if paged:
+            response.headers["X-Page"] = str(page)
+            response.headers["X-Limit"] = str(limit)
+            response.headers["X-Has-More"] = "true" if has_more else "false"
+        return response, 200
 
-        return jsonify([]), 200
-        
     except Exception as e:
+        print(f"❌ Error loading my tickets: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 # API để lấy barcode data
@@ -906,15 +848,15 @@ def cancel_booking(booking_id, current_user):
         showtime_info = {}
         
         if db is not None:
-            # Lấy thông tin seats
-            seats = list(db.seats.find({"_id": {"$in": seat_ids}}))
-            released_seats = [seat["seat_code"] for seat in seats]
-            
             # Lấy thông tin showtime để trả về cho frontend
-            showtime = db.showtimes.find_one({"_id": booking.get("showtime_id")})
+            showtime = db.showtimes.find_one({"_id": {"$in": showtime_id_candidates(booking.get("showtime_id"))}})
             if showtime:
+                # Lấy seat_code từ layout phòng trong cache
+                layout = get_hall_layout_cache().get(get_showtime_hall_id(showtime))
+                released_seats = [seat["seat_code"] for seat in layout.seats_for_ids(seat_ids)]
+                
                 showtime_info = {
-                    "showtime_id": showtime["_id"],
+                    "showtime_id": str(showtime["_id"]),
                     "movie_id": showtime.get("movie_id"),
                     "hall": showtime.get("hall"),
                     "date": showtime.get("date"),
@@ -935,6 +877,10 @@ def cancel_booking(booking_id, current_user):
                     {"booking_id": booking_id, "status": "valid"},
                     {"$set": {"status": "cancelled", "cancelled_at": datetime.now(timezone.utc)}}
                 )
+                mark_ticket_views_cancelled(db, [booking_id])
+                
+                # Trả ghế về trạng thái trống trong occupancy
+                get_seat_occupancy_store().set_status(booking.get("showtime_id"), released_seats, AVAILABLE)
                 
                 return jsonify({
                     "success": True,
@@ -1019,6 +965,7 @@ def cleanup_old_bookings(showtime_id):
             }))
             
             cancelled_count = 0
+            cancelled_ids = []
             released_seats = []
             
             for booking in old_bookings:
@@ -1030,6 +977,7 @@ def cleanup_old_bookings(showtime_id):
                 
                 if result.modified_count > 0:
                     cancelled_count += 1
+                    cancelled_ids.append(booking["_id"])
                     
                     # Cancel tickets
                     db.tickets.update_many(
@@ -1042,6 +990,10 @@ def cleanup_old_bookings(showtime_id):
                     for seat in seats:
                         released_seats.append(seat["seat_code"])
             
+            if cancelled_count:
+                mark_ticket_views_cancelled(db, cancelled_ids)
+                get_seat_occupancy_store().invalidate(showtime_id)
+            
             return jsonify({
                 "success": True,
                 "message": f"Cleaned up {cancelled_count} old bookings",
@@ -1103,6 +1055,10 @@ def force_cleanup_user_bookings(showtime_id, current_user):
                 for seat in seats:
                     released_seats.append(seat["seat_code"])
             
+            if cancelled_count:
+                mark_ticket_views_cancelled(db, [booking["_id"] for booking in user_bookings])
+                get_seat_occupancy_store().invalidate(showtime_id)
+            
             return jsonify({
                 "success": True,
                 "message": f"Force cleaned up {cancelled_count} user bookings",
@@ -1125,62 +1081,78 @@ def get_showing_movies():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 6, type=int)  # 6 phim mỗi trang
         search = request.args.get('search', '')
+        cursor = request.args.get('cursor')
         
         # Tính toán skip
         skip = (page - 1) * per_page
         
         # Tạo query filter - chỉ lấy movies có status showing/Active
-        filter_query = {'status': {'$in': ['showing', 'Active']}}
-        if search:
-            filter_query['title'] = {'$regex': search, '$options': 'i'}
-        
-        # Đếm tổng số phim
-        total_movies = db.movies.count_documents(filter_query)
-        total_pages = (total_movies + per_page - 1) // per_page
-        
-        # Lấy danh sách phim
-        movies = list(db.movies.find(filter_query)
-                     .sort('created_at', -1)
-                     .skip(skip)
-                     .limit(per_page))
-        
-        # Format dữ liệu
-        formatted_movies = []
-        for movie in movies:
-            # Xử lý poster_url
-            poster_url = movie.get('poster_url')
-            if not poster_url:
-                # Fallback to static image based on movie_id
-                poster_url = f"/static/img/showing_movie{movie.get('_id', '1')}.jpg"
+        statuses = ['showing', 'Active']
+        filter_query = {'status': {'$in': statuses}}
+        
+        def load_movies():
+            if search:
+                # Tìm kiếm qua inverted index (không dấu), xếp theo độ khớp
+                movie_ids = get_movie_search_index().search(search, statuses)
+                total_movies = len(movie_ids)
+                page_ids = movie_ids[skip:skip + per_page]
+                by_id = {str(movie['_id']): movie for movie in db.movies.find({'_id': {'$in': page_ids}})}
+                movies = [by_id[movie_id] for movie_id in page_ids if movie_id in by_id]
+                next_cursor = None
+            else:
+                # Đếm tổng số phim (cache theo danh sách, dùng chung cho mọi trang)
+                total_movies = cached_catalog(("showing-count",), lambda: db.movies.count_documents(filter_query))
             
-            formatted_movie = {
-                'id': str(movie['_id']),
-                'title': movie.get('title', 'Unknown'),
-                'genre': movie.get('genre', 'Unknown'),
-                'poster_url': poster_url,
-                'description': movie.get('description', ''),
-                'duration': movie.get('duration', ''),
-                'rating': movie.get('rating', ''),
-                'director': movie.get('director', 'Unknown'),
-                'cast': movie.get('cast', 'Unknown'),
-                'trailer_url': movie.get('trailer_url', ''),
-                'status': movie.get('status', 'showing')
-            }
-            formatted_movies.append(formatted_movie)
+                # Lấy danh sách phim sau cursor (mới nhất trước), ?page= giữ cho client cũ
+                movies, next_cursor = fetch_keyset_page(
+                    db.movies, filter_query, 'created_at', per_page,
+                    cursor=cursor, skip=skip
+                )
+            total_pages = (total_movies + per_page - 1) // per_page
+        
+            # Format dữ liệu
+            formatted_movies = []
+            for movie in movies:
+                # Xử lý poster_url
+                poster_url = movie.get('poster_url')
+                if not poster_url:
+                    # Fallback to static image based on movie_id
+                    poster_url = f"/static/img/showing_movie{movie.get('_id', '1')}.jpg"
+            
+                formatted_movie = {
+                    'id': str(movie['_id']),
+                    'title': movie.get('title', 'Unknown'),
+                    'genre': movie.get('genre', 'Unknown'),
+                    'poster_url': poster_url,
+                    'description': movie.get('description', ''),
+                    'duration': movie.get('duration', ''),
+                    'rating': movie.get('rating', ''),
+                    'director': movie.get('director', 'Unknown'),
+                    'cast': movie.get('cast', 'Unknown'),
+                    'trailer_url': movie.get('trailer_url', ''),
+                    'status': movie.get('status', 'showing')
+                }
+                formatted_movies.append(formatted_movie)
         
-        return jsonify({
-            'success': True,
-            'movies': formatted_movies,
-            'pagination': {
-                'current_page': page,
-                'total_pages': total_pages,
-                'total_movies': total_movies,
-                'per_page': per_page,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
+            return {
+                'success': True,
+                'movies': formatted_movies,
+                'pagination': {
+                    'current_page': page,
+                    'total_pages': total_pages,
+                    'total_movies': total_movies,
+                    'per_page': per_page,
+                    'has_next': next_cursor is not None if cursor else page < total_pages,
+                    'has_prev': page > 1,
+                    'next_cursor': next_cursor
+                }
             }
-        })
         
+        # Cache theo trang và từ khóa tìm kiếm
+        return jsonify(cached_catalog(("showing", page, per_page, search, cursor), load_movies))
+        
+    except InvalidCursorError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -1195,65 +1167,129 @@ def get_coming_soon_movies():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 6, type=int)  # 6 phim mỗi trang
         search = request.args.get('search', '')
+        cursor = request.args.get('cursor')
         
         # Tính toán skip
         skip = (page - 1) * per_page
         
         # Tạo query filter - hỗ trợ cả 'coming_soon' và 'Coming Soon'
-        filter_query = {'status': {'$in': ['coming_soon', 'Coming Soon']}}
-        if search:
-            filter_query['title'] = {'$regex': search, '$options': 'i'}
-        
-        # Đếm tổng số phim
-        total_movies = db.movies.count_documents(filter_query)
-        total_pages = (total_movies + per_page - 1) // per_page
-        
-        # Lấy danh sách phim
-        movies = list(db.movies.find(filter_query)
-                     .sort('created_at', -1)
-                     .skip(skip)
-                     .limit(per_page))
-        
-        # Format dữ liệu
-        formatted_movies = []
-        for movie in movies:
-            # Xử lý poster_url
-            poster_url = movie.get('poster_url')
-            if not poster_url:
-                # Fallback to static image based on movie_id
-                poster_url = f"/static/img/comingsoon_movie{movie.get('_id', '1')}.jpg"
+        statuses = ['coming_soon', 'Coming Soon']
+        filter_query = {'status': {'$in': statuses}}
+        
+        def load_movies():
+            if search:
+                # Tìm kiếm qua inverted index (không dấu), xếp theo độ khớp
+                movie_ids = get_movie_search_index().search(search, statuses)
+                total_movies = len(movie_ids)
+                page_ids = movie_ids[skip:skip + per_page]
+                by_id = {str(movie['_id']): movie for movie in db.movies.find({'_id': {'$in': page_ids}})}
+                movies = [by_id[movie_id] for movie_id in page_ids if movie_id in by_id]
+                next_cursor = None
+            else:
+                # Đếm tổng số phim (cache theo danh sách, dùng chung cho mọi trang)
+                total_movies = cached_catalog(("coming_soon-count",), lambda: db.movies.count_documents(filter_query))
             
-            formatted_movie = {
-                'id': str(movie['_id']),
-                'title': movie.get('title', 'Unknown'),
-                'genre': movie.get('genre', 'Unknown'),
-                'poster_url': poster_url,
-                'description': movie.get('description', ''),
-                'duration': movie.get('duration', ''),
-                'rating': movie.get('rating', ''),
-                'status': movie.get('status', 'coming_soon')
-            }
-            formatted_movies.append(formatted_movie)
+                # Lấy danh sách phim sau cursor (mới nhất trước), ?page= giữ cho client cũ
+                movies, next_cursor = fetch_keyset_page(
+                    db.movies, filter_query, 'created_at', per_page,
+                    cursor=cursor, skip=skip
+                )
+            total_pages = (total_movies + per_page - 1) // per_page
+        
+            # Format dữ liệu
+            formatted_movies = []
+            for movie in movies:
+                # Xử lý poster_url
+                poster_url = movie.get('poster_url')
+                if not poster_url:
+                    # Fallback to static image based on movie_id
+                    poster_url = f"/static/img/comingsoon_movie{movie.get('_id', '1')}.jpg"
+            
+                formatted_movie = {
+                    'id': str(movie['_id']),
+                    'title': movie.get('title', 'Unknown'),
+                    'genre': movie.get('genre', 'Unknown'),
+                    'poster_url': poster_url,
+                    'description': movie.get('description', ''),
+                    'duration': movie.get('duration', ''),
+                    'rating': movie.get('rating', ''),
+                    'status': movie.get('status', 'coming_soon')
+                }
+                formatted_movies.append(formatted_movie)
         
-        return jsonify({
-            'success': True,
-            'movies': formatted_movies,
-            'pagination': {
-                'current_page': page,
-                'total_pages': total_pages,
-                'total_movies': total_movies,
-                'per_page': per_page,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
+            return {
+                'success': True,
+                'movies': formatted_movies,
+                'pagination': {
+                    'current_page': page,
+                    'total_pages': total_pages,
+                    'total_movies': total_movies,
+                    'per_page': per_page,
+                    'has_next': next_cursor is not None if cursor else page < total_pages,
+                    'has_prev': page > 1,
+                    'next_cursor': next_cursor
+                }
             }
-        })
         
+        # Cache theo trang và từ khóa tìm kiếm
+        return jsonify(cached_catalog(("coming_soon", page, per_page, search, cursor), load_movies))
+        
+    except InvalidCursorError:
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@customer_bp.route('/api/movies/search')
+def search_movies():
+    """Tìm phim theo tiêu đề, mô tả, đạo diễn, diễn viên (không phân biệt dấu)"""
+    query = request.args.get('q', '').strip()
+    status = request.args.get('status')
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit phải là số'}), 400
+    if not query:
+        return jsonify({'success': True, 'movies': []})
+
+    statuses = MOVIE_STATUS_GROUPS.get(status, [status]) if status else None
+
+    def load_results():
+        movie_ids = get_movie_search_index().search(query, statuses)[:limit]
+        by_id = {str(movie['_id']): movie for movie in db.movies.find(
+            {'_id': {'$in': movie_ids}},
+            {'title': 1, 'genre': 1, 'genres': 1, 'poster_url': 1, 'duration': 1, 'rating': 1, 'status': 1}
+        )}
+        movies = []
+        for movie_id in movie_ids:
+            movie = by_id.get(movie_id)
+            if movie:
+                movie['id'] = str(movie.pop('_id'))
+                movies.append(movie)
+        return {'success': True, 'movies': movies}
+
+    try:
+        return jsonify(cached_catalog(('search', fold_text(query), status, limit), load_results))
+    except Exception as e:
+        print(f"Search movies error: {e}")
+        return jsonify({'success': False, 'error': 'Lỗi hệ thống'}), 500
+
+@customer_bp.route('/api/movies/autocomplete')
+def autocomplete_movies():
+    """Gợi ý tiêu đề phim khi đang gõ, chỉ đọc index trong bộ nhớ"""
+    query = request.args.get('q', '').strip()
+    status = request.args.get('status')
+    if not query:
+        return jsonify({'suggestions': []})
+    statuses = MOVIE_STATUS_GROUPS.get(status, [status]) if status else None
+    try:
+        return jsonify({'suggestions': get_movie_search_index().autocomplete(query, statuses)})
+    except Exception as e:
+        print(f"Autocomplete error: {e}")
+        return jsonify({'suggestions': []}), 500
+
 @customer_bp.route('/api/movies/<movie_id>')
 def get_movie_by_id(movie_id):
     """API để lấy thông tin một phim theo ID"""
@@ -1293,6 +1329,11 @@ def get_movie_by_id(movie_id):
             'views': movie.get('views', 0)
         }
         
+        # Lượt xem gom trong bộ nhớ, background job ghi xuống db theo lô
+        counter = get_view_counter()
+        if counter is not None:
+            counter.record(movie['_id'])
+        
         return jsonify(formatted_movie)
         
     except Exception as e:
@@ -1441,18 +1482,14 @@ def create_seat_lock(current_user):
             return jsonify({"error": "Thiếu showtime_id hoặc seat_codes"}), 400
         
         if db is not None:
-            # Kiểm tra xem ghế có bị lock bởi user khác không
-            existing_locks = list(db.seatlocks.find({
-                "showtime_id": showtime_id,
-                "seat_codes": {"$in": seat_codes},
-                "status": "active",
-                "expires_at": {"$gt": datetime.now(timezone.utc)}
-            }))
+            occupancy = get_seat_occupancy_store().get(showtime_id)
+            if not occupancy:
+                return jsonify({"error": "Showtime not found"}), 404
             
-            if existing_locks:
-                locked_seats = []
-                for lock in existing_locks:
-                    locked_seats.extend(lock.get("seat_codes", []))
+            # Loại nhanh theo bitmap trong bộ nhớ, O(số ghế yêu cầu); unique index
+            # của lockedSeats và query bookings bên dưới mới là kiểm tra chính xác
+            locked_seats = occupancy.conflicts(seat_codes)
+            if locked_seats:
                 return jsonify({
                     "error": "Một số ghế đã bị đặt bởi người khác",
                     "locked_seats": list(set(locked_seats))
@@ -1463,7 +1500,29 @@ def create_seat_lock(current_user):
             
             # Tính thời gian hết hạn (7 phút)
             locked_at = datetime.now(timezone.utc)
-            expires_at = locked_at + timedelta(minutes=7)
+            expires_at = locked_at + timedelta(minutes=SEAT_LOCK_MINUTES)
+            
+            # Giữ ghế bằng một insert_many, unique index (showtime_id, seat_code) chặn race condition
+            taken_seats = acquire_seat_locks(
+                db, showtime_id, seat_codes, current_user["_id"], session_id, locked_at, expires_at
+            )
+            if taken_seats:
+                return jsonify({
+                    "error": "Một số ghế đã bị đặt bởi người khác",
+                    "locked_seats": taken_seats
+                }), 409
+            
+            # lockedSeats chỉ chặn lock trùng, ghế đã có booking phải kiểm tra trên db
+            booked_seats = find_seat_conflicts(
+                db, showtime_id, occupancy.layout.seats_for_codes(seat_codes), current_user["_id"],
+                check_locks=False
+            )
+            if booked_seats:
+                release_seat_locks(db, session_id)
+                return jsonify({
+                    "error": "Một số ghế đã bị đặt bởi người khác",
+                    "locked_seats": booked_seats
+                }), 409
             
             # Tạo seat lock
             seat_lock = {
@@ -1478,6 +1537,7 @@ def create_seat_lock(current_user):
             }
             
             result = db.seatlocks.insert_one(seat_lock)
+            get_seat_occupancy_store().lock(showtime_id, seat_codes, current_user["_id"], expires_at)
             
             return jsonify({
                 "success": True,
@@ -1527,6 +1587,8 @@ def release_seat_lock(current_user):
             )
             
             if result.modified_count > 0:
+                release_seat_locks(db, session_id)
+                get_seat_occupancy_store().release(lock["showtime_id"], lock.get("seat_codes", []))
                 return jsonify({
                     "success": True,
                     "message": "Seat lock released successfully",
@@ -1543,34 +1605,14 @@ def release_seat_lock(current_user):
 
 @customer_bp.route("/api/seat-locks/cleanup-expired", methods=["POST"])
 def cleanup_expired_locks():
-    """Cleanup expired seat locks (background job)"""
+    """Cleanup expired seat locks (background job chạy định kỳ, endpoint để chạy thủ công)"""
     try:
         if db is not None:
-            # Tính thời gian 7 phút trước
-            cutoff_time = datetime.now(timezone.utc) - timedelta(minutes=7)
-            
-            # Tìm expired locks
-            expired_locks = list(db.seatlocks.find({
-                "expires_at": {"$lt": cutoff_time},
-                "status": "active"
-            }))
+            expired_locks = expire_seat_locks(db)
             
             released_seats = []
             affected_users = []
-            
             for lock in expired_locks:
-                # Update lock status thành expired
-                db.seatlocks.update_one(
-                    {"_id": lock["_id"]},
-                    {
-                        "$set": {
-                            "status": "expired",
-                            "expired_at": datetime.now(timezone.utc)
-                        }
-                    }
-                )
-                
-                # Collect released seats
                 released_seats.extend(lock.get("seat_codes", []))
                 affected_users.append(lock.get("user_id"))
             
@@ -1592,21 +1634,16 @@ def get_locked_seats(showtime_id):
     """Lấy danh sách ghế đang bị lock cho showtime"""
     try:
         if db is not None:
-            # Lấy tất cả active locks cho showtime này
-            active_locks = list(db.seatlocks.find({
+            # Mỗi ghế đang bị lock là một document trong lockedSeats
+            locked = list(db.lockedSeats.find({
                 "showtime_id": showtime_id,
-                "status": "active",
                 "expires_at": {"$gt": datetime.now(timezone.utc)}
-            }))
-            
-            locked_seats = []
-            for lock in active_locks:
-                locked_seats.extend(lock.get("seat_codes", []))
+            }, {"seat_code": 1, "session_id": 1}))
             
             return jsonify({
                 "showtime_id": showtime_id,
-                "locked_seats": list(set(locked_seats)),
-                "active_locks_count": len(active_locks)
+                "locked_seats": list({lock["seat_code"] for lock in locked}),
+                "active_locks_count": len({lock["session_id"] for lock in locked})
             }), 200
         
         return jsonify({"error": "Database connection error"}), 500
@@ -1,6 +1,7 @@
 # 📁 routes/manager.py
 from flask import Blueprint, request, jsonify, render_template
 from services.auth_service import require_auth
+from services.catalog_cache import invalidate_catalog_cache
 from db import db
 from datetime import datetime
 from bson import ObjectId
@@ -46,6 +47,7 @@ def add_movie(current_user):
         # Insert movie into database
         if db is not None:
             db.movies.insert_one(movie)
+            invalidate_catalog_cache()
         
         return jsonify({"success": True, "message": "Thêm phim thành công", "movie_id": data["_id"]}), 201
         
@@ -92,6 +94,7 @@ def delete_movie(current_user, movie_id):
             result = db.movies.delete_one({"_id": movie_id})
             
             if result.deleted_count > 0:
+                invalidate_catalog_cache()
                 return jsonify({"success": True, "message": "Xóa phim thành công"}), 200
             else:
                 return jsonify({"success": False, "message": "Không thể xóa phim"}), 500
@@ -121,6 +124,7 @@ def update_movie(current_user, movie_id):
             if not update_fields:
                 return jsonify({"success": False, "message": "Không có trường nào để cập nhật"}), 400
             db.movies.update_one({"_id": movie_id}, {"$set": update_fields})
+            invalidate_catalog_cache()
             return jsonify({"success": True, "message": "Cập nhật phim thành công"}), 200
         return jsonify({"success": False, "message": "Lỗi kết nối database"}), 500
     except Exception as e:
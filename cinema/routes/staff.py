@@ -1,9 +1,17 @@
 # 📁 routes/staff.py
 from flask import Blueprint, request, jsonify, render_template
 from services.auth_service import require_auth
+from services.hall_layout_cache import get_hall_layout_cache
+from services.seat_occupancy import get_seat_occupancy_store
+from services.seat_map_service import showtime_id_candidates, showtime_schedule, SHOWTIME_SCHEDULE_FIELDS
+from services.ticket_view_service import find_ticket_view_by_barcode, refresh_ticket_view_schedules
+from services.ticket_token import is_ticket_token, verify_ticket_token, InvalidTicketToken
+from services.dashboard_counters import get_dashboard_stats
+from services.gate_metrics import get_gate_report, THROUGHPUT_WINDOW_MINUTES
+from services.booking_service import cancel_bookings_with_seats, summarize_impacted_customers
+from services.checkin_service import build_checkin_manifest, reconcile_scans, checkin_tickets, checkin_by_token, MANIFEST_DAYS, MAX_SCANS_PER_BATCH
 from db import db
-from datetime import datetime, timedelta
-from bson import ObjectId
+from datetime import datetime
 import json
 
 staff_bp = Blueprint("staff", __name__)
@@ -12,6 +20,15 @@ staff_bp = Blueprint("staff", __name__)
 @staff_bp.route("/api/staff/validate-ticket", methods=["POST"])
 @require_auth(role="staff")
 def validate_ticket(current_user):
+    """
+    Soát vé: một read trên ticket_views theo barcode + một read users
+    (view tạo trước khi lưu cinema_id/hall_id: thêm một read showtime, view được sửa luôn)
+
+    Barcode đã ký (T1) chỉ được kiểm tra chữ ký/hạn trong bộ nhớ để loại vé giả sớm.
+    Vé hợp lệ vẫn đọc database có chủ ý: token chỉ chứa ticket_id, showtime_id, seat_code,
+    còn màn hình soát vé cần trạng thái hiện tại của booking/từng vé (đã check-in, đã hủy),
+    thông tin phim, suất chiếu và khách. Check-in không qua bước này dùng checkin_by_token
+    """
     try:
         data = request.json or {}
         barcode_data = data.get("barcode_data")
@@ -19,145 +36,78 @@ def validate_ticket(current_user):
         if not barcode_data:
             return jsonify({"error": "Thiếu mã vạch"}), 400
 
-        # Tìm booking theo barcode (QR code của ticket)
-        booking = None
-        ticket = None
-        
-        try:
-            if db is not None:
-                # Thử tìm ticket trước (vì barcode thường nằm trong tickets)
-                ticket = db.tickets.find_one({"barcode_data": barcode_data})
-                if ticket:
-                    booking_id = ticket.get("booking_id")
-                    if booking_id:
-                        # Tìm booking trực tiếp với ID (có thể là string hoặc ObjectId)
-                        booking = db.bookings.find_one({"_id": booking_id})
-                
-                # Nếu không tìm thấy, thử tìm booking trực tiếp
-                if not booking:
-                    booking = db.bookings.find_one({"barcode_data": barcode_data})
-        except Exception as e:
-            print(f"Error finding booking: {e}")
-            return jsonify({"error": "Lỗi tìm kiếm booking"}), 500
-        
-        if not booking:
+        # Barcode đã ký: loại vé giả/hết hạn mà không cần đọc database,
+        # vé hợp lệ vẫn đọc view để lấy trạng thái hiện tại (token không biết vé đã check-in/hủy)
+        if is_ticket_token(barcode_data):
+            try:
+                verify_ticket_token(barcode_data)
+            except InvalidTicketToken:
+                return jsonify({"error": "Vé không hợp lệ hoặc đã hết hạn"}), 400
+
+        if db is None:
+            return jsonify({"error": "Lỗi kết nối database"}), 500
+
+        view = find_ticket_view_by_barcode(db, barcode_data)
+        if not view:
             return jsonify({"error": "Không tìm thấy booking với mã này"}), 404
 
-        # Lấy thông tin showtime, movie, customer
-        showtime = None
-        movie = None
-        customer = None
-        
-        try:
-            if db is not None:
-                showtime_id = booking.get("showtime_id")
-                if showtime_id:
-                    # Convert string to ObjectId if needed
-                    if isinstance(showtime_id, str):
-                        showtime_id = ObjectId(showtime_id)
-                    showtime = db.showtimes.find_one({"_id": showtime_id})
-                
-                user_id = booking.get("user_id")
-                if user_id:
-                    # Convert string to ObjectId if needed
-                    if isinstance(user_id, str):
-                        user_id = ObjectId(user_id)
-                    customer = db.users.find_one({"_id": user_id})
-                
-                if showtime:
-                    movie_id = showtime.get("movie_id")
-                    if movie_id:
-                        # Convert string to ObjectId if needed
-                        if isinstance(movie_id, str):
-                            movie_id = ObjectId(movie_id)
-                        movie = db.movies.find_one({"_id": movie_id})
-        except Exception as e:
-            print(f"Error getting related data: {e}")
-            return jsonify({"error": "Lỗi lấy thông tin liên quan"}), 500
-
-        # Lấy tickets trong booking
-        tickets = []
-        try:
-            if db is not None:
-                # LUÔN lấy tất cả tickets trong booking, bất kể scan ticket nào
-                booking_id_obj = booking["_id"]
-                print(f"Debug: booking_id = {booking_id_obj}, type = {type(booking_id_obj)}")
-                
-                tickets = list(db.tickets.find({"booking_id": booking_id_obj}))
-                print(f"Debug: Found {len(tickets)} tickets")
-                
-                # Lấy thông tin seat cho mỗi ticket
-                for i, ticket_item in enumerate(tickets):
-                    print(f"Debug: Processing ticket {i+1}: {ticket_item.get('_id')}")
-                    ticket_item["_id"] = str(ticket_item["_id"])
-                    if ticket_item.get("seat_id"):
-                        seat_id = ticket_item.get("seat_id")
-                        print(f"Debug: seat_id = {seat_id}, type = {type(seat_id)}")
-                        # Thử tìm seat với seat_id trực tiếp (có thể là string)
-                        seat = db.seats.find_one({"_id": seat_id})
-                        if not seat:
-                            # Nếu không tìm thấy, thử tìm với seat_code
-                            seat = db.seats.find_one({"seat_code": seat_id})
-                        if seat:
-                            ticket_item["seat_code"] = seat.get("seat_code")
-                            print(f"Debug: Found seat: {seat.get('seat_code')}")
-                        else:
-                            # Nếu không tìm thấy seat, sử dụng seat_id làm seat_code
-                            ticket_item["seat_code"] = seat_id
-                            print(f"Debug: Using seat_id as seat_code: {seat_id}")
-        except Exception as e:
-            print(f"Error getting tickets: {e}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({"error": "Lỗi lấy thông tin vé"}), 500
-
-        # Tạo response data
+        customer = db.users.find_one(
+            {"_id": view.get("customer_id")},
+            {"full_name": 1, "email": 1, "phone": 1}
+        ) if view.get("customer_id") else None
+
+        info = view["booking_info"]
+        if "cinema_id" not in info:
+            # View cũ lưu rạp/phòng/ngày mặc định: lấy lại từ showtime và sửa view một lần
+            showtime = db.showtimes.find_one(
+                {"_id": {"$in": showtime_id_candidates(view.get("showtime_id"))}}, SHOWTIME_SCHEDULE_FIELDS
+            )
+            if showtime:
+                refresh_ticket_view_schedules(db, showtime)
+                info = {**info, **showtime_schedule(showtime)}
+
+        tickets = [{
+            "_id": ticket["ticket_id"],
+            "booking_id": str(view["_id"]),
+            "seat_id": ticket["seat_id"],
+            "seat_code": ticket["seat_code"],
+            "barcode_data": ticket.get("barcode_data"),
+            "status": ticket.get("status")
+        } for ticket in view["tickets"]]
+
         booking_info = {
-            "booking_id": str(booking["_id"]),
+            "booking_id": str(view["_id"]),
             "barcode_data": barcode_data,
-            "status": booking.get("status"),
+            "status": view.get("status"),
             "total_tickets": len(tickets),
             "tickets": tickets,
-            "showtime_info": {},
-            "movie_info": {},
-            "customer_info": {}
-        }
-
-        # Lấy thông tin showtime
-        if showtime:
-            booking_info["showtime_info"] = {
-                "showtime_id": str(showtime["_id"]),
-                "date": showtime.get("start_date") or showtime.get("date"),
-                "time": showtime.get("start_time") or showtime.get("time"),
-                "hall": showtime.get("hall_id") or showtime.get("hall"),
-                "cinema": showtime.get("cinema_id") or showtime.get("cinema")
-            }
-
-        # Lấy thông tin movie
-        if movie:
-            booking_info["movie_info"] = {
-                "movie_id": str(movie["_id"]),
-                "title": movie.get("title"),
-                "duration": movie.get("duration"),
-                "poster": movie.get("poster")
-            }
-
-        # Lấy thông tin customer
-        if customer:
-            booking_info["customer_info"] = {
+            "showtime_info": {
+                "showtime_id": view.get("showtime_id"),
+                "date": info.get("date"),
+                "time": info.get("time"),
+                # Mã phòng/rạp như trước khi có ticket_views (hall_id or hall, cinema_id or cinema)
+                "hall": info.get("hall_id") or info.get("hall"),
+                "cinema": info.get("cinema_id") or info.get("cinema")
+            },
+            "movie_info": {
+                "movie_id": info.get("movie_id"),
+                "title": info.get("movie_title"),
+                "duration": info.get("movie_duration"),
+                "poster": info.get("movie_poster")
+            },
+            "customer_info": {
                 "customer_id": str(customer["_id"]),
                 "full_name": customer.get("full_name"),
                 "email": customer.get("email"),
                 "phone": customer.get("phone")
-            }
-        else:
-            # Nếu không tìm thấy customer, tạo thông tin mặc định
-            booking_info["customer_info"] = {
-                "customer_id": str(booking.get("customer_id", "")),
+            } if customer else {
+                # Nếu không tìm thấy customer, tạo thông tin mặc định
+                "customer_id": str(view.get("customer_id", "")),
                 "full_name": "N/A",
-                "email": "N/A", 
+                "email": "N/A",
                 "phone": "N/A"
             }
+        }
 
         return jsonify({
             "success": True,
@@ -166,8 +116,6 @@ def validate_ticket(current_user):
 
     except Exception as e:
         print(f"Validate ticket error: {e}")
-        import traceback
-        traceback.print_exc()
         return jsonify({"error": "Lỗi hệ thống"}), 500
 
 # 2. Check-in ticket
@@ -182,77 +130,20 @@ def checkin_ticket(current_user):
         if not ticket_ids and not booking_id:
             return jsonify({"error": "Thiếu ID vé hoặc ID booking"}), 400
 
-        # Nếu có booking_id, lấy tất cả tickets trong booking
-        if booking_id and not ticket_ids:
-            if db is not None:
-                tickets = list(db.tickets.find({"booking_id": ObjectId(booking_id)}))
-                ticket_ids = [str(ticket["_id"]) for ticket in tickets]
-            else:
-                return jsonify({"error": "Lỗi kết nối database"}), 500
+        if db is None:
+            return jsonify({"error": "Lỗi kết nối database"}), 500
 
-        if not ticket_ids:
-            return jsonify({"error": "Không có vé nào để check-in"}), 400
+        # Một update_many có điều kiện + một lần đọc lại kết quả từng vé
+        checked_in_tickets, failed_tickets = checkin_tickets(
+            db,
+            checked_in_by=current_user.get("full_name", "staff"),
+            ticket_ids=ticket_ids,
+            booking_id=booking_id,
+            gate=data.get("gate_id")
+        )
 
-        # Kiểm tra và cập nhật từng ticket
-        checked_in_tickets = []
-        failed_tickets = []
-        
-        for ticket_id in ticket_ids:
-            try:
-                # Tìm ticket
-                ticket = None
-                if db is not None:
-                    # Tìm với string ID trực tiếp
-                    ticket = db.tickets.find_one({"_id": ticket_id})
-                
-                if not ticket:
-                    failed_tickets.append({
-                        "ticket_id": ticket_id,
-                        "error": "Không tìm thấy vé"
-                    })
-                    continue
-
-                # Kiểm tra trạng thái vé
-                if ticket.get("status") == "checked_in":
-                    failed_tickets.append({
-                        "ticket_id": ticket_id,
-                        "error": "Vé đã được check-in rồi"
-                    })
-                    continue
-                    
-                if ticket.get("status") == "cancelled":
-                    failed_tickets.append({
-                        "ticket_id": ticket_id,
-                        "error": "Vé đã bị hủy"
-                    })
-                    continue
-
-                # Cập nhật trạng thái vé
-                if db is not None:
-                    result = db.tickets.update_one(
-                        {"_id": ticket_id, "status": {"$in": ["valid", "confirmed"]}},
-                        {
-                            "$set": {
-                                "status": "checked_in",
-                                "checked_in_at": datetime.now(),
-                                "checked_in_by": current_user.get("full_name", "staff")
-                            }
-                        }
-                    )
-                    
-                    if result.modified_count > 0:
-                        checked_in_tickets.append(ticket_id)
-                    else:
-                        failed_tickets.append({
-                            "ticket_id": ticket_id,
-                            "error": "Không thể cập nhật trạng thái vé"
-                        })
-                    
-            except Exception as e:
-                failed_tickets.append({
-                    "ticket_id": ticket_id,
-                    "error": f"Lỗi xử lý vé: {str(e)}"
-                })
+        if not checked_in_tickets and not failed_tickets:
+            return jsonify({"error": "Không có vé nào để check-in"}), 400
 
         # Trả về kết quả
         if checked_in_tickets:
@@ -275,64 +166,122 @@ def checkin_ticket(current_user):
         print(f"Check-in ticket error: {e}")
         return jsonify({"error": "Lỗi hệ thống"}), 500
 
+# 2a. Quét và check-in một vé bằng barcode đã ký (không đọc db khi vé hợp lệ)
+@staff_bp.route("/api/staff/scan-ticket", methods=["POST"])
+@require_auth(role="staff")
+def scan_ticket(current_user):
+    data = request.json or {}
+    barcode_data = data.get("barcode_data")
+
+    if not barcode_data:
+        return jsonify({"error": "Thiếu mã vạch"}), 400
+    if not is_ticket_token(barcode_data):
+        return jsonify({"error": "Vé cũ, dùng validate-ticket để kiểm tra"}), 400
+    if db is None:
+        return jsonify({"error": "Lỗi kết nối database"}), 500
+
+    try:
+        result = checkin_by_token(db, barcode_data, current_user.get("full_name", "staff"), gate=data.get("gate_id"))
+    except InvalidTicketToken:
+        return jsonify({"error": "Vé không hợp lệ hoặc đã hết hạn"}), 400
+    except Exception as e:
+        print(f"Scan ticket error: {e}")
+        return jsonify({"error": "Lỗi hệ thống"}), 500
+
+    status_code = 200 if result["checked_in"] else 409
+    return jsonify({"success": result["checked_in"], **result}), status_code
+
+# 2b. Offline check-in manifest cho thiết bị gác cổng
+@staff_bp.route("/api/staff/checkin-manifest", methods=["GET"])
+@require_auth(role="staff")
+def get_checkin_manifest(current_user):
+    cinema = request.args.get("cinema")
+    if not cinema:
+        return jsonify({"error": "Thiếu rạp"}), 400
+
+    try:
+        days = min(max(int(request.args.get("days", MANIFEST_DAYS)), 0), 7)
+    except ValueError:
+        return jsonify({"error": "days phải là số"}), 400
+
+    if db is None:
+        return jsonify({"error": "Lỗi kết nối database"}), 500
+
+    try:
+        return jsonify(build_checkin_manifest(db, cinema, days)), 200
+    except Exception as e:
+        print(f"Checkin manifest error: {e}")
+        return jsonify({"error": "Lỗi hệ thống"}), 500
+
+# 2c. Upload các lần quét offline, đối soát bằng một bulk_write
+@staff_bp.route("/api/staff/checkin-upload", methods=["POST"])
+@require_auth(role="staff")
+def upload_checkins(current_user):
+    data = request.json or {}
+    scans = data.get("scans", [])
+
+    if not isinstance(scans, list) or not scans:
+        return jsonify({"error": "Không có lượt quét nào"}), 400
+    if len(scans) > MAX_SCANS_PER_BATCH:
+        return jsonify({"error": f"Tối đa {MAX_SCANS_PER_BATCH} lượt quét mỗi lần upload"}), 400
+
+    if db is None:
+        return jsonify({"error": "Lỗi kết nối database"}), 500
+
+    try:
+        result = reconcile_scans(
+            db, scans,
+            checked_in_by=current_user.get("full_name", "staff"),
+            device_id=data.get("device_id"),
+            manifest_id=data.get("manifest_id")
+        )
+        return jsonify({"success": True, **result}), 200
+    except Exception as e:
+        print(f"Checkin upload error: {e}")
+        return jsonify({"error": "Lỗi hệ thống"}), 500
+
+# 2d. Tốc độ check-in từng cổng và thời gian dự kiến hết hàng đợi của suất chiếu
+@staff_bp.route("/api/staff/gate-metrics", methods=["GET"])
+@require_auth(role="staff")
+def gate_metrics(current_user):
+    showtime_id = request.args.get("showtime_id")
+    if not showtime_id:
+        return jsonify({"error": "Thiếu suất chiếu"}), 400
+
+    try:
+        window = min(max(int(request.args.get("window", THROUGHPUT_WINDOW_MINUTES)), 1), 60)
+    except ValueError:
+        return jsonify({"error": "window phải là số"}), 400
+
+    if db is None:
+        return jsonify({"error": "Lỗi kết nối database"}), 500
+
+    try:
+        report = get_gate_report(db, showtime_id, window_minutes=window)
+        if report is None:
+            return jsonify({"error": "Không tìm thấy suất chiếu"}), 404
+        return jsonify(report), 200
+    except Exception as e:
+        print(f"Gate metrics error: {e}")
+        return jsonify({"error": "Lỗi hệ thống"}), 500
+
 # 3. Dashboard stats
 @staff_bp.route("/api/staff/dashboard-stats", methods=["GET"])
 @require_auth(role="staff")
 def dashboard_stats(current_user):
+    """
+    Stats đọc từ counter documents theo rạp/ngày (dashboardCounters), được cập nhật
+    khi thanh toán, check-in và hủy vé. ?cinema= để chỉ đọc một document của rạp
+    """
     try:
-        today = datetime.now().date()
-        today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
-        
         stats = {
             "today_checkins": 0,
             "current_shows": 0,
             "waiting_customers": 0
         }
-        
+
         if db is not None:
-            # Đếm vé check-in hôm nay
-            stats["today_checkins"] = db.tickets.count_documents({
-                "status": "checked_in",
-                "checked_in_at": {"$gte": today_start, "$lte": today_end}
-            })
-            
-            # Đếm suất chiếu hiện tại (trong vòng 2 giờ)
-            current_time = datetime.now()
-            time_range_start = current_time - timedelta(hours=1)
-            time_range_end = current_time + timedelta(hours=1)
-            
-            # Sử dụng start_date và start_time thay vì date và time
-            current_showtimes = list(db.showtimes.find({
-                "start_date": today.strftime("%Y-%m-%d"),
-                "start_time": {
-                    "$gte": time_range_start.strftime("%H:%M"),
-                    "$lte": time_range_end.strftime("%H:%M")
-                },
-                "status": "active"
-            }))
-            
-            stats["current_shows"] = len(current_showtimes)
-            
-            # Đếm khách hàng chờ (có booking nhưng chưa check-in)
-            if current_showtimes:
-                showtime_ids = [s["_id"] for s in current_showtimes]
-                waiting_bookings = list(db.bookings.find({
-                    "showtime_id": {"$in": showtime_ids},
-                    "status": "paid"
-                }))
-                
-                waiting_customers = set()
-                for booking in waiting_bookings:
-                    # Kiểm tra xem có vé nào chưa check-in không
-                    unchecked_tickets = db.tickets.count_documents({
-                        "booking_id": booking["_id"],
-                        "status": {"$in": ["valid", "confirmed", "paid"]}
-                    })
-                    if unchecked_tickets > 0:
-                        waiting_customers.add(booking.get("user_id"))
-                
-                stats["waiting_customers"] = len(waiting_customers)
+            stats = get_dashboard_stats(db, cinema=request.args.get("cinema") or None)
 
         return jsonify(stats), 200
 
@@ -396,12 +345,15 @@ def report_broken_seat(current_user):
             result = db.brokenSeats.insert_one(broken_seat)
             
             # Cập nhật trạng thái ghế trong collection seats
+            seat_filter = {
+                "seat_code": seat_id,
+                "hall": hall,
+                "cinema": cinema
+            }
+            # Lấy _id ghế một lần, dùng cho cache và tìm booking bị ảnh hưởng
+            broken_seats = list(db.seats.find(seat_filter, {"hall_id": 1}))
             db.seats.update_many(
-                {
-                    "seat_code": seat_id,
-                    "hall": hall,
-                    "cinema": cinema
-                },
+                seat_filter,
                 {
                     "$set": {
                         "is_broken": True,
@@ -411,51 +363,34 @@ def report_broken_seat(current_user):
                 }
             )
             
+            # Layout phòng đã thay đổi, xóa khỏi cache
+            for hall_id in {seat.get("hall_id") for seat in broken_seats if seat.get("hall_id")}:
+                get_hall_layout_cache().invalidate(hall_id)
+            
             # Hủy tất cả booking tương lai của ghế này
             current_time = datetime.now()
-            future_showtimes = list(db.showtimes.find({
+            future_showtime_ids = [showtime["_id"] for showtime in db.showtimes.find({
                 "date": {"$gte": current_time.strftime("%Y-%m-%d")},
                 "hall": hall,
                 "cinema": cinema
-            }))
-            
-            for showtime in future_showtimes:
-                # Tìm bookings có ghế này
-                bookings = list(db.bookings.find({
-                    "showtime_id": showtime["_id"],
-                    "status": {"$in": ["pending", "paid"]}
-                }))
-                
-                for booking in bookings:
-                    # Kiểm tra xem booking có chứa ghế hỏng không
-                    seat_ids = booking.get("seats", [])
-                    for seat_id_obj in seat_ids:
-                        seat = db.seats.find_one({"_id": seat_id_obj})
-                        if seat and seat.get("seat_code") == seat_id:
-                            # Hủy booking
-                            db.bookings.update_one(
-                                {"_id": booking["_id"]},
-                                {
-                                    "$set": {
-                                        "status": "cancelled",
-                                        "cancel_reason": "seat_broken",
-                                        "cancelled_at": datetime.now()
-                                    }
-                                }
-                            )
-                            
-                            # Hủy tickets
-                            db.tickets.update_many(
-                                {"booking_id": booking["_id"]},
-                                {
-                                    "$set": {
-                                        "status": "cancelled",
-                                        "cancel_reason": "seat_broken",
-                                        "cancelled_at": datetime.now()
-                                    }
-                                }
-                            )
-                            break
+            }, {"_id": 1})]
+
+            cancelled_bookings = cancel_bookings_with_seats(
+                db,
+                future_showtime_ids,
+                [seat["_id"] for seat in broken_seats],
+                reason="seat_broken"
+            )
+            # Occupancy xóa sau khi hủy booking để lần load lại thấy ghế đã trống
+            get_seat_occupancy_store().invalidate()
+            impacted_customers = summarize_impacted_customers(db, cancelled_bookings)
+
+            return jsonify({
+                "success": True,
+                "message": "Đã ghi nhận báo cáo ghế hỏng và cập nhật trạng thái",
+                "cancelled_bookings": len(cancelled_bookings),
+                "impacted_customers": impacted_customers
+            }), 201
 
         return jsonify({
             "success": True, 
@@ -522,12 +457,13 @@ def restore_broken_seat(seat_id, current_user):
             )
             
             # Khôi phục trạng thái ghế
+            seat_filter = {
+                "seat_code": seat_id,
+                "hall": hall,
+                "cinema": cinema
+            }
             db.seats.update_many(
-                {
-                    "seat_code": seat_id,
-                    "hall": hall,
-                    "cinema": cinema
-                },
+                seat_filter,
                 {
                     "$set": {
                         "is_broken": False,
@@ -537,6 +473,11 @@ def restore_broken_seat(seat_id, current_user):
                     }
                 }
             )
+            
+            # Layout phòng đã thay đổi, xóa khỏi cache
+            for hall_id in db.seats.distinct("hall_id", seat_filter):
+                get_hall_layout_cache().invalidate(hall_id)
+            get_seat_occupancy_store().invalidate()
 
         return jsonify({
             "success": True,
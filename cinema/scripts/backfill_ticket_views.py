@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Backfill ticket_views for bookings created before the denormalized read model existed
+Run once when deploying on an existing database (/api/my-tickets no longer repairs on every read)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ReplaceOne
+from db import db
+from services.seat_map_service import showtime_id_candidates, SHOWTIME_SCHEDULE_FIELDS
+from services.ticket_view_service import build_ticket_view, load_movie_for_showtime, refresh_ticket_view_schedules
+
+BATCH_SIZE = 500
+
+def backfill_ticket_views(only_missing=True):
+    """Tạo ticket view cho các booking (mặc định chỉ các booking chưa có view)"""
+    try:
+        existing_ids = set(db.ticket_views.distinct("_id")) if only_missing else set()
+
+        showtimes = {}
+        movies = {}
+        written = 0
+        skipped = []
+        batch = []
+
+        for booking in db.bookings.find({}, {"customer_id": 1, "showtime_id": 1, "seats": 1,
+                                              "total_amount": 1, "status": 1, "created_at": 1}):
+            if booking["_id"] in existing_ids:
+                continue
+
+            # Showtime và movie dùng lại giữa các booking
+            showtime_key = str(booking.get("showtime_id"))
+            if showtime_key not in showtimes:
+                showtimes[showtime_key] = db.showtimes.find_one(
+                    {"_id": {"$in": showtime_id_candidates(booking.get("showtime_id"))}}
+                )
+            showtime = showtimes[showtime_key]
+            if not showtime:
+                skipped.append((booking["_id"], "missing showtime"))
+                continue
+
+            movie_key = str(showtime.get("movie_id"))
+            if movie_key not in movies:
+                movies[movie_key] = load_movie_for_showtime(db, showtime)
+
+            tickets = list(db.tickets.find({"booking_id": booking["_id"]}))
+            seat_ids = [ticket["seat_id"] for ticket in tickets] or booking.get("seats", [])
+            seats = list(db.seats.find({"_id": {"$in": seat_ids}}, {"seat_code": 1}))
+
+            batch.append(build_ticket_view(booking, tickets, seats, showtime, movies[movie_key]))
+            if len(batch) >= BATCH_SIZE:
+                written += _write_batch(batch)
+                batch = []
+
+        if batch:
+            written += _write_batch(batch)
+
+        print(f"✅ Đã ghi {written} ticket views.")
+        if skipped:
+            print(f"⚠️ Bỏ qua {len(skipped)} booking:")
+            for booking_id, reason in skipped:
+                print(f"  - _id: {booking_id}, {reason}")
+
+        return written
+
+    except Exception as e:
+        print(f"❌ Error backfilling ticket views: {e}")
+        return 0
+
+def refresh_schedules():
+    """Ghi lại rạp/phòng/ngày/giờ thật vào các view đã có (view cũ lưu giá trị mặc định)"""
+    try:
+        showtime_ids = db.ticket_views.distinct("showtime_id")
+        updated = 0
+        missing = 0
+        for showtime_id in showtime_ids:
+            showtime = db.showtimes.find_one(
+                {"_id": {"$in": showtime_id_candidates(showtime_id)}}, SHOWTIME_SCHEDULE_FIELDS
+            )
+            if not showtime:
+                missing += 1
+                continue
+            updated += refresh_ticket_view_schedules(db, showtime)
+
+        print(f"✅ Đã cập nhật lịch chiếu của {updated} ticket views ({len(showtime_ids)} suất chiếu).")
+        if missing:
+            print(f"⚠️ {missing} suất chiếu không còn trong showtimes, giữ nguyên view.")
+        return updated
+
+    except Exception as e:
+        print(f"❌ Error refreshing ticket view schedules: {e}")
+        return 0
+
+def _write_batch(views):
+    result = db.ticket_views.bulk_write(
+        [ReplaceOne({"_id": view["_id"]}, view, upsert=True) for view in views],
+        ordered=False
+    )
+    return result.upserted_count + result.modified_count
+
+if __name__ == "__main__":
+    rebuild = "--rebuild" in sys.argv
+    print("=== Backfill ticket_views ===")
+    backfill_ticket_views(only_missing=not rebuild)
+    if not rebuild:
+        print("=== Refresh ticket_views schedules ===")
+        refresh_schedules()
@@ -35,6 +35,17 @@ def verify_token(token):
     except Exception as e:
         raise Exception(f"Token verification failed: {str(e)}")
 
+def optional_customer_id():
+    """_id của user nếu request có Bearer token hợp lệ, không có thì None (endpoint public)"""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(auth_header.split(" ")[1], SECRET_KEY, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    return payload.get("_id")
+
 def require_auth(role=None):
     def decorator(f):
         @wraps(f)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Background Jobs for Cinema Management System
+Small daemon-thread scheduler for periodic maintenance tasks
+"""
+
+import threading
+from typing import Callable, Dict
+
+
+class PeriodicJob:
+    """Chạy một hàm định kỳ trong daemon thread, lỗi được log và không dừng job"""
+
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], None], run_immediately: bool = False):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self.run_immediately = run_immediately
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_once(self):
+        try:
+            self.func()
+        except Exception as e:
+            print(f"❌ Background job {self.name} error: {e}")
+
+    def _run(self):
+        if self.run_immediately:
+            self.run_once()
+        while not self._stop_event.wait(self.interval_seconds):
+            self.run_once()
+
+
+# Registered background jobs
+background_jobs: Dict[str, PeriodicJob] = {}
+
+def start_background_job(name: str, interval_seconds: float, func: Callable[[], None],
+                         run_immediately: bool = False) -> PeriodicJob:
+    """Đăng ký và chạy một job định kỳ (mỗi tên chỉ chạy một job)"""
+    job = background_jobs.get(name)
+    if job is None:
+        job = PeriodicJob(name, interval_seconds, func, run_immediately)
+        background_jobs[name] = job
+    job.start()
+    return job
+
+def stop_background_jobs():
+    """Dừng tất cả job đã đăng ký"""
+    for job in background_jobs.values():
+        job.stop(timeout=1)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Booking Service for Cinema Management System
+Commits lock verification, booking, tickets and payment as one MongoDB transaction
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from services.seat_map_service import ACTIVE_BOOKING_STATUSES, showtime_id_candidates
+from services.ticket_service import build_tickets
+from services.ticket_view_service import build_ticket_view, write_ticket_view, mark_ticket_views_cancelled
+
+
+class BookingConflictError(Exception):
+    """Ghế đã được người khác giữ hoặc đặt trong lúc thanh toán"""
+
+    def __init__(self, seat_codes: List[str]):
+        super().__init__(f"Seats no longer available: {', '.join(seat_codes)}")
+        self.seat_codes = seat_codes
+
+
+# Cache kết quả kiểm tra server có hỗ trợ transaction hay không (theo client)
+_transaction_support = {}
+
+def transactions_supported(client) -> bool:
+    """Transaction chỉ chạy được trên replica set hoặc mongos"""
+    key = id(client)
+    if key not in _transaction_support:
+        try:
+            hello = client.admin.command("hello")
+            _transaction_support[key] = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except PyMongoError as e:
+            print(f"⚠️ Cannot detect transaction support: {e}")
+            return False
+        if not _transaction_support[key]:
+            print("⚠️ MongoDB is not a replica set, booking pipeline runs without a transaction")
+    return _transaction_support[key]
+
+
+def run_in_transaction(db, callback):
+    """
+    Chạy callback(session) trong một transaction
+
+    with_transaction tự retry khi gặp TransientTransactionError và
+    UnknownTransactionCommitResult. Server standalone không có transaction,
+    callback được chạy với session=None (các lệnh ghi tuần tự như trước)
+    """
+    client = db.client
+    if not transactions_supported(client):
+        return callback(None)
+    with client.start_session() as session:
+        return session.with_transaction(callback)
+
+
+def find_seat_conflicts(db, showtime_id, seats: List[Dict[str, Any]], user_id: str,
+                        check_locks: bool = True, session=None) -> List[str]:
+    """
+    Kiểm tra xung đột trên db (nguồn chính xác, SeatOccupancy chỉ dùng để loại nhanh)
+
+    Args:
+        seats: Ghế từ HallLayout (có `_id` và `seat_code`)
+        user_id: Lock và booking pending của chính customer không tính là xung đột
+        check_locks: False khi người gọi đã giữ các ghế này trong lockedSeats
+
+    Returns:
+        list: Các seat_code đã bị người khác giữ hoặc đặt
+    """
+    seat_codes_by_id = {str(seat["_id"]): seat["seat_code"] for seat in seats}
+    conflict = set()
+
+    # Ghế đang được người khác giữ
+    if check_locks:
+        foreign_locks = db.lockedSeats.find({
+            "showtime_id": showtime_id,
+            "seat_code": {"$in": list(seat_codes_by_id.values())},
+            "user_id": {"$ne": user_id},
+            "expires_at": {"$gt": datetime.now(timezone.utc)}
+        }, {"seat_code": 1}, session=session)
+        conflict.update(lock["seat_code"] for lock in foreign_locks)
+
+    # Ghế đã có booking (booking pending của chính customer không tính)
+    taken = db.bookings.find({
+        "showtime_id": {"$in": showtime_id_candidates(showtime_id)},
+        "status": {"$in": ACTIVE_BOOKING_STATUSES},
+        "seats": {"$in": [seat["_id"] for seat in seats]},
+        "$or": [{"status": "paid"}, {"customer_id": {"$ne": user_id}}]
+    }, {"seats": 1}, session=session)
+    for booking in taken:
+        for sid in booking.get("seats", []):
+            if str(sid) in seat_codes_by_id:
+                conflict.add(seat_codes_by_id[str(sid)])
+
+    return sorted(conflict)
+
+
+def commit_paid_booking(db, showtime: Dict[str, Any], showtime_id, seats: List[Dict[str, Any]],
+                        user_id: str, payment_method: Optional[str],
+                        seat_lock: Optional[Dict[str, Any]] = None,
+                        movie: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Pipeline đặt vé đã thanh toán: kiểm tra lock/xung đột, tạo booking (paid),
+    tickets, ticket view, payment và hoàn tất seat lock trong cùng một transaction
+
+    Args:
+        db: Database instance
+        showtime: Showtime document
+        showtime_id: ID của showtime (như client gửi lên)
+        seats: Ghế từ HallLayout
+        user_id: ID của customer
+        payment_method: Phương thức thanh toán
+        seat_lock: Seat lock session của customer (nếu có)
+        movie: Movie document cho ticket view
+
+    Returns:
+        dict: {"booking": ..., "tickets": [...], "payment": ..., "ticket_view": ...}
+
+    Raises:
+        BookingConflictError: Ghế đã bị người khác giữ hoặc đặt
+    """
+    seat_ids = [seat["_id"] for seat in seats]
+
+    total_amount = 0
+    base_price = showtime.get("base_price", 90000)
+    for seat in seats:
+        seat_type = seat.get("seat_type", "NORMAL")
+        if seat_type and seat_type.strip().upper() == "VIP":
+            total_amount += base_price + 30000
+        else:
+            total_amount += base_price
+
+    def pipeline(session):
+        now = datetime.now(timezone.utc)
+
+        conflict = find_seat_conflicts(db, showtime_id, seats, user_id, session=session)
+        if conflict:
+            raise BookingConflictError(conflict)
+
+        # Booking được ghi thẳng ở trạng thái paid, không còn bước pending -> paid
+        booking_id = f"bk{str(ObjectId())}"
+        booking = {
+            "_id": booking_id,
+            "customer_id": user_id,
+            "showtime_id": showtime_id,
+            "seats": seat_ids,
+            "total_amount": total_amount,
+            "status": "paid",
+            "created_at": now
+        }
+        db.bookings.insert_one(booking, session=session)
+
+        tickets = build_tickets(showtime, booking_id, seats)
+        if tickets:
+            db.tickets.insert_many(tickets, session=session)
+
+        ticket_view = build_ticket_view(booking, tickets, seats, showtime, movie)
+        write_ticket_view(db, ticket_view, session=session)
+
+        payment = {
+            "_id": f"pay{str(ObjectId())}",
+            "booking_id": booking_id,
+            "payment_method": payment_method,
+            "status": "success",
+            "amount": total_amount,
+            "time": now
+        }
+        db.payments.insert_one(payment, session=session)
+
+        if seat_lock:
+            db.seatlocks.update_one(
+                {"_id": seat_lock["_id"]},
+                {"$set": {"status": "completed", "completed_at": now}},
+                session=session
+            )
+            db.lockedSeats.delete_many({"session_id": seat_lock["session_id"]}, session=session)
+
+        return {"booking": booking, "tickets": tickets, "payment": payment, "ticket_view": ticket_view}
+
+    return run_in_transaction(db, pipeline)
+
+
+def cancel_bookings_with_seats(db, showtime_ids: List[Any], seat_ids: List[Any], reason: str) -> List[Dict[str, Any]]:
+    """
+    Hủy các booking pending/paid của các suất chiếu có chứa một trong các ghế
+
+    Một find (index seats + showtime_id), một update_many cho bookings, một cho tickets
+
+    Args:
+        showtime_ids: _id các suất chiếu (ObjectId hoặc string)
+        seat_ids: _id các ghế bị ảnh hưởng
+        reason: cancel_reason ghi vào booking và ticket
+
+    Returns:
+        list: Booking bị hủy (_id, customer_id, showtime_id, status trước khi hủy)
+    """
+    if not showtime_ids or not seat_ids:
+        return []
+
+    # bookings.showtime_id lưu dạng string, dữ liệu cũ có thể là ObjectId
+    showtime_filter = []
+    for showtime_id in showtime_ids:
+        showtime_filter.extend(showtime_id_candidates(showtime_id))
+    seat_filter = list(seat_ids) + [str(seat_id) for seat_id in seat_ids if isinstance(seat_id, ObjectId)]
+
+    bookings = list(db.bookings.find(
+        {
+            "seats": {"$in": seat_filter},
+            "showtime_id": {"$in": showtime_filter},
+            "status": {"$in": ACTIVE_BOOKING_STATUSES}
+        },
+        {"customer_id": 1, "showtime_id": 1, "status": 1}
+    ))
+    if not bookings:
+        return []
+
+    booking_ids = [booking["_id"] for booking in bookings]
+    cancelled_at = datetime.now()
+    cancellation = {"status": "cancelled", "cancel_reason": reason, "cancelled_at": cancelled_at}
+    db.bookings.update_many(
+        {"_id": {"$in": booking_ids}, "status": {"$in": ACTIVE_BOOKING_STATUSES}},
+        {"$set": cancellation}
+    )
+    db.tickets.update_many({"booking_id": {"$in": booking_ids}}, {"$set": cancellation})
+    mark_ticket_views_cancelled(db, booking_ids, reason=reason)
+    return bookings
+
+
+def summarize_impacted_customers(db, bookings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Khách hàng có booking bị hủy (tên, email, các booking), một find users theo $in"""
+    by_customer = {}
+    for booking in bookings:
+        by_customer.setdefault(booking.get("customer_id"), []).append({
+            "booking_id": str(booking["_id"]),
+            "showtime_id": str(booking.get("showtime_id")),
+            "was_paid": booking.get("status") == "paid"
+        })
+
+    customer_ids = [customer_id for customer_id in by_customer if customer_id]
+    users = {
+        user["_id"]: user
+        for user in db.users.find({"_id": {"$in": customer_ids}}, {"full_name": 1, "email": 1, "phone": 1})
+    } if customer_ids else {}
+
+    return [{
+        "customer_id": str(customer_id) if customer_id else None,
+        "full_name": users.get(customer_id, {}).get("full_name"),
+        "email": users.get(customer_id, {}).get("email"),
+        "phone": users.get(customer_id, {}).get("phone"),
+        "bookings": customer_bookings
+    } for customer_id, customer_bookings in by_customer.items()]
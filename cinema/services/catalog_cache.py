@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Catalog Cache for Cinema Management System
+Read-through LRU cache for movie listing responses, invalidated when a manager edits the catalog
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Optional
+
+from services.movie_search import get_movie_search_index
+
+# Số response tối đa giữ trong cache (mỗi tổ hợp filter/trang là một key)
+CATALOG_CACHE_MAX_ENTRIES = 512
+
+# Các worker khác không nhận được invalidate, TTL giới hạn thời gian dữ liệu cũ
+CATALOG_CACHE_TTL_SECONDS = 300
+
+
+class CatalogCache:
+    def __init__(self, max_entries: int = CATALOG_CACHE_MAX_ENTRIES, ttl_seconds: int = CATALOG_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Tăng mỗi lần invalidate, load đang chạy dở thì không ghi kết quả cũ vào cache
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Lấy response theo key, gọi loader (query MongoDB) khi chưa có hoặc đã hết hạn
+
+        Args:
+            key: Tuple mô tả query (endpoint, filter, sort, trang, ...)
+            loader: Hàm trả về response (dict JSON được), không được sửa sau khi cache
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (now + self.ttl_seconds, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        """Xóa toàn bộ cache (thêm/sửa/xóa phim ảnh hưởng hầu hết các trang)"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Global catalog cache instance
+catalog_cache = None
+
+def init_catalog_cache(max_entries: int = CATALOG_CACHE_MAX_ENTRIES, ttl_seconds: int = CATALOG_CACHE_TTL_SECONDS):
+    """Initialize the global catalog cache"""
+    global catalog_cache
+    catalog_cache = CatalogCache(max_entries, ttl_seconds)
+    return catalog_cache
+
+def get_catalog_cache() -> Optional[CatalogCache]:
+    """Get the global catalog cache instance"""
+    return catalog_cache
+
+def cached_catalog(key: Hashable, loader: Callable[[], Any]) -> Any:
+    """Đọc qua catalog cache nếu đã init, không thì gọi thẳng loader"""
+    cache = get_catalog_cache()
+    if cache is None:
+        return loader()
+    return cache.get_or_load(key, loader)
+
+def invalidate_catalog_cache():
+    """Gọi sau khi thêm/sửa/xóa phim: xóa cache response và dựng lại search index"""
+    cache = get_catalog_cache()
+    if cache is not None:
+        cache.invalidate()
+    search_index = get_movie_search_index()
+    if search_index is not None:
+        search_index.invalidate()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Check-in Service for Cinema Management System
+Signed offline manifests for gate devices and bulk reconciliation of uploaded scans
+"""
+
+import hashlib
+import hmac
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from services.auth_service import SECRET_KEY
+from services.seat_map_service import showtime_schedule, SHOWTIME_SCHEDULE_FIELDS
+from services.ticket_view_service import mark_ticket_views_checked_in
+from services.ticket_token import is_ticket_token, verify_ticket_token, InvalidTicketToken
+
+# Manifest gồm các suất chiếu từ hôm nay tới MANIFEST_DAYS ngày sau
+MANIFEST_DAYS = 1
+
+# Thiết bị phải tải lại manifest sau thời gian này
+MANIFEST_TTL_HOURS = 6
+
+MANIFEST_VERSION = 1
+
+# Số barcode tối đa trong một lần upload
+MAX_SCANS_PER_BATCH = 5000
+
+CHECKIN_ALLOWED_STATUSES = ["valid", "confirmed"]
+
+
+def sign_payload(payload: Dict[str, Any]) -> str:
+    """HMAC-SHA256 trên JSON đã chuẩn hóa (sort_keys, không khoảng trắng)"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hmac.new(SECRET_KEY.encode("utf-8"), canonical.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_payload(payload: Dict[str, Any], signature: str) -> bool:
+    return hmac.compare_digest(sign_payload(payload), signature or "")
+
+
+def build_checkin_manifest(db, cinema: str, days: int = MANIFEST_DAYS) -> Dict[str, Any]:
+    """
+    Manifest gọn cho một rạp: danh sách suất chiếu và barcode của vé đã thanh toán
+
+    Mỗi vé là một mảng [barcode, ticket_id, showtime_index, seat_code, status]
+    để giảm dung lượng tải về thiết bị. Hai query: showtimes và ticket_views
+    """
+    now = datetime.now(timezone.utc)
+    today = now.strftime("%Y-%m-%d")
+    last_day = (now + timedelta(days=days)).strftime("%Y-%m-%d")
+
+    # Showtime seed dùng cinema_name/date, showtime tạo từ manager dùng cinema_id/start_date
+    day_range = {"$gte": today, "$lte": last_day}
+    showtimes = sorted(
+        ((st, showtime_schedule(st)) for st in db.showtimes.find(
+            {"$and": [
+                {"$or": [{"cinema": cinema}, {"cinema_name": cinema}, {"cinema_id": cinema}]},
+                {"$or": [{"date": day_range}, {"start_date": day_range}]}
+            ]},
+            SHOWTIME_SCHEDULE_FIELDS
+        )),
+        key=lambda item: (item[1]["date"] or "", item[1]["time"] or "")
+    )
+    showtime_index = {str(st["_id"]): index for index, (st, _) in enumerate(showtimes)}
+
+    tickets = []
+    movie_titles = {}
+    if showtime_index:
+        views = db.ticket_views.find(
+            {"showtime_id": {"$in": list(showtime_index)}, "status": "paid"},
+            {"showtime_id": 1, "booking_info.movie_title": 1, "tickets": 1}
+        )
+        for view in views:
+            index = showtime_index[view["showtime_id"]]
+            movie_titles.setdefault(index, view.get("booking_info", {}).get("movie_title"))
+            for ticket in view.get("tickets", []):
+                if ticket.get("status") == "cancelled" or not ticket.get("barcode_data"):
+                    continue
+                tickets.append([ticket["barcode_data"], ticket["ticket_id"], index,
+                                ticket.get("seat_code"), ticket.get("status")])
+
+    payload = {
+        "version": MANIFEST_VERSION,
+        "manifest_id": str(ObjectId()),
+        "cinema": cinema,
+        "generated_at": now.isoformat(),
+        "expires_at": (now + timedelta(hours=MANIFEST_TTL_HOURS)).isoformat(),
+        "showtimes": [{
+            "showtime_id": str(st["_id"]),
+            "movie_title": movie_titles.get(index),
+            "hall": schedule["hall"],
+            "date": schedule["date"],
+            "time": schedule["time"]
+        } for index, (st, schedule) in enumerate(showtimes)],
+        "tickets": tickets
+    }
+    return {"manifest": payload, "signature": sign_payload(payload)}
+
+
+def checkin_tickets(db, checked_in_by: str, ticket_ids: Optional[List[str]] = None,
+                    booking_id: Optional[str] = None, gate: Optional[str] = None):
+    """
+    Check-in một danh sách vé hoặc cả booking bằng một update_many có điều kiện,
+    kết quả từng vé lấy từ một lần đọc lại (theo batch marker)
+
+    Returns:
+        tuple: (checked_in_ticket_ids, failed_tickets)
+    """
+    if ticket_ids:
+        ticket_ids = [str(ticket_id) for ticket_id in ticket_ids]
+        ticket_filter = {"_id": {"$in": ticket_ids}}
+    else:
+        # tickets lưu booking_id dạng string
+        ticket_filter = {"booking_id": booking_id}
+
+    checked_in_at = datetime.now()
+    batch_id = f"chk{str(ObjectId())}"
+    db.tickets.update_many(
+        {**ticket_filter, "status": {"$in": CHECKIN_ALLOWED_STATUSES}},
+        {"$set": {
+            "status": "checked_in",
+            "checked_in_at": checked_in_at,
+            "checked_in_by": checked_in_by,
+            "checkin_batch": batch_id
+        }}
+    )
+
+    tickets = {
+        str(ticket["_id"]): ticket
+        for ticket in db.tickets.find(ticket_filter, {"status": 1, "checkin_batch": 1})
+    }
+
+    checked_in = []
+    failed = []
+    for ticket_id in ticket_ids or list(tickets):
+        ticket = tickets.get(ticket_id)
+        if ticket is None:
+            failed.append({"ticket_id": ticket_id, "error": "Không tìm thấy vé"})
+        elif ticket.get("checkin_batch") == batch_id:
+            checked_in.append(ticket_id)
+        elif ticket.get("status") == "checked_in":
+            failed.append({"ticket_id": ticket_id, "error": "Vé đã được check-in rồi"})
+        elif ticket.get("status") == "cancelled":
+            failed.append({"ticket_id": ticket_id, "error": "Vé đã bị hủy"})
+        else:
+            failed.append({"ticket_id": ticket_id, "error": "Không thể cập nhật trạng thái vé"})
+
+    if checked_in:
+        mark_ticket_views_checked_in(db, checked_in, checked_in_at, checked_in_by, gate=gate)
+
+    return checked_in, failed
+
+
+def checkin_by_token(db, token: str, checked_in_by: str, gate: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Check-in một vé từ barcode đã ký: chữ ký và hạn kiểm tra trong bộ nhớ,
+    Mongo chỉ nhận lệnh update có điều kiện (đọc thêm khi check-in thất bại)
+
+    Raises:
+        InvalidTicketToken: Barcode giả hoặc hết hạn
+    """
+    claims = verify_ticket_token(token)
+    checked_in_at = datetime.now()
+    result = db.tickets.update_one(
+        {"_id": claims["ticket_id"], "status": {"$in": CHECKIN_ALLOWED_STATUSES}},
+        {"$set": {
+            "status": "checked_in",
+            "checked_in_at": checked_in_at,
+            "checked_in_by": checked_in_by
+        }}
+    )
+
+    if result.modified_count:
+        mark_ticket_views_checked_in(db, [claims["ticket_id"]], checked_in_at, checked_in_by, gate=gate)
+        return {**claims, "checked_in": True}
+
+    ticket = db.tickets.find_one({"_id": claims["ticket_id"]}, {"status": 1})
+    if ticket is None:
+        error = "Không tìm thấy vé"
+    elif ticket.get("status") == "checked_in":
+        error = "Vé đã được check-in rồi"
+    elif ticket.get("status") == "cancelled":
+        error = "Vé đã bị hủy"
+    else:
+        error = "Không thể cập nhật trạng thái vé"
+    return {**claims, "checked_in": False, "error": error}
+
+
+def _parse_scanned_at(value, default: datetime) -> datetime:
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return default
+
+
+def reconcile_scans(db, scans: List[Dict[str, Any]], checked_in_by: str,
+                    device_id: Optional[str] = None, manifest_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ghi nhận các barcode thiết bị đã quét offline
+
+    Một find theo barcode, một bulk_write (mỗi vé một UpdateOne có điều kiện
+    status còn hiệu lực, vé quét trước thắng), một find theo batch marker để
+    biết vé nào thực sự được check-in bởi batch này
+
+    Args:
+        db: Database instance
+        scans: [{"barcode_data": ..., "scanned_at": ISO time}, ...]
+        checked_in_by: Tên nhân viên
+        device_id: Mã thiết bị gác cổng
+        manifest_id: Manifest thiết bị đang dùng
+
+    Returns:
+        dict: accepted, already_checked_in, cancelled, unknown, invalid, duplicates
+    """
+    received_at = datetime.now(timezone.utc)
+    batch_id = f"chk{str(ObjectId())}"
+
+    # Mỗi barcode chỉ tính lần quét đầu tiên trong batch
+    scanned_at = {}
+    duplicates = []
+    invalid = []
+    for scan in scans:
+        barcode = scan.get("barcode_data") if isinstance(scan, dict) else scan
+        if not barcode:
+            continue
+        if barcode in scanned_at or barcode in invalid:
+            duplicates.append(barcode)
+            continue
+        # Barcode đã ký bị giả mạo/hết hạn thì loại luôn, không cần query
+        if is_ticket_token(barcode):
+            try:
+                verify_ticket_token(barcode)
+            except InvalidTicketToken:
+                invalid.append(barcode)
+                continue
+        scanned_at[barcode] = _parse_scanned_at(scan.get("scanned_at") if isinstance(scan, dict) else None, received_at)
+
+    tickets = list(db.tickets.find(
+        {"barcode_data": {"$in": list(scanned_at)}},
+        {"barcode_data": 1, "status": 1}
+    )) if scanned_at else []
+    found = {ticket["barcode_data"]: ticket for ticket in tickets}
+
+    operations = [
+        UpdateOne(
+            {"_id": ticket["_id"], "status": {"$in": CHECKIN_ALLOWED_STATUSES}},
+            {"$set": {
+                "status": "checked_in",
+                "checked_in_at": scanned_at[barcode],
+                "checked_in_by": checked_in_by,
+                "checkin_device": device_id,
+                "checkin_batch": batch_id
+            }}
+        )
+        for barcode, ticket in found.items()
+        if ticket.get("status") in CHECKIN_ALLOWED_STATUSES
+    ]
+    if operations:
+        db.tickets.bulk_write(operations, ordered=False)
+
+    accepted_ids = {
+        ticket["_id"] for ticket in db.tickets.find({"checkin_batch": batch_id}, {"_id": 1})
+    } if operations else set()
+
+    result = {"accepted": [], "already_checked_in": [], "cancelled": [], "unknown": [],
+              "invalid": invalid, "duplicates": duplicates}
+    for barcode in scanned_at:
+        ticket = found.get(barcode)
+        if ticket is None:
+            result["unknown"].append(barcode)
+        elif ticket["_id"] in accepted_ids:
+            result["accepted"].append(barcode)
+        elif ticket.get("status") == "cancelled":
+            result["cancelled"].append(barcode)
+        else:
+            result["already_checked_in"].append(barcode)
+
+    if accepted_ids:
+        # View và metrics của cổng ghi thời điểm quét trên thiết bị (giống tickets), không phải lúc upload
+        scan_times = {str(found[barcode]["_id"]): scanned_at[barcode] for barcode in result["accepted"]}
+        mark_ticket_views_checked_in(db, list(accepted_ids), received_at, checked_in_by,
+                                     gate=device_id, scanned_at=scan_times)
+
+    # Một bản ghi cho mỗi lần upload của thiết bị
+    db.checkinBatches.insert_one({
+        "_id": batch_id,
+        "device_id": device_id,
+        "manifest_id": manifest_id,
+        "checked_in_by": checked_in_by,
+        "received_at": received_at,
+        "scan_count": len(scans),
+        "accepted_count": len(result["accepted"]),
+        "rejected_count": len(scanned_at) + len(invalid) - len(result["accepted"])
+    })
+
+    result["batch_id"] = batch_id
+    return result
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Dashboard Counters for Cinema Management System
+Incrementally maintained per cinema/day counters backing the staff dashboard
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from services.seat_map_service import showtime_schedule, SHOWTIME_SCHEDULE_FIELDS
+
+# Suất chiếu "hiện tại" là suất bắt đầu trong khoảng ± số giờ này
+CURRENT_SHOW_WINDOW_HOURS = 1
+
+UNKNOWN_CINEMA = "unknown"
+
+# Document tổng của ngày (mọi rạp), dashboard không lọc rạp chỉ đọc document này
+ALL_CINEMAS = "*all"
+
+
+def counter_id(cinema: str, day: str) -> str:
+    return f"{day}:{cinema}"
+
+
+def _update_counters(db, cinema: str, day: str, update: Dict[str, Any], upsert: bool = False):
+    """Áp dụng cùng một thay đổi lên document của rạp và document tổng của ngày"""
+    for key in (cinema, ALL_CINEMAS):
+        doc_update = update
+        if upsert:
+            doc_update = {**update, "$set": {**update.get("$set", {}), "cinema": key, "day": day}}
+        db.dashboardCounters.update_one({"_id": counter_id(key, day)}, doc_update, upsert=upsert)
+
+
+def seeded_marker_id(day: str) -> str:
+    """Document đánh dấu ngày đã seed (kể cả ngày không có suất chiếu nào)"""
+    return f"{day}:*seeded"
+
+
+def today_str() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def _showtime_fields(showtime: Dict[str, Any]):
+    """Rạp/ngày/giờ của suất chiếu, cùng cách tính với booking_info của ticket view"""
+    schedule = showtime_schedule(showtime)
+    return schedule["cinema"] or UNKNOWN_CINEMA, schedule["date"], schedule["time"]
+
+
+def _view_fields(view: Dict[str, Any]):
+    """
+    booking_info của view được dựng từ showtime bằng showtime_schedule, nên lượt
+    thanh toán/hủy/check-in rơi vào cùng document (rạp, ngày) mà seed_day tính từ showtime
+    """
+    info = view.get("booking_info", {})
+    return str(info.get("cinema") or UNKNOWN_CINEMA), info.get("date"), info.get("time")
+
+
+def record_paid_booking(db, view: Dict[str, Any]):
+    """Booking đã thanh toán: khách có thêm vé chờ check-in ở suất chiếu này"""
+    cinema, day, time = _view_fields(view)
+    valid = sum(1 for ticket in view.get("tickets", []) if ticket.get("status") == "valid")
+    if not day or not valid:
+        return
+    showtime_path = f"showtimes.{view['showtime_id']}"
+    _update_counters(db, cinema, day, {
+        "$inc": {f"{showtime_path}.waiting.{view['customer_id']}": valid},
+        "$set": {f"{showtime_path}.time": time}
+    }, upsert=True)
+
+
+def record_cancelled_tickets(db, views: List[Dict[str, Any]]):
+    """
+    Vé của booking đã thanh toán bị hủy: giảm số vé chờ
+
+    Args:
+        views: Ticket views trước khi hủy (status, tickets)
+    """
+    for view in views:
+        if view.get("status") != "paid":
+            continue
+        cinema, day, _ = _view_fields(view)
+        valid = sum(1 for ticket in view.get("tickets", []) if ticket.get("status") == "valid")
+        if not day or not valid:
+            continue
+        _update_counters(db, cinema, day, {
+            "$inc": {f"showtimes.{view['showtime_id']}.waiting.{view['customer_id']}": -valid}
+        })
+
+
+def record_checkins(db, views: List[Dict[str, Any]], ticket_ids: List[str]):
+    """
+    Vé vừa check-in: tăng số check-in hôm nay của rạp, giảm số vé chờ của khách
+
+    Args:
+        views: Ticket views chứa các vé (trước khi cập nhật)
+        ticket_ids: Các vé thực sự được check-in
+    """
+    ticket_ids = set(str(ticket_id) for ticket_id in ticket_ids)
+    today = today_str()
+    checkins_by_cinema = {}
+    for view in views:
+        cinema, day, _ = _view_fields(view)
+        count = sum(1 for ticket in view.get("tickets", [])
+                    if ticket["ticket_id"] in ticket_ids and ticket.get("status") == "valid")
+        if not count:
+            continue
+        checkins_by_cinema[cinema] = checkins_by_cinema.get(cinema, 0) + count
+        if day and view.get("status") == "paid":
+            _update_counters(db, cinema, day, {
+                "$inc": {f"showtimes.{view['showtime_id']}.waiting.{view['customer_id']}": -count}
+            })
+
+    for cinema, count in checkins_by_cinema.items():
+        _update_counters(db, cinema, today, {"$inc": {"checkins": count}}, upsert=True)
+
+
+def seed_day(db, day: str):
+    """
+    Tính lại counters của một ngày từ dữ liệu gốc (lần đầu dashboard được mở trong ngày)
+
+    Mỗi ngày chỉ seed một lần (marker). Lượt cập nhật xảy ra đúng lúc đang seed
+    có thể bị ghi đè, sai lệch nhỏ này chấp nhận được cho dashboard
+    """
+    docs = {}
+
+    def doc_for(cinema):
+        return docs.setdefault(cinema, {
+            "_id": counter_id(cinema, day), "cinema": cinema, "day": day,
+            "checkins": 0, "showtimes": {}
+        })
+
+    showtimes = db.showtimes.find(
+        {"$or": [{"date": day}, {"start_date": day}], "status": {"$in": [None, "active"]}},
+        SHOWTIME_SCHEDULE_FIELDS
+    )
+    for showtime in showtimes:
+        cinema, _, time = _showtime_fields(showtime)
+        doc_for(cinema)["showtimes"][str(showtime["_id"])] = {"time": time, "waiting": {}}
+
+    for view in db.ticket_views.find({"status": "paid", "booking_info.date": day},
+                                     {"customer_id": 1, "showtime_id": 1, "booking_info": 1, "tickets.status": 1}):
+        cinema, _, time = _view_fields(view)
+        valid = sum(1 for ticket in view.get("tickets", []) if ticket.get("status") == "valid")
+        if not valid:
+            continue
+        showtime = doc_for(cinema)["showtimes"].setdefault(view["showtime_id"], {"time": time, "waiting": {}})
+        showtime["waiting"][view["customer_id"]] = showtime["waiting"].get(view["customer_id"], 0) + valid
+
+    # Check-in trong ngày (theo ticket_views, bất kể ngày chiếu)
+    day_start = datetime.strptime(day, "%Y-%m-%d")
+    day_end = day_start + timedelta(days=1)
+    checkins = db.ticket_views.aggregate([
+        {"$match": {"tickets.checked_in_at": {"$gte": day_start, "$lt": day_end}}},
+        {"$unwind": "$tickets"},
+        {"$match": {"tickets.checked_in_at": {"$gte": day_start, "$lt": day_end}}},
+        {"$group": {"_id": "$booking_info.cinema", "count": {"$sum": 1}}}
+    ])
+    for row in checkins:
+        doc_for(str(row["_id"] or UNKNOWN_CINEMA))["checkins"] = row["count"]
+
+    # Document tổng: showtime _id không trùng giữa các rạp nên gộp thẳng
+    total = {"_id": counter_id(ALL_CINEMAS, day), "cinema": ALL_CINEMAS, "day": day, "checkins": 0, "showtimes": {}}
+    for doc in docs.values():
+        total["checkins"] += doc["checkins"]
+        total["showtimes"].update(doc["showtimes"])
+    docs[ALL_CINEMAS] = total
+
+    for doc in docs.values():
+        db.dashboardCounters.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    # Ghi marker sau cùng: seed lỗi giữa chừng thì lần đọc sau seed lại
+    db.dashboardCounters.replace_one(
+        {"_id": seeded_marker_id(day)},
+        {"_id": seeded_marker_id(day), "day": day, "marker": True, "seeded_at": datetime.now()},
+        upsert=True
+    )
+    return list(docs.values())
+
+
+def get_dashboard_stats(db, cinema: Optional[str] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Stats cho staff dashboard từ counter documents của hôm nay"""
+    now = now or datetime.now()
+    day = now.strftime("%Y-%m-%d")
+
+    # Một document counter (của rạp, hoặc document tổng) + marker của ngày trong cùng query:
+    # có marker thì không seed lại, kể cả khi ngày/rạp không có document counter nào
+    query = {"_id": {"$in": [counter_id(cinema or ALL_CINEMAS, day), seeded_marker_id(day)]}}
+    docs = list(db.dashboardCounters.find(query))
+    if not any(doc.get("marker") for doc in docs):
+        seed_day(db, day)
+        docs = list(db.dashboardCounters.find(query))
+    docs = [doc for doc in docs if not doc.get("marker")]
+
+    window_start = (now - timedelta(hours=CURRENT_SHOW_WINDOW_HOURS)).strftime("%H:%M")
+    window_end = (now + timedelta(hours=CURRENT_SHOW_WINDOW_HOURS)).strftime("%H:%M")
+
+    stats = {"today_checkins": 0, "current_shows": 0, "waiting_customers": 0}
+    waiting_customers = set()
+    for doc in docs:
+        stats["today_checkins"] += doc.get("checkins", 0)
+        for showtime in doc.get("showtimes", {}).values():
+            time = showtime.get("time")
+            if not time or not (window_start <= time <= window_end):
+                continue
+            stats["current_shows"] += 1
+            waiting_customers.update(
+                customer for customer, count in showtime.get("waiting", {}).items() if count > 0
+            )
+    stats["waiting_customers"] = len(waiting_customers)
+    return stats
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Gate Metrics for Cinema Management System
+Per-minute check-in counts per showtime/gate and queue drain estimates
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from services.seat_map_service import showtime_id_candidates
+
+# Tốc độ quét tính trên số phút gần nhất này
+THROUGHPUT_WINDOW_MINUTES = 10
+
+# Bucket cũ hơn số ngày này bị xóa (TTL index)
+GATE_METRICS_TTL_DAYS = 7
+
+DEFAULT_GATE = "unknown"
+
+
+def _local_minute(value: datetime) -> datetime:
+    """Bucket theo phút, giờ local không timezone (giống showtime date/time)"""
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.replace(second=0, microsecond=0)
+
+
+def record_gate_scans(db, views: List[Dict[str, Any]], checked_in_at: Dict[str, datetime], gate: Optional[str]):
+    """
+    Cộng số vé check-in vào bucket (suất chiếu, cổng, phút), mỗi bucket một upsert $inc
+
+    Args:
+        views: Ticket views chứa các vé (trước khi cập nhật)
+        checked_in_at: ticket_id -> thời điểm check-in của các vé thực sự được check-in
+        gate: Cổng/thiết bị, mặc định là nhân viên check-in
+    """
+    gate = str(gate or DEFAULT_GATE)
+    buckets = {}
+    for view in views:
+        for ticket in view.get("tickets", []):
+            scanned_at = checked_in_at.get(ticket["ticket_id"])
+            if scanned_at is None or ticket.get("status") != "valid":
+                continue
+            key = (view["showtime_id"], _local_minute(scanned_at))
+            buckets[key] = buckets.get(key, 0) + 1
+
+    for (showtime_id, minute), count in buckets.items():
+        db.gateMetrics.update_one(
+            {"_id": f"{showtime_id}:{gate}:{minute.strftime('%Y-%m-%dT%H:%M')}"},
+            {
+                "$inc": {"scans": count},
+                "$set": {"showtime_id": showtime_id, "gate": gate, "minute": minute}
+            },
+            upsert=True
+        )
+
+
+def showtime_start(showtime: Dict[str, Any]) -> Optional[datetime]:
+    """Giờ bắt đầu theo date/time hoặc start_date/start_time"""
+    day = showtime.get("date") or showtime.get("start_date")
+    time = showtime.get("time") or showtime.get("start_time")
+    try:
+        return datetime.strptime(f"{day} {time}", "%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return None
+
+
+def count_unchecked_tickets(db, showtime_id: str) -> int:
+    """Vé còn hiệu lực chưa check-in của suất chiếu (ticket_views, index showtime_id + status)"""
+    result = list(db.ticket_views.aggregate([
+        {"$match": {"showtime_id": showtime_id, "status": "paid"}},
+        {"$unwind": "$tickets"},
+        {"$match": {"tickets.status": "valid"}},
+        {"$count": "remaining"}
+    ]))
+    return result[0]["remaining"] if result else 0
+
+
+def get_gate_report(db, showtime_id, window_minutes: int = THROUGHPUT_WINDOW_MINUTES,
+                    now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    Tốc độ quét từng cổng, số vé chưa check-in và thời gian dự kiến để hết hàng đợi
+
+    Returns:
+        dict hoặc None nếu không tìm thấy suất chiếu
+    """
+    now = now or datetime.now()
+    showtime = db.showtimes.find_one(
+        {"_id": {"$in": showtime_id_candidates(showtime_id)}},
+        {"date": 1, "time": 1, "start_date": 1, "start_time": 1}
+    )
+    if not showtime:
+        return None
+    showtime_id = str(showtime["_id"])
+    starts_at = showtime_start(showtime)
+
+    # Phút hiện tại chưa đủ dữ liệu nên cửa sổ tính tới hết phút trước
+    window_end = _local_minute(now)
+    window_start = window_end - timedelta(minutes=window_minutes)
+
+    gates = {}
+    for bucket in db.gateMetrics.find({"showtime_id": showtime_id}, {"gate": 1, "minute": 1, "scans": 1}):
+        gate = gates.setdefault(bucket["gate"], {"gate": bucket["gate"], "total_scans": 0,
+                                                  "recent_scans": 0, "last_scan_minute": None})
+        gate["total_scans"] += bucket["scans"]
+        if window_start <= bucket["minute"] < window_end:
+            gate["recent_scans"] += bucket["scans"]
+        if gate["last_scan_minute"] is None or bucket["minute"] > gate["last_scan_minute"]:
+            gate["last_scan_minute"] = bucket["minute"]
+
+    for gate in gates.values():
+        gate["scans_per_minute"] = round(gate.pop("recent_scans") / window_minutes, 2)
+        gate["last_scan_minute"] = gate["last_scan_minute"].isoformat()
+
+    remaining = count_unchecked_tickets(db, showtime_id)
+    scans_per_minute = round(sum(gate["scans_per_minute"] for gate in gates.values()), 2)
+    active_gates = [gate for gate in gates.values() if gate["scans_per_minute"] > 0]
+
+    eta_minutes = None
+    drained_at = None
+    if remaining == 0:
+        eta_minutes = 0
+    elif scans_per_minute > 0:
+        eta_minutes = math.ceil(remaining / scans_per_minute)
+        drained_at = (now + timedelta(minutes=eta_minutes)).isoformat()
+
+    minutes_until_start = None
+    required_scans_per_minute = None
+    gates_needed = None
+    if starts_at is not None:
+        minutes_until_start = max(int((starts_at - now).total_seconds() // 60), 0)
+        if remaining and minutes_until_start:
+            required_scans_per_minute = round(remaining / minutes_until_start, 2)
+            # Số cổng cần mở nếu mỗi cổng giữ tốc độ trung bình hiện tại
+            if active_gates:
+                per_gate = scans_per_minute / len(active_gates)
+                gates_needed = math.ceil(required_scans_per_minute / per_gate)
+
+    return {
+        "showtime_id": showtime_id,
+        "starts_at": starts_at.isoformat() if starts_at else None,
+        "window_minutes": window_minutes,
+        "gates": sorted(gates.values(), key=lambda gate: gate["gate"]),
+        "scans_per_minute": scans_per_minute,
+        "remaining_tickets": remaining,
+        "eta_minutes": eta_minutes,
+        "drained_at": drained_at,
+        "minutes_until_start": minutes_until_start,
+        "required_scans_per_minute": required_scans_per_minute,
+        "gates_needed": gates_needed,
+        "on_track": eta_minutes is not None and minutes_until_start is not None and eta_minutes <= minutes_until_start
+    }
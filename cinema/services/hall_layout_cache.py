@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Hall Layout Cache for Cinema Management System
+Keeps the seat layout of each hall in memory (seat_id <-> seat_code <-> seat_type)
+"""
+
+import hashlib
+import re
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+from services.seat_map_service import normalize_seat_code
+
+_SEAT_CODE_PATTERN = re.compile(r"^([A-Z]*)(\d*)")
+
+
+def seat_sort_key(seat_code: str):
+    """Sort key theo hàng rồi cột: A1 < A2 < A10 < B1"""
+    match = _SEAT_CODE_PATTERN.match(seat_code)
+    row, column = match.group(1), match.group(2)
+    return (row, int(column) if column else 0, seat_code)
+
+
+class HallLayout:
+    """Layout ghế của một phòng chiếu, đã sắp xếp theo hàng/cột"""
+
+    def __init__(self, hall_id, seat_docs: List[Dict[str, Any]]):
+        self.hall_id = hall_id
+        self.seats = []
+        for seat in seat_docs:
+            self.seats.append({
+                "_id": seat["_id"],
+                "seat_code": normalize_seat_code(seat["seat_code"]),
+                "seat_type": seat.get("seat_type", "NORMAL"),
+                "is_broken": bool(seat.get("is_broken")) or seat.get("status") == "broken"
+            })
+        self.seats.sort(key=lambda seat: seat_sort_key(seat["seat_code"]))
+
+        # Ordinal ổn định theo thứ tự hàng/cột, dùng làm index cho SeatOccupancy
+        for ordinal, seat in enumerate(self.seats):
+            seat["ordinal"] = ordinal
+
+        # Version thay đổi khi danh sách ghế/loại ghế thay đổi, client dùng để cache layout
+        signature = "|".join(f"{seat['seat_code']}:{seat['seat_type']}" for seat in self.seats)
+        self.version = hashlib.md5(signature.encode("utf-8")).hexdigest()[:12]
+
+        self.by_id = {str(seat["_id"]): seat for seat in self.seats}
+        self.by_code = {seat["seat_code"]: seat for seat in self.seats}
+
+    def seats_for_codes(self, seat_codes) -> List[Dict[str, Any]]:
+        """Lấy các ghế theo danh sách seat_code (bỏ trùng, giữ thứ tự), bỏ qua mã không tồn tại"""
+        result = []
+        for seat_code in dict.fromkeys(normalize_seat_code(code) for code in seat_codes):
+            seat = self.by_code.get(seat_code)
+            if seat:
+                result.append(seat)
+        return result
+
+    def seats_for_ids(self, seat_ids) -> List[Dict[str, Any]]:
+        """Lấy các ghế theo danh sách seat_id (bỏ trùng, giữ thứ tự), bỏ qua id không tồn tại"""
+        result = []
+        for seat_id in dict.fromkeys(str(seat_id) for seat_id in seat_ids):
+            seat = self.by_id.get(seat_id)
+            if seat:
+                result.append(seat)
+        return result
+
+
+class HallLayoutCache:
+    def __init__(self, db_connection, ttl_seconds: int = 600):
+        self.db = db_connection
+        self.ttl_seconds = ttl_seconds
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    def get(self, hall_id) -> HallLayout:
+        """
+        Lấy layout của phòng chiếu, load từ db.seats nếu chưa có hoặc đã hết hạn
+
+        Args:
+            hall_id: ID của phòng chiếu
+
+        Returns:
+            HallLayout: Layout ghế của phòng
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._layouts.get(hall_id)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        seat_docs = list(self.db.seats.find(
+            {"hall_id": hall_id},
+            {"seat_code": 1, "seat_type": 1, "is_broken": 1, "status": 1}
+        ))
+        layout = HallLayout(hall_id, seat_docs)
+
+        with self._lock:
+            self._layouts[hall_id] = (now + self.ttl_seconds, layout)
+        return layout
+
+    def invalidate(self, hall_id=None):
+        """Xóa layout của một phòng (hoặc toàn bộ cache nếu hall_id là None)"""
+        with self._lock:
+            if hall_id is None:
+                self._layouts.clear()
+            else:
+                self._layouts.pop(hall_id, None)
+
+
+# Global hall layout cache instance
+hall_layout_cache = None
+
+def init_hall_layout_cache(db_connection, ttl_seconds: int = 600):
+    """Initialize the global hall layout cache"""
+    global hall_layout_cache
+    hall_layout_cache = HallLayoutCache(db_connection, ttl_seconds)
+    return hall_layout_cache
+
+def get_hall_layout_cache() -> Optional[HallLayoutCache]:
+    """Get the global hall layout cache instance"""
+    return hall_layout_cache
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Idempotency Service for Cinema Management System
+Replays the stored response of a write endpoint when a client retries with the same Idempotency-Key
+"""
+
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from typing import Optional, Dict, Any
+from flask import request, jsonify, make_response
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Thời gian giữ response đã lưu (TTL index trên created_at, khai báo trong index_service)
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+
+MAX_KEY_LENGTH = 128
+
+# Request giữ key trong thời gian này; worker chết giữa chừng thì retry sau lease được xử lý lại
+IDEMPOTENCY_LEASE_SECONDS = 60
+
+
+class IdempotencyStore:
+    """Lưu trạng thái và response của mỗi (user, endpoint, key) trong idempotencyKeys"""
+
+    def __init__(self, db, lease_seconds: int = IDEMPOTENCY_LEASE_SECONDS):
+        self.db = db
+        self.collection = db.idempotencyKeys if db is not None else None
+        self.lease_seconds = lease_seconds
+
+    def begin(self, key_id: str, request_hash: str, lease_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Đánh dấu request đang xử lý, giữ key tới lease_until
+
+        Record in_progress đã quá lease (worker chết trước khi complete/discard)
+        được request cùng nội dung tiếp quản bằng một find_one_and_update có điều kiện
+
+        Args:
+            lease_id: Định danh của lần xử lý này, complete/discard chỉ áp dụng khi còn giữ lease
+
+        Returns:
+            None nếu request này được xử lý, ngược lại là document đã lưu
+        """
+        now = datetime.now(timezone.utc)
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        try:
+            self.collection.insert_one({
+                "_id": key_id,
+                "status": "in_progress",
+                "request_hash": request_hash,
+                "lease_id": lease_id,
+                "started_at": now,
+                "lease_until": lease_until,
+                "created_at": now
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        taken_over = self.collection.find_one_and_update(
+            {
+                "_id": key_id,
+                "status": "in_progress",
+                "request_hash": request_hash,
+                "$or": [
+                    {"lease_until": {"$lt": now}},
+                    # Record tạo trước khi có lease
+                    {"lease_until": {"$exists": False},
+                     "created_at": {"$lt": now - timedelta(seconds=self.lease_seconds)}}
+                ]
+            },
+            {"$set": {"lease_id": lease_id, "started_at": now, "lease_until": lease_until}},
+            return_document=ReturnDocument.AFTER
+        )
+        if taken_over is not None:
+            return None
+        return self.collection.find_one({"_id": key_id}) or {"status": "in_progress", "request_hash": request_hash}
+
+    def complete(self, key_id: str, lease_id: str, status_code: int, body: str):
+        self.collection.update_one(
+            {"_id": key_id, "lease_id": lease_id},
+            {"$set": {
+                "status": "completed",
+                "status_code": status_code,
+                "response_body": body,
+                "completed_at": datetime.now(timezone.utc)
+            }}
+        )
+
+    def discard(self, key_id: str, lease_id: str):
+        """Request lỗi phía server, xóa key để client retry được"""
+        self.collection.delete_one({"_id": key_id, "lease_id": lease_id})
+
+
+def _request_hash() -> str:
+    return hashlib.sha256(request.get_data() or b"").hexdigest()
+
+
+def idempotent(endpoint: str):
+    """
+    Decorator cho endpoint ghi dữ liệu, đặt dưới @require_auth (nhận current_user)
+
+    Request không có header Idempotency-Key được xử lý như bình thường
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(current_user, *args, **kwargs):
+            store = get_idempotency_store()
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if store is None or store.collection is None or not key:
+                return f(current_user, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} too long"}), 400
+
+            key_id = f"{current_user['_id']}:{endpoint}:{key}"
+            request_hash = _request_hash()
+
+            lease_id = uuid.uuid4().hex
+            existing = store.begin(key_id, request_hash, lease_id)
+            if existing is not None:
+                if existing.get("request_hash") != request_hash:
+                    return jsonify({"error": f"{IDEMPOTENCY_HEADER} reused with a different request"}), 422
+                if existing.get("status") != "completed":
+                    return jsonify({"error": "Request with this idempotency key is still in progress"}), 409
+                replay = make_response(existing.get("response_body", ""), existing.get("status_code", 200))
+                replay.mimetype = "application/json"
+                replay.headers["Idempotent-Replayed"] = "true"
+                return replay
+
+            try:
+                response = make_response(f(current_user, *args, **kwargs))
+            except Exception:
+                store.discard(key_id, lease_id)
+                raise
+
+            # Chỉ lưu response có kết quả xác định (2xx/4xx), lỗi 5xx cho phép retry
+            if response.status_code < 500:
+                store.complete(key_id, lease_id, response.status_code, response.get_data(as_text=True))
+            else:
+                store.discard(key_id, lease_id)
+            return response
+        return wrapper
+    return decorator
+
+
+# Global idempotency store instance
+idempotency_store = None
+
+def init_idempotency_store(db):
+    """Initialize the global idempotency store"""
+    global idempotency_store
+    idempotency_store = IdempotencyStore(db)
+    return idempotency_store
+
+def get_idempotency_store():
+    """Get the global idempotency store instance"""
+    return idempotency_store
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Index Service for Cinema Management System
+Declares every index the routes rely on, creates them at startup and reports drift
+"""
+
+from typing import Dict, Any, List
+from pymongo.errors import PyMongoError
+
+from services.idempotency_service import IDEMPOTENCY_TTL_SECONDS
+from services.gate_metrics import GATE_METRICS_TTL_DAYS
+
+# Mỗi index: collection, keys và options (unique, expireAfterSeconds, ...)
+# Index của logs do LoggingService.create_logs_indexes tạo
+INDEX_SPECS: List[Dict[str, Any]] = [
+    # Seat map, conflict check, cleanup theo showtime
+    {"collection": "bookings", "keys": [("showtime_id", 1), ("status", 1)]},
+    # my-tickets, booking-history theo customer (mới nhất trước)
+    {"collection": "bookings", "keys": [("customer_id", 1), ("created_at", -1), ("_id", -1)]},
+    # Dọn booking pending quá hạn
+    {"collection": "bookings", "keys": [("status", 1), ("created_at", 1)]},
+    # Hủy booking theo ghế hỏng (multikey trên seats)
+    {"collection": "bookings", "keys": [("seats", 1), ("showtime_id", 1)]},
+
+    {"collection": "tickets", "keys": [("booking_id", 1)]},
+    # Soát vé theo barcode
+    {"collection": "tickets", "keys": [("barcode_data", 1)]},
+    # Đối soát check-in theo batch
+    {"collection": "tickets", "keys": [("checkin_batch", 1)], "options": {"sparse": True}},
+
+    # Layout phòng chiếu, tìm ghế theo mã
+    {"collection": "seats", "keys": [("hall_id", 1), ("seat_code", 1)]},
+
+    {"collection": "seatlocks", "keys": [("showtime_id", 1), ("status", 1), ("expires_at", 1)]},
+    # Payment tìm lock của customer
+    {"collection": "seatlocks", "keys": [("showtime_id", 1), ("user_id", 1), ("status", 1)]},
+    # Sweeper seat lock hết hạn
+    {"collection": "seatlocks", "keys": [("status", 1), ("expires_at", 1)]},
+    {"collection": "seatlocks", "keys": [("session_id", 1)]},
+
+    # Mỗi ghế của một suất chiếu chỉ có một lock, MongoDB tự xóa lock hết hạn
+    {"collection": "lockedSeats", "keys": [("showtime_id", 1), ("seat_code", 1)], "options": {"unique": True}},
+    {"collection": "lockedSeats", "keys": [("session_id", 1)]},
+    {"collection": "lockedSeats", "keys": [("expires_at", 1)], "options": {"expireAfterSeconds": 0}},
+
+    {"collection": "showtimes", "keys": [("movie_id", 1)]},
+    {"collection": "showtimes", "keys": [("cinema_id", 1)]},
+
+    # Dữ liệu import có thể trùng email nên không đặt unique (register đã kiểm tra)
+    {"collection": "users", "keys": [("email", 1)]},
+
+    # /api/movies/showing, /api/movies/coming-soon: keyset theo created_at
+    {"collection": "movies", "keys": [("status", 1), ("created_at", -1), ("_id", -1)]},
+    # /api/movies?sort=views
+    {"collection": "movies", "keys": [("views", -1), ("_id", -1)]},
+
+    {"collection": "payments", "keys": [("booking_id", 1)]},
+    {"collection": "payments", "keys": [("time", 1)]},
+
+    {"collection": "brokenSeats", "keys": [("seat_id", 1), ("hall", 1), ("cinema", 1), ("status", 1)]},
+    {"collection": "brokenSeats", "keys": [("report_time", -1)]},
+
+    # my-tickets theo customer, soát vé theo barcode / ticket id
+    {"collection": "ticket_views", "keys": [("customer_id", 1), ("status", 1), ("created_at", -1)]},
+    {"collection": "ticket_views", "keys": [("tickets.barcode_data", 1)]},
+    {"collection": "ticket_views", "keys": [("tickets.ticket_id", 1)]},
+    # Manifest check-in theo suất chiếu
+    {"collection": "ticket_views", "keys": [("showtime_id", 1), ("status", 1)]},
+    # Seed dashboard counters theo ngày chiếu
+    {"collection": "ticket_views", "keys": [("booking_info.date", 1), ("status", 1)]},
+
+    {"collection": "dashboardCounters", "keys": [("day", 1)]},
+
+    # Xóa gợi ý của lần dựng trước
+    {"collection": "recommendations", "keys": [("refreshed_at", 1)]},
+
+    {"collection": "gateMetrics", "keys": [("showtime_id", 1), ("minute", 1)]},
+    {"collection": "gateMetrics", "keys": [("minute", 1)], "options": {"expireAfterSeconds": GATE_METRICS_TTL_DAYS * 24 * 60 * 60}},
+
+    {"collection": "idempotencyKeys", "keys": [("created_at", 1)], "options": {"expireAfterSeconds": IDEMPOTENCY_TTL_SECONDS}},
+]
+
+# Options được so sánh khi kiểm tra drift
+COMPARED_OPTIONS = ("unique", "expireAfterSeconds", "sparse", "partialFilterExpression")
+
+
+def _normalize_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: options[key] for key in COMPARED_OPTIONS if options.get(key) not in (None, False)}
+
+
+def ensure_indexes(db, specs: List[Dict[str, Any]] = None) -> List[str]:
+    """
+    Tạo các index đã khai báo (create_index không làm gì nếu index đã tồn tại)
+
+    Returns:
+        list: Lỗi khi tạo index (thường là index cùng keys nhưng khác options)
+    """
+    errors = []
+    for spec in specs or INDEX_SPECS:
+        try:
+            db[spec["collection"]].create_index(spec["keys"], **spec.get("options", {}))
+        except PyMongoError as e:
+            errors.append(f"{spec['collection']} {spec['keys']}: {e}")
+    return errors
+
+
+def verify_indexes(db, specs: List[Dict[str, Any]] = None) -> Dict[str, List[str]]:
+    """
+    So sánh index thực tế với khai báo
+
+    Returns:
+        dict: {"missing": [...], "mismatched": [...], "undeclared": [...]}
+    """
+    specs = specs or INDEX_SPECS
+    drift = {"missing": [], "mismatched": [], "undeclared": []}
+
+    declared = {}
+    for spec in specs:
+        declared.setdefault(spec["collection"], {})[tuple(spec["keys"])] = _normalize_options(spec.get("options", {}))
+
+    for collection, declared_indexes in declared.items():
+        try:
+            existing = {
+                tuple((field, direction) for field, direction in info["key"]): (name, _normalize_options(info))
+                for name, info in db[collection].index_information().items()
+                if name != "_id_"
+            }
+        except PyMongoError as e:
+            drift["missing"].append(f"{collection}: cannot read indexes ({e})")
+            continue
+
+        for keys, options in declared_indexes.items():
+            if keys not in existing:
+                drift["missing"].append(f"{collection} {list(keys)}")
+            elif existing[keys][1] != options:
+                drift["mismatched"].append(f"{collection}.{existing[keys][0]} has {existing[keys][1]}, expected {options}")
+
+        for keys, (name, _) in existing.items():
+            if keys not in declared_indexes:
+                drift["undeclared"].append(f"{collection}.{name}")
+
+    return drift
+
+
+def bootstrap_indexes(db) -> Dict[str, List[str]]:
+    """Tạo và kiểm tra index khi khởi động app, in báo cáo drift"""
+    if db is None:
+        return {}
+
+    for error in ensure_indexes(db):
+        print(f"❌ Error creating index {error}")
+
+    drift = verify_indexes(db)
+    if not drift["missing"] and not drift["mismatched"]:
+        print(f"✅ Indexes verified ({len(INDEX_SPECS)} declared)")
+    for item in drift["missing"]:
+        print(f"❌ Missing index: {item}")
+    for item in drift["mismatched"]:
+        print(f"⚠️ Index options drift: {item}")
+    for item in drift["undeclared"]:
+        print(f"ℹ️ Undeclared index: {item}")
+    return drift
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Movie Search for Cinema Management System
+In-process inverted index over title, description, director and cast with Vietnamese diacritic folding
+"""
+
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional
+
+# Trọng số theo field: khớp tiêu đề quan trọng hơn khớp mô tả
+FIELD_WEIGHTS = {"title": 5.0, "director": 2.0, "cast": 2.0, "description": 1.0}
+
+# Từ cuối của query được tìm theo tiền tố (gõ tới đâu gợi ý tới đó), điểm thấp hơn khớp nguyên từ
+PREFIX_MATCH_FACTOR = 0.6
+
+# Index được dựng lại sau thời gian này (thay đổi từ worker khác / script import)
+SEARCH_INDEX_TTL_SECONDS = 300
+
+AUTOCOMPLETE_LIMIT = 8
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def fold_text(text: str) -> str:
+    """Bỏ dấu tiếng Việt và viết thường: 'Đất Rừng Phương Nam' -> 'dat rung phuong nam'"""
+    text = str(text).lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text) -> List[str]:
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = " ".join(str(item) for item in text)
+    return _TOKEN_PATTERN.findall(fold_text(text))
+
+
+class MovieSearchIndex:
+    def __init__(self, db_connection, ttl_seconds: int = SEARCH_INDEX_TTL_SECONDS):
+        self.db = db_connection
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._expires_at = 0
+        # token -> {movie_id: điểm}
+        self._postings = {}
+        # Danh sách token đã sắp xếp, tìm tiền tố bằng bisect
+        self._vocabulary = []
+        # movie_id -> {title, status, created_at}
+        self._movies = {}
+
+    def _build(self):
+        postings = {}
+        movies = {}
+        for movie in self.db.movies.find({}, {"title": 1, "description": 1, "director": 1, "cast": 1,
+                                               "status": 1, "created_at": 1}):
+            movie_id = str(movie["_id"])
+            movies[movie_id] = {
+                "title": movie.get("title", ""),
+                "status": movie.get("status"),
+                "created_at": movie.get("created_at")
+            }
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(movie.get(field)):
+                    scores = postings.setdefault(token, {})
+                    scores[movie_id] = scores.get(movie_id, 0) + weight
+        return postings, sorted(postings), movies
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._expires_at > now:
+            return
+        with self._lock:
+            if self._expires_at > now:
+                return
+            self._postings, self._vocabulary, self._movies = self._build()
+            self._expires_at = now + self.ttl_seconds
+
+    def invalidate(self):
+        """Dựng lại index ở lần tìm kiếm tiếp theo"""
+        self._expires_at = 0
+
+    def _token_scores(self, token: str, prefix: bool) -> Dict[str, float]:
+        scores = dict(self._postings.get(token, {}))
+        if prefix:
+            start = bisect.bisect_left(self._vocabulary, token)
+            for candidate in self._vocabulary[start:]:
+                if not candidate.startswith(token):
+                    break
+                if candidate == token:
+                    continue
+                for movie_id, score in self._postings[candidate].items():
+                    scores[movie_id] = max(scores.get(movie_id, 0), score * PREFIX_MATCH_FACTOR)
+        return scores
+
+    def search(self, query: str, statuses: Optional[List[str]] = None) -> List[str]:
+        """
+        Movie ids khớp tất cả các từ trong query, điểm cao nhất trước
+
+        Args:
+            query: Chuỗi tìm kiếm (có dấu hoặc không dấu)
+            statuses: Chỉ lấy phim có status trong danh sách này
+
+        Returns:
+            list: Movie ids đã xếp hạng
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        self._ensure_fresh()
+        movies = self._movies
+
+        ranked = None
+        for index, token in enumerate(tokens):
+            scores = self._token_scores(token, prefix=index == len(tokens) - 1)
+            if ranked is None:
+                ranked = scores
+            else:
+                ranked = {movie_id: ranked[movie_id] + score
+                          for movie_id, score in scores.items() if movie_id in ranked}
+            if not ranked:
+                return []
+
+        if statuses is not None:
+            ranked = {movie_id: score for movie_id, score in ranked.items()
+                      if movies.get(movie_id, {}).get("status") in statuses}
+
+        # Cùng điểm thì phim mới hơn trước
+        def sort_key(movie_id):
+            created_at = movies.get(movie_id, {}).get("created_at")
+            return (-ranked[movie_id], -created_at.timestamp() if hasattr(created_at, "timestamp") else 0, movie_id)
+
+        return sorted(ranked, key=sort_key)
+
+    def autocomplete(self, prefix: str, statuses: Optional[List[str]] = None,
+                     limit: int = AUTOCOMPLETE_LIMIT) -> List[Dict[str, str]]:
+        """Gợi ý tiêu đề phim theo những gì người dùng đang gõ"""
+        movie_ids = self.search(prefix, statuses)[:limit]
+        return [{"id": movie_id, "title": self._movies[movie_id]["title"]}
+                for movie_id in movie_ids if movie_id in self._movies]
+
+
+# Global movie search index instance
+movie_search_index = None
+
+def init_movie_search_index(db_connection, ttl_seconds: int = SEARCH_INDEX_TTL_SECONDS):
+    """Initialize the global movie search index"""
+    global movie_search_index
+    movie_search_index = MovieSearchIndex(db_connection, ttl_seconds)
+    return movie_search_index
+
+def get_movie_search_index() -> Optional[MovieSearchIndex]:
+    """Get the global movie search index instance"""
+    return movie_search_index
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Pagination helpers for Cinema Management System
+Keyset (cursor) pagination over a sort field plus _id as tie-breaker
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursorError(ValueError):
+    """Cursor không giải mã được"""
+
+
+def parse_limit(value, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Đọc ?limit=, giới hạn trong [1, maximum]"""
+    if value in (None, ""):
+        return default
+    return min(max(int(value), 1), maximum)
+
+
+def encode_cursor(doc: Dict[str, Any], field: str) -> str:
+    """Cursor của document cuối trang: giá trị sort field và _id"""
+    value = doc.get(field)
+    payload = {"i": str(doc["_id"])}
+    # users._id có thể là ObjectId (tạo từ admin) hoặc string
+    if isinstance(doc["_id"], ObjectId):
+        payload["o"] = 1
+    if isinstance(value, datetime):
+        payload["d"] = value.isoformat()
+    elif field != "_id":
+        payload["v"] = value
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Trả về (giá trị sort field, _id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = ObjectId(payload["i"]) if payload.get("o") else payload["i"]
+        if "d" in payload:
+            return datetime.fromisoformat(payload["d"]), last_id
+        return payload.get("v"), last_id
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}")
+
+
+def keyset_filter(cursor: Optional[str], field: str, descending: bool = True) -> Dict[str, Any]:
+    """
+    Điều kiện lấy các document sau cursor, dùng với sort [(field, d), ("_id", d)]
+
+    Document thiếu field (null) đứng cuối khi sort giảm dần, đầu khi sort tăng dần
+    """
+    if not cursor:
+        return {}
+    value, last_id = decode_cursor(cursor)
+    if field == "_id":
+        return id_keyset_filter(last_id, descending)
+    op = "$lt" if descending else "$gt"
+    conditions = [{field: value, "_id": {op: last_id}}]
+    if value is None:
+        if not descending:
+            conditions.append({field: {"$ne": None}})
+    else:
+        conditions.append({field: {op: value}})
+        if descending:
+            conditions.append({field: None})
+    return {"$or": conditions}
+
+
+def id_keyset_filter(last_id, descending: bool = True) -> Dict[str, Any]:
+    """
+    Điều kiện sau cursor khi chỉ sort theo _id
+
+    So sánh $lt/$gt chỉ khớp cùng kiểu BSON, mà string đứng trước ObjectId khi sort,
+    nên phải thêm các _id khác kiểu còn nằm phía sau cursor
+    """
+    op = "$lt" if descending else "$gt"
+    conditions = [{"_id": {op: last_id}}]
+    if descending and isinstance(last_id, ObjectId):
+        conditions.append({"_id": {"$type": "string"}})
+    elif not descending and not isinstance(last_id, ObjectId):
+        conditions.append({"_id": {"$type": "objectId"}})
+    return {"$or": conditions}
+
+
+def keyset_sort(field: str, descending: bool = True):
+    direction = -1 if descending else 1
+    if field == "_id":
+        return [("_id", direction)]
+    return [(field, direction), ("_id", direction)]
+
+
+def fetch_keyset_page(collection, query: Dict[str, Any], field: str, limit: int, cursor: Optional[str] = None,
+                      descending: bool = True, skip: int = 0, projection: Optional[Dict[str, Any]] = None):
+    """
+    Một trang theo keyset: find(query + điều kiện sau cursor).sort(field, _id).limit(limit + 1)
+
+    skip chỉ dùng cho client cũ còn gửi ?page= (không có cursor)
+
+    Returns:
+        tuple: (documents, next_cursor hoặc None nếu hết)
+    """
+    cursor_filter = keyset_filter(cursor, field, descending)
+    if cursor_filter:
+        query = {"$and": [query, cursor_filter]} if query else cursor_filter
+    find = collection.find(query, projection).sort(keyset_sort(field, descending))
+    if skip and not cursor:
+        find = find.skip(skip)
+    docs = list(find.limit(limit + 1))
+    next_cursor = encode_cursor(docs[limit - 1], field) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Recommendation Service for Cinema Management System
+Offline co-booking / popularity model materialized into the recommendations collection
+"""
+
+import math
+from datetime import datetime, timedelta
+from itertools import combinations
+from typing import Dict, Any, List, Optional
+from pymongo import ReplaceOne
+
+from services.seat_map_service import showtime_schedule, SHOWTIME_SCHEDULE_FIELDS
+
+# Model dựng lại định kỳ bởi background job
+RECOMMENDATION_REFRESH_SECONDS = 30 * 60
+
+# Chỉ tính booking trong khoảng này
+HISTORY_DAYS = 180
+
+# Số gợi ý lưu cho mỗi user / phim
+TOP_N = 10
+
+# Suất chiếu được gợi ý nằm trong số ngày tới
+UPCOMING_DAYS = 7
+
+# Khách đặt quá nhiều phim khác nhau (tài khoản test, đại lý) bị bỏ khỏi co-booking
+MAX_MOVIES_PER_CUSTOMER = 50
+
+BULK_BATCH_SIZE = 500
+
+MOVIE_FIELDS = {"title": 1, "poster_url": 1, "genre": 1, "genres": 1, "duration": 1, "rating": 1, "status": 1}
+
+
+def time_slot(time_value: Optional[str]) -> str:
+    """Khung giờ của suất chiếu: morning / afternoon / evening / late"""
+    try:
+        hour = int(str(time_value).split(":")[0])
+    except (TypeError, ValueError):
+        return "unknown"
+    if hour < 12:
+        return "morning"
+    if hour < 17:
+        return "afternoon"
+    if hour < 21:
+        return "evening"
+    return "late"
+
+
+def _top(scores: Dict[str, float], limit: int = TOP_N, exclude=()) -> List[str]:
+    return [key for key, _ in sorted(
+        ((key, score) for key, score in scores.items() if key not in exclude),
+        key=lambda item: (-item[1], item[0])
+    )[:limit]]
+
+
+def _showtime_slot(showtime: Dict[str, Any]):
+    """(rạp, khung giờ) của suất chiếu, cùng cách tính với booking_info của ticket view"""
+    schedule = showtime_schedule(showtime)
+    return schedule["cinema"], time_slot(schedule["time"])
+
+
+def _showtime_entry(showtime: Dict[str, Any], movies: Dict[str, Dict[str, Any]], score: float) -> Dict[str, Any]:
+    movie_id = str(showtime.get("movie_id"))
+    schedule = showtime_schedule(showtime)
+    return {
+        "_id": str(showtime["_id"]),
+        "movie_id": movie_id,
+        "movie_title": movies.get(movie_id, {}).get("title"),
+        "cinema": schedule["cinema"],
+        "hall": schedule["hall"],
+        "date": schedule["date"],
+        "time": schedule["time"],
+        "score": round(score, 4)
+    }
+
+
+def build_recommendations(db, now: Optional[datetime] = None) -> int:
+    """
+    Dựng model từ ticket_views (mỗi booking đã thanh toán một document) và ghi vào recommendations
+
+    - Co-booking: cosine giữa các phim theo tập khách đã đặt
+    - Popularity: số khách theo phim, theo (rạp, khung giờ)
+    - User: phim tương tự các phim đã xem chưa đặt, suất chiếu sắp tới của các phim đó
+
+    Returns:
+        int: Số document đã ghi
+    """
+    now = now or datetime.now()
+    today = now.strftime("%Y-%m-%d")
+    since = now - timedelta(days=HISTORY_DAYS)
+
+    customer_movies = {}
+    customer_slots = {}
+    movie_customers = {}
+    slot_customers = {}
+    views = db.ticket_views.find(
+        {"status": "paid", "created_at": {"$gte": since}},
+        {"customer_id": 1, "booking_info.movie_id": 1, "booking_info.cinema": 1, "booking_info.time": 1}
+    )
+    for view in views:
+        customer_id = view.get("customer_id")
+        info = view.get("booking_info", {})
+        movie_id = info.get("movie_id")
+        if not customer_id or not movie_id:
+            continue
+        customer_movies.setdefault(customer_id, set()).add(movie_id)
+        movie_customers.setdefault(movie_id, set()).add(customer_id)
+        slot = (info.get("cinema"), time_slot(info.get("time")))
+        slot_customers.setdefault(slot, set()).add(customer_id)
+        customer_slots.setdefault(customer_id, {})
+        customer_slots[customer_id][slot] = customer_slots[customer_id].get(slot, 0) + 1
+
+    popularity = {movie_id: len(customers) for movie_id, customers in movie_customers.items()}
+    slot_popularity = {slot: len(customers) for slot, customers in slot_customers.items()}
+    max_slot_popularity = max(slot_popularity.values(), default=1)
+
+    # Co-booking: đếm số khách chung cho từng cặp phim
+    co_counts = {}
+    for movies_seen in customer_movies.values():
+        if len(movies_seen) > MAX_MOVIES_PER_CUSTOMER:
+            continue
+        for first, second in combinations(sorted(movies_seen), 2):
+            co_counts[(first, second)] = co_counts.get((first, second), 0) + 1
+
+    similar = {}
+    for (first, second), count in co_counts.items():
+        score = count / math.sqrt(popularity[first] * popularity[second])
+        similar.setdefault(first, {})[second] = score
+        similar.setdefault(second, {})[first] = score
+
+    # Chỉ gợi ý phim còn suất chiếu sắp tới
+    last_day = (now + timedelta(days=UPCOMING_DAYS)).strftime("%Y-%m-%d")
+    upcoming = list(db.showtimes.find(
+        {"$or": [{"date": {"$gte": today, "$lte": last_day}},
+                 {"start_date": {"$gte": today, "$lte": last_day}}]},
+        {"movie_id": 1, **SHOWTIME_SCHEDULE_FIELDS}
+    ))
+    showtimes_by_movie = {}
+    for showtime in upcoming:
+        showtimes_by_movie.setdefault(str(showtime.get("movie_id")), []).append(showtime)
+
+    movies = {
+        str(movie["_id"]): {**movie, "_id": str(movie["_id"])}
+        for movie in db.movies.find({"_id": {"$in": list(showtimes_by_movie)}}, MOVIE_FIELDS)
+    }
+    bookable = set(movies)
+    max_popularity = max((popularity.get(movie_id, 0) for movie_id in bookable), default=0) or 1
+
+    def movie_entries(scores: Dict[str, float], exclude=()) -> List[Dict[str, Any]]:
+        return [{**movies[movie_id], "score": round(scores[movie_id], 4)}
+                for movie_id in _top(scores, exclude=exclude)]
+
+    def showtime_entries(movie_scores: Dict[str, float], preferred_slots: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        scores = {}
+        by_id = {}
+        for movie_id, movie_score in movie_scores.items():
+            for showtime in showtimes_by_movie.get(movie_id, []):
+                slot = _showtime_slot(showtime)
+                score = movie_score + 0.5 * slot_popularity.get(slot, 0) / max_slot_popularity
+                if preferred_slots:
+                    score += preferred_slots.get(slot, 0) / max(preferred_slots.values())
+                showtime_id = str(showtime["_id"])
+                scores[showtime_id] = score
+                by_id[showtime_id] = showtime
+        return [_showtime_entry(by_id[showtime_id], movies, scores[showtime_id]) for showtime_id in _top(scores)]
+
+    popular_scores = {movie_id: popularity.get(movie_id, 0) / max_popularity for movie_id in bookable}
+    refreshed_at = datetime.now()
+    documents = [{
+        "_id": "global",
+        "movies": movie_entries(popular_scores),
+        "showtimes": showtime_entries(popular_scores),
+        "refreshed_at": refreshed_at
+    }]
+
+    for movie_id in set(similar) | bookable:
+        scores = {other: score for other, score in similar.get(movie_id, {}).items() if other in bookable}
+        # Thiếu dữ liệu co-booking thì bù bằng phim phổ biến (điểm thấp hơn)
+        for other, score in popular_scores.items():
+            scores.setdefault(other, 0.1 * score)
+        documents.append({
+            "_id": f"movie:{movie_id}",
+            "movies": movie_entries(scores, exclude={movie_id}),
+            "showtimes": showtime_entries({movie_id: 1.0}),
+            "refreshed_at": refreshed_at
+        })
+
+    for customer_id, movies_seen in customer_movies.items():
+        scores = {}
+        for seen in movies_seen:
+            for other, score in similar.get(seen, {}).items():
+                if other in bookable:
+                    scores[other] = scores.get(other, 0) + score
+        for other, score in popular_scores.items():
+            scores.setdefault(other, 0.1 * score)
+        movie_scores = {movie_id: scores[movie_id] for movie_id in _top(scores, exclude=movies_seen)}
+        documents.append({
+            "_id": f"user:{customer_id}",
+            "movies": movie_entries(scores, exclude=movies_seen),
+            "showtimes": showtime_entries(movie_scores, customer_slots.get(customer_id)),
+            "refreshed_at": refreshed_at
+        })
+
+    for start in range(0, len(documents), BULK_BATCH_SIZE):
+        batch = documents[start:start + BULK_BATCH_SIZE]
+        db.recommendations.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+                                      ordered=False)
+    # Document của lần dựng trước (phim hết suất, user không còn booking) bị xóa
+    db.recommendations.delete_many({"refreshed_at": {"$lt": refreshed_at}})
+    return len(documents)
+
+
+def get_recommendations(db, kind: str, customer_id: Optional[str] = None, movie_id: Optional[str] = None,
+                        limit: int = TOP_N) -> List[Dict[str, Any]]:
+    """
+    Top-N phim hoặc suất chiếu từ recommendations, một find_one theo _id
+
+    Args:
+        kind: "movies" hoặc "showtimes"
+        customer_id: Gợi ý theo khách (ưu tiên hơn movie_id)
+        movie_id: Gợi ý theo phim đang xem
+    """
+    keys = []
+    if customer_id:
+        keys.append(f"user:{customer_id}")
+    if movie_id:
+        keys.append(f"movie:{movie_id}")
+    keys.append("global")
+
+    # Một query $in, chọn document cụ thể nhất có dữ liệu
+    docs = {doc["_id"]: doc for doc in db.recommendations.find({"_id": {"$in": keys}}, {kind: 1})}
+    for key in keys:
+        entries = docs.get(key, {}).get(kind)
+        if entries:
+            return entries[:limit]
+    return []
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Seat Event Broker for Cinema Management System
+In-process pub/sub of seat-status changes per showtime, consumed by the SSE endpoint
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+class SeatEventSubscription:
+    """Hàng đợi event của một client SSE"""
+
+    def __init__(self, showtime_id: str, max_events: int = 100):
+        self.showtime_id = showtime_id
+        self.max_events = max_events
+        self._events = deque()
+        self._overflowed = False
+        self._condition = threading.Condition()
+
+    def push(self, event: Dict[str, Any]):
+        with self._condition:
+            if len(self._events) >= self.max_events:
+                # Client đọc không kịp, bỏ các delta và yêu cầu tải lại toàn bộ sơ đồ ghế
+                self._events.clear()
+                self._overflowed = True
+            else:
+                self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout: float = None) -> Optional[Dict[str, Any]]:
+        """Chờ event tiếp theo, trả về None nếu hết timeout"""
+        with self._condition:
+            if not self._events and not self._overflowed:
+                self._condition.wait(timeout)
+            if self._overflowed:
+                self._overflowed = False
+                return {"type": "refresh", "showtime_id": self.showtime_id}
+            if self._events:
+                return self._events.popleft()
+            return None
+
+
+class InProcessSeatEventBroker:
+    """
+    Broker trong process. Có thể thay bằng broker khác (Redis pub/sub, ...)
+    miễn là cung cấp publish/subscribe/unsubscribe với cùng interface
+    """
+
+    def __init__(self, max_events_per_subscriber: int = 100):
+        self.max_events_per_subscriber = max_events_per_subscriber
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, showtime_id) -> SeatEventSubscription:
+        key = str(showtime_id)
+        subscription = SeatEventSubscription(key, self.max_events_per_subscriber)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: SeatEventSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.showtime_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.showtime_id]
+
+    def publish(self, showtime_id, event: Dict[str, Any]):
+        """Gửi event tới tất cả client đang xem showtime"""
+        key = str(showtime_id)
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+
+
+def seat_change_event(showtime_id, seat_codes, status: str) -> Dict[str, Any]:
+    """Delta gọn: danh sách ghế và trạng thái mới"""
+    return {
+        "type": "seats",
+        "showtime_id": str(showtime_id),
+        "seats": list(seat_codes),
+        "status": status
+    }
+
+
+def refresh_event(showtime_id) -> Dict[str, Any]:
+    """Yêu cầu client tải lại toàn bộ sơ đồ ghế (thay đổi hàng loạt)"""
+    return {"type": "refresh", "showtime_id": str(showtime_id)}
+
+
+# Global seat event broker instance
+seat_event_broker = None
+
+def init_seat_event_broker(broker=None):
+    """Initialize the global seat event broker (mặc định là broker trong process)"""
+    global seat_event_broker
+    seat_event_broker = broker or InProcessSeatEventBroker()
+    return seat_event_broker
+
+def get_seat_event_broker():
+    """Get the global seat event broker instance"""
+    return seat_event_broker
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Seat Lock Service for Cinema Management System
+One lockedSeats document per (showtime_id, seat_code), guarded by a unique index
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional, Callable
+from pymongo.errors import BulkWriteError
+
+from services.seat_map_service import normalize_seat_code
+from services.seat_occupancy import get_seat_occupancy_store
+
+# Thời gian giữ ghế khi customer bấm 'Đặt vé'
+SEAT_LOCK_MINUTES = 7
+
+# Chu kỳ quét seatlocks hết hạn
+SEAT_LOCK_SWEEP_SECONDS = 30
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def acquire_seat_locks(db, showtime_id, seat_codes, user_id, session_id,
+                       locked_at: datetime, expires_at: datetime) -> List[str]:
+    """
+    Giữ các ghế bằng một lệnh insert_many, unique index đảm bảo không có hai
+    người cùng giữ một ghế
+
+    Args:
+        db: Database instance
+        showtime_id: ID của showtime
+        seat_codes: Danh sách ghế cần giữ
+        user_id: ID của customer
+        session_id: Session của seat lock (dùng để release)
+        locked_at: Thời điểm lock
+        expires_at: Thời điểm hết hạn
+
+    Returns:
+        list: Các seat_code đã bị người khác giữ, rỗng nếu lock thành công
+              (khi có xung đột, các ghế vừa giữ được sẽ được trả lại)
+    """
+    codes = list(dict.fromkeys(normalize_seat_code(code) for code in seat_codes))
+
+    # TTL monitor chỉ chạy mỗi 60 giây, dọn trước các lock đã hết hạn của những ghế này
+    db.lockedSeats.delete_many({
+        "showtime_id": showtime_id,
+        "seat_code": {"$in": codes},
+        "expires_at": {"$lte": locked_at}
+    })
+
+    docs = [{
+        "showtime_id": showtime_id,
+        "seat_code": seat_code,
+        "user_id": user_id,
+        "session_id": session_id,
+        "locked_at": locked_at,
+        "expires_at": expires_at
+    } for seat_code in codes]
+
+    try:
+        db.lockedSeats.insert_many(docs, ordered=False)
+        return []
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        taken = [err["op"]["seat_code"] for err in write_errors if err.get("code") == DUPLICATE_KEY_ERROR]
+
+        # Không giữ một phần, trả lại các ghế đã insert thành công
+        db.lockedSeats.delete_many({"session_id": session_id})
+
+        if len(taken) != len(write_errors):
+            raise
+        return taken
+
+
+def release_seat_locks(db, session_id) -> int:
+    """Trả lại tất cả ghế của một session, trả về số ghế đã trả"""
+    result = db.lockedSeats.delete_many({"session_id": session_id})
+    return result.deleted_count
+
+
+def archive_expired_locks(db, expired_locks: List[dict]):
+    """Archival hook mặc định: ghi các lock hết hạn vào expiredSeatLocks bằng một insert_many"""
+    if not expired_locks:
+        return
+    archived_at = datetime.now(timezone.utc)
+    db.expiredSeatLocks.insert_many([{
+        "lock_id": lock["_id"],
+        "showtime_id": lock.get("showtime_id"),
+        "user_id": lock.get("user_id"),
+        "session_id": lock.get("session_id"),
+        "seat_codes": lock.get("seat_codes", []),
+        "locked_at": lock.get("locked_at"),
+        "expires_at": lock.get("expires_at"),
+        "archived_at": archived_at
+    } for lock in expired_locks], ordered=False)
+
+
+def expire_seat_locks(db, on_expired: Optional[Callable] = archive_expired_locks) -> List[dict]:
+    """
+    Đánh dấu các seatlocks đã hết hạn bằng một update_many
+
+    Ghế trong lockedSeats đã được TTL index xóa, hàm này chỉ cập nhật session lock,
+    trả ghế về available trong occupancy và gọi archival hook
+
+    Args:
+        db: Database instance
+        on_expired: Hook nhận (db, expired_locks), None để bỏ qua archive
+
+    Returns:
+        list: Các seat lock vừa hết hạn
+    """
+    now = datetime.now(timezone.utc)
+    expired_locks = list(db.seatlocks.find(
+        {"status": "active", "expires_at": {"$lte": now}},
+        {"showtime_id": 1, "seat_codes": 1, "user_id": 1, "session_id": 1, "locked_at": 1, "expires_at": 1}
+    ))
+    if not expired_locks:
+        return []
+
+    db.seatlocks.update_many(
+        {"_id": {"$in": [lock["_id"] for lock in expired_locks]}, "status": "active"},
+        {"$set": {"status": "expired", "expired_at": now}}
+    )
+
+    occupancy_store = get_seat_occupancy_store()
+    if occupancy_store is not None:
+        for lock in expired_locks:
+            occupancy_store.release(lock.get("showtime_id"), lock.get("seat_codes", []), owner=lock.get("user_id"))
+
+    if on_expired is not None:
+        try:
+            on_expired(db, expired_locks)
+        except Exception as e:
+            print(f"❌ Error archiving expired seat locks: {e}")
+
+    return expired_locks
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Seat Map Service for Cinema Management System
+Loads the dynamic hall state of a showtime (bookings, seat locks) for SeatOccupancy
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Booking status còn giữ ghế
+ACTIVE_BOOKING_STATUSES = ["pending", "paid"]
+
+
+def showtime_id_candidates(showtime_id) -> list:
+    """
+    Showtime _id có thể là ObjectId hoặc string tùy nguồn dữ liệu,
+    trả về cả hai dạng để dùng trong một query $in duy nhất
+    """
+    candidates = [showtime_id]
+    if isinstance(showtime_id, str):
+        try:
+            candidates.insert(0, ObjectId(showtime_id))
+        except (InvalidId, TypeError):
+            pass
+    elif isinstance(showtime_id, ObjectId):
+        candidates.append(str(showtime_id))
+    return candidates
+
+
+def _first_field(document: Dict[str, Any], *fields):
+    for field in fields:
+        value = document.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def showtime_schedule(showtime: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    Rạp, phòng, ngày, giờ của suất chiếu theo các schema đang có:
+    showtime seed (run.py) dùng cinema_name/cinema_id/hall_name/hall_id/date/time,
+    showtime tạo từ manager dùng cinema_id/hall_id/start_date/start_time
+
+    Field không có thì trả None, không điền giá trị mặc định
+    """
+    return {
+        "cinema": _first_field(showtime, "cinema_name", "cinema_id", "cinema"),
+        "cinema_id": _first_field(showtime, "cinema_id", "cinema"),
+        "hall": _first_field(showtime, "hall_name", "hall_id", "hall"),
+        "hall_id": _first_field(showtime, "hall_id", "hall"),
+        "date": _first_field(showtime, "date", "start_date"),
+        "time": _first_field(showtime, "time", "start_time")
+    }
+
+
+# Projection đủ cho showtime_schedule
+SHOWTIME_SCHEDULE_FIELDS = {
+    "cinema": 1, "cinema_name": 1, "cinema_id": 1, "hall": 1, "hall_name": 1, "hall_id": 1,
+    "date": 1, "start_date": 1, "time": 1, "start_time": 1
+}
+
+
+def normalize_seat_code(seat_code) -> str:
+    """Chuẩn hóa seat_code (A1, a1 , ...) về dạng A1"""
+    return str(seat_code).strip().upper()
+
+
+def load_showtime_state(db, showtime_id) -> Optional[Dict[str, Any]]:
+    """
+    Load showtime cùng trạng thái động của phòng chiếu (bookings, seat locks)
+    trong một aggregation. Layout ghế lấy từ HallLayoutCache
+
+    Args:
+        db: Database instance
+        showtime_id: ID của showtime (ObjectId hoặc string)
+
+    Returns:
+        dict: Showtime document kèm các field `active_bookings`, `active_locks`,
+              hoặc None nếu không tìm thấy showtime
+    """
+    candidates = showtime_id_candidates(showtime_id)
+    current_time = datetime.now(timezone.utc)
+
+    pipeline = [
+        {"$match": {"_id": {"$in": candidates}}},
+        {"$limit": 1},
+        # Bookings còn giữ ghế (showtime_id lưu dạng string hoặc ObjectId)
+        {"$lookup": {
+            "from": "bookings",
+            "pipeline": [
+                {"$match": {
+                    "showtime_id": {"$in": candidates},
+                    "status": {"$in": ACTIVE_BOOKING_STATUSES}
+                }},
+                {"$project": {"seats": 1, "status": 1}}
+            ],
+            "as": "active_bookings"
+        }},
+        # Ghế đang bị lock còn hiệu lực (một document mỗi ghế)
+        {"$lookup": {
+            "from": "lockedSeats",
+            "pipeline": [
+                {"$match": {
+                    "showtime_id": {"$in": candidates},
+                    "expires_at": {"$gt": current_time}
+                }},
+                {"$project": {"seat_code": 1, "user_id": 1, "expires_at": 1}}
+            ],
+            "as": "active_locks"
+        }}
+    ]
+
+    result = list(db.showtimes.aggregate(pipeline))
+    return result[0] if result else None
+
+
+def get_showtime_hall_id(showtime: Dict[str, Any]):
+    """Showtime cũ lưu phòng trong field `hall`, showtime mới dùng `hall_id`"""
+    return showtime.get("hall_id") or showtime.get("hall")
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Seat Occupancy Store for Cinema Management System
+Compact per-showtime seat state: one status byte per seat, indexed by the hall layout ordinal
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List
+
+from services.seat_map_service import load_showtime_state, get_showtime_hall_id, normalize_seat_code
+from services.seat_events import seat_change_event, refresh_event
+
+# Trạng thái ghế (một byte mỗi ghế)
+AVAILABLE = 0
+LOCKED = 1
+PENDING = 2
+PAID = 3
+BROKEN = 4
+
+STATUS_NAMES = {
+    AVAILABLE: "available",
+    LOCKED: "locked",
+    PENDING: "pending",
+    PAID: "paid",
+    BROKEN: "broken"
+}
+STATUS_CODES = {name: code for code, name in STATUS_NAMES.items()}
+
+
+def as_utc(value: datetime) -> datetime:
+    """PyMongo trả về datetime naive (UTC), chuẩn hóa để so sánh với datetime aware"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class ShowtimeOccupancy:
+    """Trạng thái ghế của một showtime, index theo ordinal trong HallLayout"""
+
+    def __init__(self, showtime: Dict[str, Any], layout):
+        self.showtime = showtime
+        self.layout = layout
+        self.states = bytearray(len(layout.seats))
+        # Chỉ ghế LOCKED mới có hạn lock và người giữ lock
+        self.lock_expiry = {}
+        self.lock_owner = {}
+        self._lock = threading.Lock()
+
+        for seat in layout.seats:
+            if seat["is_broken"]:
+                self.states[seat["ordinal"]] = BROKEN
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], layout) -> "ShowtimeOccupancy":
+        """Dựng occupancy từ kết quả của load_showtime_state"""
+        occupancy = cls(state, layout)
+        hall_id = get_showtime_hall_id(state)
+
+        for booking in state.get("active_bookings", []):
+            status = STATUS_CODES.get(booking.get("status"), PENDING)
+            for seat_ref in booking.get("seats", []):
+                # seat_ref có thể là seat_id hoặc seat_code (kể cả dạng hall_seat)
+                seat = layout.by_id.get(str(seat_ref))
+                if not seat:
+                    seat_code = str(seat_ref)
+                    if seat_code.startswith(f"{hall_id}_"):
+                        seat_code = seat_code[len(f"{hall_id}_"):]
+                    seat = layout.by_code.get(normalize_seat_code(seat_code))
+                if seat and occupancy.states[seat["ordinal"]] != BROKEN:
+                    occupancy.states[seat["ordinal"]] = status
+
+        # Locked ưu tiên hơn booked
+        for lock in state.get("active_locks", []):
+            occupancy._mark_locked([lock["seat_code"]], lock.get("user_id"), as_utc(lock["expires_at"]))
+
+        return occupancy
+
+    def _mark_locked(self, seat_codes, owner, expires_at: datetime):
+        for seat in self.layout.seats_for_codes(seat_codes):
+            ordinal = seat["ordinal"]
+            if self.states[ordinal] == BROKEN:
+                continue
+            self.states[ordinal] = LOCKED
+            self.lock_expiry[ordinal] = expires_at
+            self.lock_owner[ordinal] = owner
+
+    def _status_at(self, ordinal: int, now: datetime) -> int:
+        status = self.states[ordinal]
+        if status == LOCKED and self.lock_expiry.get(ordinal, now) <= now:
+            return AVAILABLE
+        return status
+
+    def conflicts(self, seat_codes, user_id=None) -> List[str]:
+        """
+        Kiểm tra xung đột, chi phí O(số ghế yêu cầu)
+
+        Args:
+            seat_codes: Danh sách ghế cần giữ/đặt
+            user_id: Nếu có, ghế đang bị chính user này lock không tính là xung đột
+
+        Returns:
+            list: Các seat_code không còn trống (mã ghế không tồn tại được bỏ qua)
+        """
+        now = datetime.now(timezone.utc)
+        taken = []
+        with self._lock:
+            for seat_code in seat_codes:
+                seat = self.layout.by_code.get(normalize_seat_code(seat_code))
+                if not seat:
+                    continue
+                status = self._status_at(seat["ordinal"], now)
+                if status == AVAILABLE:
+                    continue
+                if status == LOCKED and user_id is not None and self.lock_owner.get(seat["ordinal"]) == user_id:
+                    continue
+                taken.append(seat_code)
+        return taken
+
+    def lock(self, seat_codes, owner, expires_at: datetime):
+        """Đánh dấu ghế đang được giữ đến expires_at"""
+        with self._lock:
+            self._mark_locked(seat_codes, owner, as_utc(expires_at))
+
+    def set_status(self, seat_codes, status: int):
+        """Cập nhật trạng thái các ghế (pending/paid/available)"""
+        with self._lock:
+            for seat in self.layout.seats_for_codes(seat_codes):
+                ordinal = seat["ordinal"]
+                if self.states[ordinal] == BROKEN:
+                    continue
+                self.states[ordinal] = status
+                self.lock_expiry.pop(ordinal, None)
+                self.lock_owner.pop(ordinal, None)
+
+    def release(self, seat_codes, owner=None) -> List[str]:
+        """
+        Bỏ lock các ghế, ghế đã đặt thì giữ nguyên. Nếu có owner, chỉ bỏ lock
+        do owner giữ (ghế có thể đã được người khác lock lại sau khi hết hạn)
+
+        Returns:
+            list: Các seat_code đã được trả về available
+        """
+        released = []
+        with self._lock:
+            for seat in self.layout.seats_for_codes(seat_codes):
+                ordinal = seat["ordinal"]
+                if self.states[ordinal] != LOCKED:
+                    continue
+                if owner is not None and self.lock_owner.get(ordinal) != owner:
+                    continue
+                self.states[ordinal] = AVAILABLE
+                self.lock_expiry.pop(ordinal, None)
+                self.lock_owner.pop(ordinal, None)
+                released.append(seat["seat_code"])
+        return released
+
+    def available(self, seat_codes) -> List[str]:
+        """Các seat_code đang trống (lock hết hạn tính là trống)"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            return [seat["seat_code"] for seat in self.layout.seats_for_codes(seat_codes)
+                    if self._status_at(seat["ordinal"], now) == AVAILABLE]
+
+    def encode(self) -> str:
+        """Một ký tự mỗi ghế theo ordinal, ví dụ '0031004...'"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            return "".join(str(self._status_at(ordinal, now)) for ordinal in range(len(self.states)))
+
+    def seat_list(self) -> List[Dict[str, Any]]:
+        """Danh sách ghế cho /api/showtime/<id>/seats, loại trừ ghế hỏng"""
+        now = datetime.now(timezone.utc)
+        result = []
+        with self._lock:
+            for seat in self.layout.seats:
+                status = self._status_at(seat["ordinal"], now)
+                if status == BROKEN:
+                    continue
+                result.append({
+                    "seat_id": str(seat["_id"]),
+                    "seat_code": seat["seat_code"],
+                    "seat_type": seat["seat_type"],
+                    "status": STATUS_NAMES[status],
+                    "is_broken": False
+                })
+        return result
+
+
+class SeatOccupancyStore:
+    """
+    Giữ ShowtimeOccupancy trong bộ nhớ. Các thay đổi trong process được áp dụng ngay,
+    entry được dựng lại từ db sau ttl_seconds để đồng bộ với các process khác.
+    Mọi thay đổi trạng thái ghế đều được publish qua event_broker (nếu có)
+    """
+
+    def __init__(self, db_connection, layout_cache, ttl_seconds: int = 15, event_broker=None):
+        self.db = db_connection
+        self.layout_cache = layout_cache
+        self.ttl_seconds = ttl_seconds
+        self.event_broker = event_broker
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, showtime_id) -> Optional[ShowtimeOccupancy]:
+        """Lấy occupancy của showtime, dựng lại từ db nếu chưa có hoặc đã hết hạn"""
+        key = str(showtime_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        state = load_showtime_state(self.db, showtime_id)
+        if not state:
+            return None
+        layout = self.layout_cache.get(get_showtime_hall_id(state))
+        occupancy = ShowtimeOccupancy.from_state(state, layout)
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, occupancy)
+        return occupancy
+
+    def peek(self, showtime_id) -> Optional[ShowtimeOccupancy]:
+        """Lấy occupancy đang có trong bộ nhớ, không query db"""
+        with self._lock:
+            entry = self._entries.get(str(showtime_id))
+        return entry[1] if entry else None
+
+    def _publish(self, showtime_id, event):
+        if self.event_broker is not None and event is not None:
+            self.event_broker.publish(showtime_id, event)
+
+    def lock(self, showtime_id, seat_codes, owner, expires_at: datetime):
+        occupancy = self.peek(showtime_id)
+        if occupancy:
+            occupancy.lock(seat_codes, owner, expires_at)
+        self._publish(showtime_id, seat_change_event(showtime_id, seat_codes, STATUS_NAMES[LOCKED]))
+
+    def set_status(self, showtime_id, seat_codes, status: int):
+        occupancy = self.peek(showtime_id)
+        if occupancy:
+            occupancy.set_status(seat_codes, status)
+        self._publish(showtime_id, seat_change_event(showtime_id, seat_codes, STATUS_NAMES[status]))
+
+    def release(self, showtime_id, seat_codes, owner=None):
+        """
+        Bỏ lock (release, hết hạn), ghế trở về available
+
+        Gọi sau khi lock đã bị xóa trong db. Showtime chưa có trong bộ nhớ thì dựng lại
+        từ db và chỉ publish các ghế thực sự trống (ghế có thể đang được booking khác giữ)
+        """
+        occupancy = self.peek(showtime_id)
+        if occupancy:
+            seat_codes = occupancy.release(seat_codes, owner)
+        else:
+            occupancy = self.get(showtime_id)
+            seat_codes = occupancy.available(seat_codes) if occupancy else []
+        if seat_codes:
+            self._publish(showtime_id, seat_change_event(showtime_id, seat_codes, STATUS_NAMES[AVAILABLE]))
+
+    def invalidate(self, showtime_id=None):
+        """Xóa occupancy của một showtime (hoặc toàn bộ nếu showtime_id là None)"""
+        with self._lock:
+            if showtime_id is None:
+                showtime_ids = list(self._entries.keys())
+                self._entries.clear()
+            else:
+                showtime_ids = [str(showtime_id)]
+                self._entries.pop(str(showtime_id), None)
+
+        # Thay đổi hàng loạt, client tải lại toàn bộ sơ đồ ghế
+        for key in showtime_ids:
+            self._publish(key, refresh_event(key))
+
+
+# Global seat occupancy store instance
+seat_occupancy_store = None
+
+def init_seat_occupancy_store(db_connection, layout_cache, ttl_seconds: int = 15, event_broker=None):
+    """Initialize the global seat occupancy store"""
+    global seat_occupancy_store
+    seat_occupancy_store = SeatOccupancyStore(db_connection, layout_cache, ttl_seconds, event_broker)
+    return seat_occupancy_store
+
+def get_seat_occupancy_store() -> Optional[SeatOccupancyStore]:
+    """Get the global seat occupancy store instance"""
+    return seat_occupancy_store
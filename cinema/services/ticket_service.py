@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Ticket Service for Cinema Management System
+Builds ticket documents for a booking from the already-loaded seat list
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, List
+from bson import ObjectId
+
+from services.ticket_token import issue_ticket_token, showtime_expiry
+
+
+def build_tickets(showtime: Dict[str, Any], booking_id: str, seats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Tạo ticket documents (chưa ghi vào db) cho các ghế của một booking
+
+    Args:
+        showtime: Showtime document
+        booking_id: ID của booking
+        seats: Ghế từ HallLayout (có `_id` và `seat_code`)
+
+    Returns:
+        list: Ticket documents, ghi bằng một lệnh insert_many
+    """
+    created_at = datetime.now(timezone.utc)
+    showtime_id = str(showtime["_id"])
+    expires_at = showtime_expiry(showtime)
+
+    tickets = []
+    for seat in seats:
+        ticket_id = str(ObjectId())
+        tickets.append({
+            "_id": ticket_id,
+            "booking_id": booking_id,
+            "seat_id": seat["_id"],
+            "status": "valid",
+            "checkin_time": None,
+            "checked_by": None,
+            # Barcode là token đã ký, staff xác thực được mà không cần đọc db
+            "barcode_data": issue_ticket_token(ticket_id, showtime_id, seat["seat_code"], expires_at),
+            "created_at": created_at
+        })
+    return tickets
+
+
+def format_tickets(tickets: List[Dict[str, Any]], seats: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Format tickets cho frontend từ dữ liệu đã có trong bộ nhớ, không query lại db"""
+    seat_codes = {str(seat["_id"]): seat["seat_code"] for seat in seats}
+    return [{
+        "ticket_id": str(ticket["_id"]),
+        "seat_code": seat_codes.get(str(ticket["seat_id"]), "A1"),
+        "seat_id": str(ticket["seat_id"]),
+        "barcode_data": ticket["barcode_data"],
+        "status": ticket["status"]
+    } for ticket in tickets]
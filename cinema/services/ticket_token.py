@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Ticket Token for Cinema Management System
+Self-verifying barcodes: HMAC-signed ticket id, showtime, seat and expiry
+"""
+
+import base64
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from services.auth_service import SECRET_KEY
+from services.seat_map_service import showtime_schedule
+
+TOKEN_PREFIX = "T1"
+
+# Vé còn hiệu lực tới giờ chiếu + số giờ này
+TICKET_TOKEN_GRACE_HOURS = 6
+
+# Suất chiếu không parse được giờ thì token hết hạn sau số ngày này
+TICKET_TOKEN_FALLBACK_DAYS = 30
+
+# 128-bit HMAC là đủ cho barcode và giữ QR code nhỏ
+SIGNATURE_BYTES = 16
+
+# Key riêng cho token vé, không dùng chung trực tiếp với JWT
+_TOKEN_KEY = hashlib.sha256(f"{SECRET_KEY}:ticket-token".encode("utf-8")).digest()
+
+
+class InvalidTicketToken(ValueError):
+    """Token sai định dạng, sai chữ ký hoặc đã hết hạn"""
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode((value + "=" * (-len(value) % 4)).encode("ascii"))
+
+
+def _sign(body: str) -> str:
+    digest = hmac.new(_TOKEN_KEY, body.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest[:SIGNATURE_BYTES])
+
+
+def showtime_expiry(showtime: Dict[str, Any]) -> int:
+    """Unix timestamp hết hạn của vé theo ngày/giờ chiếu (date/time hoặc start_date/start_time)"""
+    schedule = showtime_schedule(showtime)
+    try:
+        starts_at = datetime.strptime(f"{schedule['date']} {schedule['time']}", "%Y-%m-%d %H:%M")
+        return int((starts_at + timedelta(hours=TICKET_TOKEN_GRACE_HOURS)).timestamp())
+    except (TypeError, ValueError):
+        return int(time.time()) + TICKET_TOKEN_FALLBACK_DAYS * 24 * 60 * 60
+
+
+def issue_ticket_token(ticket_id: str, showtime_id, seat_code: str, expires_at: int) -> str:
+    """Tạo token dạng T1.<payload>.<signature>"""
+    payload = f"{ticket_id}|{showtime_id}|{seat_code}|{int(expires_at)}"
+    body = f"{TOKEN_PREFIX}.{_b64encode(payload.encode('utf-8'))}"
+    return f"{body}.{_sign(body)}"
+
+
+def is_ticket_token(value: Optional[str]) -> bool:
+    return isinstance(value, str) and value.startswith(f"{TOKEN_PREFIX}.")
+
+
+def verify_ticket_token(token: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Kiểm tra chữ ký và hạn của token, không cần đọc database
+
+    Returns:
+        dict: ticket_id, showtime_id, seat_code, expires_at
+
+    Raises:
+        InvalidTicketToken
+    """
+    try:
+        prefix, encoded_payload, signature = token.split(".")
+    except (AttributeError, ValueError):
+        raise InvalidTicketToken("Malformed ticket token")
+    if prefix != TOKEN_PREFIX:
+        raise InvalidTicketToken("Unsupported ticket token version")
+
+    if not hmac.compare_digest(_sign(f"{prefix}.{encoded_payload}"), signature):
+        raise InvalidTicketToken("Invalid ticket token signature")
+
+    try:
+        ticket_id, showtime_id, seat_code, expires_at = _b64decode(encoded_payload).decode("utf-8").split("|")
+        expires_at = int(expires_at)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidTicketToken("Malformed ticket token payload")
+
+    if expires_at < (now if now is not None else time.time()):
+        raise InvalidTicketToken("Ticket token expired")
+
+    return {
+        "ticket_id": ticket_id,
+        "showtime_id": showtime_id,
+        "seat_code": seat_code,
+        "expires_at": expires_at
+    }
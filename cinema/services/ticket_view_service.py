@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Ticket View Service for Cinema Management System
+Maintains ticket_views: one denormalized document per booking (movie, showtime, seat codes, tickets)
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+from pymongo import UpdateMany
+
+from services.seat_map_service import showtime_id_candidates, showtime_schedule, SHOWTIME_SCHEDULE_FIELDS
+from services.dashboard_counters import record_checkins, record_cancelled_tickets
+from services.gate_metrics import record_gate_scans
+
+
+def movie_poster(movie: Optional[Dict[str, Any]], movie_id) -> str:
+    """Poster theo thứ tự ưu tiên poster_url -> poster -> thumbnail_url"""
+    default_poster = f"/static/img/{movie_id if movie_id else 'default'}.jpg"
+    if not movie:
+        return default_poster
+    return movie.get("poster_url", movie.get("poster", movie.get("thumbnail_url", default_poster)))
+
+
+def load_movie_for_showtime(db, showtime: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """movies._id là string, showtime.movie_id có thể là ObjectId"""
+    movie_id = showtime.get("movie_id")
+    if isinstance(movie_id, ObjectId):
+        movie_id = str(movie_id)
+    return db.movies.find_one({"_id": movie_id}, {"title": 1, "duration": 1, "poster_url": 1, "poster": 1, "thumbnail_url": 1})
+
+
+def build_ticket_view(booking: Dict[str, Any], tickets: List[Dict[str, Any]], seats: List[Dict[str, Any]],
+                      showtime: Dict[str, Any], movie: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Tạo ticket view cho một booking, các field giống response của /api/my-tickets
+
+    Args:
+        booking: Booking document
+        tickets: Ticket documents của booking
+        seats: Ghế của booking (có `_id` và `seat_code`)
+        showtime: Showtime document
+        movie: Movie document (có thể None)
+    """
+    movie_id = showtime.get("movie_id")
+    if isinstance(movie_id, ObjectId):
+        movie_id = str(movie_id)
+    seat_codes = {str(seat["_id"]): seat["seat_code"] for seat in seats}
+    schedule = showtime_schedule(showtime)
+
+    return {
+        "_id": booking["_id"],
+        "customer_id": booking.get("customer_id"),
+        "showtime_id": str(booking.get("showtime_id")),
+        "status": booking.get("status"),
+        "created_at": booking.get("created_at"),
+        "booking_info": {
+            "cinema": schedule["cinema"],
+            "cinema_id": schedule["cinema_id"],
+            "movie_id": movie_id,
+            "movie_title": movie["title"] if movie and "title" in movie else "Unknown Movie",
+            "movie_duration": movie.get("duration") if movie else None,
+            "movie_poster": movie_poster(movie, movie_id),
+            "hall": schedule["hall"],
+            "hall_id": schedule["hall_id"],
+            "date": schedule["date"],
+            "time": schedule["time"],
+            "total_amount": booking.get("total_amount", 0)
+        },
+        "tickets": [{
+            "ticket_id": str(ticket["_id"]),
+            "seat_code": seat_codes.get(str(ticket["seat_id"]), "A1"),
+            "seat_id": str(ticket["seat_id"]),
+            "barcode_data": ticket.get("barcode_data"),
+            "status": ticket.get("status"),
+            "created_at": ticket.get("created_at")
+        } for ticket in tickets],
+        "updated_at": datetime.now(timezone.utc)
+    }
+
+
+def rebuild_ticket_view(db, booking: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Dựng lại và ghi ticket view từ các collection gốc (booking cũ chưa có view)"""
+    showtime = db.showtimes.find_one({"_id": {"$in": showtime_id_candidates(booking.get("showtime_id"))}})
+    if not showtime:
+        return None
+    tickets = list(db.tickets.find({"booking_id": booking["_id"]}))
+    seat_ids = [ticket["seat_id"] for ticket in tickets] or booking.get("seats", [])
+    seats = list(db.seats.find({"_id": {"$in": seat_ids}}, {"seat_code": 1}))
+    view = build_ticket_view(booking, tickets, seats, showtime, load_movie_for_showtime(db, showtime))
+    write_ticket_view(db, view)
+    return view
+
+
+def repair_customer_ticket_views(db, customer_id: str) -> int:
+    """
+    Dựng view cho các booking đã thanh toán của khách chưa có trong ticket_views
+    (booking cũ bị sót khi backfill). Chỉ gọi khi phát hiện thiếu view, không gọi mỗi lần đọc
+
+    Hai query chỉ lấy _id (index customer_id của bookings, _id của ticket_views),
+    chỉ booking thiếu view mới đọc các collection gốc
+
+    Returns:
+        int: Số view đã dựng lại
+    """
+    booking_ids = [booking["_id"] for booking in db.bookings.find(
+        {"customer_id": customer_id, "status": "paid"}, {"_id": 1}
+    )]
+    if not booking_ids:
+        return 0
+    existing = {view["_id"] for view in db.ticket_views.find({"_id": {"$in": booking_ids}}, {"_id": 1})}
+    missing = [booking_id for booking_id in booking_ids if booking_id not in existing]
+    if not missing:
+        return 0
+    repaired = 0
+    for booking in db.bookings.find({"_id": {"$in": missing}}):
+        if rebuild_ticket_view(db, booking) is not None:
+            repaired += 1
+    return repaired
+
+
+def refresh_ticket_view_schedules(db, showtime: Dict[str, Any]) -> int:
+    """
+    Ghi lại rạp/phòng/ngày/giờ của suất chiếu vào các view của nó, một update_many
+    (view cũ lưu giá trị mặc định, hoặc suất chiếu được sửa)
+
+    Returns:
+        int: Số view được cập nhật
+    """
+    schedule = showtime_schedule(showtime)
+    result = db.ticket_views.update_many(
+        {"showtime_id": str(showtime["_id"])},
+        {"$set": {f"booking_info.{field}": value for field, value in schedule.items()}}
+    )
+    return result.modified_count
+
+
+def find_ticket_view_by_barcode(db, barcode_data: str) -> Optional[Dict[str, Any]]:
+    """
+    Ticket view chứa vé có barcode này (index tickets.barcode_data)
+
+    Booking cũ chưa có view được dựng lại một lần rồi ghi vào ticket_views
+    """
+    view = db.ticket_views.find_one({"tickets.barcode_data": barcode_data})
+    if view:
+        return view
+
+    ticket = db.tickets.find_one({"barcode_data": barcode_data}, {"booking_id": 1})
+    booking = db.bookings.find_one({"_id": ticket["booking_id"]}) if ticket else None
+    if not booking:
+        booking = db.bookings.find_one({"barcode_data": barcode_data})
+    if not booking:
+        return None
+    return rebuild_ticket_view(db, booking)
+
+
+def write_ticket_view(db, view: Dict[str, Any], session=None):
+    """Ghi (hoặc ghi đè) ticket view của booking"""
+    db.ticket_views.replace_one({"_id": view["_id"]}, view, upsert=True, session=session)
+
+
+def mark_ticket_views_cancelled(db, booking_ids: List[str], reason: Optional[str] = None):
+    """Booking bị hủy: hủy booking và các vé còn hiệu lực trong view, một update_many"""
+    if not booking_ids:
+        return
+    # Booking đã thanh toán còn vé chờ check-in thì giảm counters của dashboard
+    paid_views = list(db.ticket_views.find(
+        {"_id": {"$in": list(booking_ids)}, "status": "paid"},
+        {"customer_id": 1, "showtime_id": 1, "status": 1, "booking_info": 1, "tickets.status": 1}
+    ))
+    now = datetime.now(timezone.utc)
+    update = {"status": "cancelled", "updated_at": now, "tickets.$[t].status": "cancelled"}
+    if reason:
+        update["cancel_reason"] = reason
+    db.ticket_views.update_many(
+        {"_id": {"$in": list(booking_ids)}},
+        {"$set": update},
+        array_filters=[{"t.status": "valid"}]
+    )
+    record_cancelled_tickets(db, paid_views)
+
+
+def mark_ticket_views_checked_in(db, ticket_ids: List[str], checked_in_at: datetime, checked_in_by: str,
+                                 gate: Optional[str] = None, scanned_at: Optional[Dict[str, datetime]] = None):
+    """
+    Vé đã check-in: cập nhật các vé tương ứng trong view, một bulk_write
+    (mỗi thời điểm check-in một UpdateMany, check-in online chỉ có một lệnh)
+
+    Args:
+        checked_in_at: Thời điểm check-in của các vé không có trong scanned_at
+        gate: Cổng/thiết bị quét (metrics), mặc định là nhân viên check-in
+        scanned_at: ticket_id -> thời điểm quét thực tế (upload offline), ghi vào view giống tickets
+    """
+    if not ticket_ids:
+        return
+    ticket_ids = [str(ticket_id) for ticket_id in ticket_ids]
+    scanned_at = {str(ticket_id): value for ticket_id, value in (scanned_at or {}).items()}
+    ticket_times = {ticket_id: scanned_at.get(ticket_id, checked_in_at) for ticket_id in ticket_ids}
+    views = list(db.ticket_views.find(
+        {"tickets.ticket_id": {"$in": ticket_ids}},
+        {"customer_id": 1, "showtime_id": 1, "status": 1, "booking_info": 1,
+         "tickets.ticket_id": 1, "tickets.status": 1}
+    ))
+
+    ids_by_time = {}
+    for ticket_id, ticket_time in ticket_times.items():
+        ids_by_time.setdefault(ticket_time, []).append(ticket_id)
+    updated_at = datetime.now(timezone.utc)
+    db.ticket_views.bulk_write([
+        UpdateMany(
+            {"tickets.ticket_id": {"$in": ids}},
+            {"$set": {
+                "tickets.$[t].status": "checked_in",
+                "tickets.$[t].checked_in_at": ticket_time,
+                "tickets.$[t].checked_in_by": checked_in_by,
+                "updated_at": updated_at
+            }},
+            array_filters=[{"t.ticket_id": {"$in": ids}}]
+        )
+        for ticket_time, ids in ids_by_time.items()
+    ], ordered=False)
+    record_checkins(db, views, ticket_ids)
+    record_gate_scans(db, views, ticket_times, gate or checked_in_by)
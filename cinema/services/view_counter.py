@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+View Counter for Cinema Management System
+Buffers movie detail views in memory and flushes aggregated $inc updates in bulk
+"""
+
+import threading
+from typing import Dict, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+# Chu kỳ ghi lượt xem xuống db.movies
+VIEW_FLUSH_SECONDS = 5
+
+# Số phim tối đa giữ trong buffer (database mất kết nối lâu), phim mới vượt quá thì bỏ lượt xem
+VIEW_BUFFER_MAX_MOVIES = 10000
+
+
+class ViewCounterBuffer:
+    def __init__(self, db_connection, field: str = "views", max_movies: int = VIEW_BUFFER_MAX_MOVIES):
+        self.db = db_connection
+        self.field = field
+        self.max_movies = max_movies
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _add(self, movie_id, count: int):
+        """Gọi khi đang giữ lock"""
+        if movie_id not in self._counts and len(self._counts) >= self.max_movies:
+            self.dropped += count
+            return
+        self._counts[movie_id] = self._counts.get(movie_id, 0) + count
+
+    def record(self, movie_id, count: int = 1):
+        """Cộng lượt xem trong bộ nhớ, không ghi db"""
+        with self._lock:
+            self._add(movie_id, count)
+
+    def _requeue(self, counts: Dict[str, int]):
+        with self._lock:
+            for movie_id, count in counts.items():
+                self._add(movie_id, count)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._counts.values())
+
+    def flush(self) -> int:
+        """
+        Ghi các lượt xem đã gom bằng một bulk_write ($inc mỗi phim một lệnh)
+
+        Returns:
+            int: Số phim được cập nhật
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return 0
+
+        items = list(counts.items())
+        try:
+            self.db.movies.bulk_write([
+                UpdateOne({"_id": movie_id}, {"$inc": {self.field: count}})
+                for movie_id, count in items
+            ], ordered=False)
+        except BulkWriteError as e:
+            # ordered=False: các lệnh khác đã ghi, chỉ trả lại buffer các lệnh lỗi
+            failed = {items[error["index"]][0]: items[error["index"]][1]
+                      for error in e.details.get("writeErrors", [])}
+            print(f"❌ Flush movie views: {len(failed)}/{len(items)} updates failed")
+            self._requeue(failed)
+            return len(items) - len(failed)
+        except PyMongoError as e:
+            # Không ghi được gì (mất kết nối, timeout): trả toàn bộ lượt xem lại buffer
+            print(f"❌ Flush movie views error: {e}")
+            self._requeue(counts)
+            return 0
+        return len(items)
+
+
+# Global view counter instance
+view_counter = None
+
+def init_view_counter(db_connection):
+    """Initialize the global view counter"""
+    global view_counter
+    view_counter = ViewCounterBuffer(db_connection)
+    return view_counter
+
+def get_view_counter() -> Optional[ViewCounterBuffer]:
+    """Get the global view counter instance"""
+    return view_counter
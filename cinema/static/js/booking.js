@@ -360,8 +360,88 @@ document.addEventListener('DOMContentLoaded', function() {
   document.getElementById('back-btn').onclick = function() {
     window.location.href = `/movie/${movieId}`;
   };
+
+  // Nhận thay đổi trạng thái ghế realtime thay vì poll lại toàn bộ sơ đồ
+  subscribeSeatEvents();
 });
 
+// Server-sent events: mỗi event chỉ chứa danh sách ghế và trạng thái mới
+let seatEventSource = null;
+
+function subscribeSeatEvents() {
+  if (!showtimeId || !window.EventSource) {
+    return;
+  }
+
+  seatEventSource = new EventSource(`/api/showtime/${showtimeId}/seat-events`);
+  seatEventSource.onmessage = function(e) {
+    let event;
+    try {
+      event = JSON.parse(e.data);
+    } catch (err) {
+      return;
+    }
+
+    if (event.type === 'refresh') {
+      reloadSeatStatuses();
+    } else if (event.type === 'seats') {
+      applySeatDelta(event.seats || [], event.status);
+    }
+  };
+
+  window.addEventListener('beforeunload', function() {
+    if (seatEventSource) {
+      seatEventSource.close();
+    }
+  });
+}
+
+// Cập nhật một số ghế theo delta, bỏ chọn ghế vừa bị người khác giữ/đặt
+function applySeatDelta(seatCodes, status) {
+  let changed = false;
+  seatCodes.forEach(seatCode => {
+    const seat = seatMap[seatCode];
+    if (!seat || seat.status === status) {
+      return;
+    }
+    seat.status = status;
+    if (status !== 'available' && selectedSeats.has(seatCode)) {
+      selectedSeats.delete(seatCode);
+    }
+    changed = true;
+  });
+
+  if (changed) {
+    renderSeatMap();
+    updateBookingInfo();
+  }
+}
+
+// Tải lại trạng thái ghế nhưng giữ các ghế đang chọn nếu vẫn còn trống
+function reloadSeatStatuses() {
+  return fetch(`/api/showtime/${showtimeId}/seats`)
+    .then(res => res.json())
+    .then(data => {
+      seatList = data.seats;
+      basePrice = data.base_price;
+      seatMap = {};
+      seatList.forEach(seat => {
+        seatMap[seat.seat_code] = seat;
+      });
+      selectedSeats.forEach(seatCode => {
+        const seat = seatMap[seatCode];
+        if (!seat || seat.status !== 'available') {
+          selectedSeats.delete(seatCode);
+        }
+      });
+      renderSeatMap();
+      updateBookingInfo();
+    })
+    .catch(error => {
+      console.error('❌ Reload seats error:', error);
+    });
+}
+
 // Enhanced auto-cleanup when returning from payment
 function checkForCancelledBooking() {
   console.log('🔄 Checking for cancelled booking and cleaning up...');
@@ -596,6 +596,24 @@ async function goBackToBooking() {
     }
 }
 
+// Idempotency key: giữ nguyên khi retry cùng một thanh toán để server không tạo booking trùng
+function getPaymentIdempotencyKey(paymentData) {
+    const fingerprint = JSON.stringify(paymentData);
+    try {
+        const saved = JSON.parse(localStorage.getItem('paymentIdempotencyKey') || 'null');
+        if (saved && saved.fingerprint === fingerprint) {
+            return saved.key;
+        }
+    } catch (e) {
+        // Dữ liệu cũ không hợp lệ, tạo key mới
+    }
+    const key = (window.crypto && crypto.randomUUID)
+        ? crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem('paymentIdempotencyKey', JSON.stringify({ key, fingerprint }));
+    return key;
+}
+
 // Process payment
 function processPayment() {
     console.log('💳 Processing payment...');
@@ -625,13 +643,15 @@ function processPayment() {
     };
     
     console.log('📤 Sending payment data:', paymentData);
+    const idempotencyKey = getPaymentIdempotencyKey(paymentData);
 
     // Call payment API
     fetch('/api/payment', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
-            'Authorization': `Bearer ${token}`
+            'Authorization': `Bearer ${token}`,
+            'Idempotency-Key': idempotencyKey
         },
         body: JSON.stringify(paymentData)
     })
@@ -649,6 +669,7 @@ function processPayment() {
             // Clear booking data from localStorage
             localStorage.removeItem('paymentBookingData');
             localStorage.removeItem('seatLockSession');
+            localStorage.removeItem('paymentIdempotencyKey');
             
             // Store payment info for reference
             localStorage.setItem('lastPayment', JSON.stringify({
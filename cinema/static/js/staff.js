@@ -436,6 +436,13 @@ class StaffCheckinManager {
         document.getElementById('qr-scanner-container').style.display = 'none';
         document.getElementById('scanning-loading').style.display = 'block';
         
+        // Barcode đã ký (T1): check-in ngay bằng scan-ticket, server không cần đọc db khi vé hợp lệ
+        if (this.isSignedTicket(barcodeData)) {
+            await this.scanSignedTicket(barcodeData);
+            document.getElementById('scanning-loading').style.display = 'none';
+            return;
+        }
+        
         try {
             // Validate and get ticket info
             const ticketInfo = await this.validateTicket(barcodeData);
@@ -464,6 +471,46 @@ class StaffCheckinManager {
         document.getElementById('scanning-loading').style.display = 'none';
     }
 
+    isSignedTicket(barcodeData) {
+        return typeof barcodeData === 'string' && barcodeData.startsWith('T1.');
+    }
+
+    async scanSignedTicket(barcodeData) {
+        await this.ensureValidToken();
+        
+        try {
+            const response = await fetch('/api/staff/scan-ticket', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${this.staffToken}`
+                },
+                body: JSON.stringify({ barcode_data: barcodeData })
+            });
+            const result = await response.json();
+            
+            if (response.ok && result.success) {
+                // Vé đã check-in xong, không còn bước chọn ghế
+                this.currentBookingData = null;
+                document.getElementById('ticket-info').innerHTML = `
+                    <strong>Ghế ${result.seat_code || 'N/A'}</strong>
+                    <span class="badge ${this.getStatusBadgeClass('checked_in')} ms-2">${this.getStatusText('checked_in')}</span>
+                `;
+                document.getElementById('confirm-checkin').style.display = 'none';
+                document.getElementById('scan-result').style.display = 'block';
+                document.getElementById('scan-error').style.display = 'none';
+                
+                this.showSuccessToast(`Check-in thành công ghế ${result.seat_code || ''}!`);
+                this.updateDashboardStats();
+            } else {
+                this.showError(result.error || 'Check-in thất bại');
+            }
+        } catch (error) {
+            console.error('❌ Scan ticket error:', error);
+            this.showError('Lỗi hệ thống khi check-in: ' + error.message);
+        }
+    }
+
     async validateTicket(barcodeData) {
         console.log('🎫 Validating ticket:', barcodeData);
         console.log('🎫 BarcodeData type:', typeof barcodeData);
@@ -577,6 +624,7 @@ class StaffCheckinManager {
         `;
 
         document.getElementById('ticket-info').innerHTML = ticketInfoHtml;
+        document.getElementById('confirm-checkin').style.display = '';
         document.getElementById('scan-result').style.display = 'block';
         
         // Lưu booking data để sử dụng khi check-in
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module import theo dạng `services.xxx` (chạy từ thư mục cinema)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from services.booking_service import find_seat_conflicts
+
+SEATS = [{"_id": "s1", "seat_code": "A1"}, {"_id": "s2", "seat_code": "A2"}]
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().cinema
+
+
+def test_booking_by_another_customer_is_a_conflict(db):
+    db.bookings.insert_one({"_id": "bk1", "showtime_id": "st1", "customer_id": "cus2",
+                            "status": "pending", "seats": ["s1"]})
+    assert find_seat_conflicts(db, "st1", SEATS, "cus1") == ["A1"]
+
+
+def test_own_pending_booking_is_not_a_conflict(db):
+    db.bookings.insert_one({"_id": "bk1", "showtime_id": "st1", "customer_id": "cus1",
+                            "status": "pending", "seats": ["s1"]})
+    assert find_seat_conflicts(db, "st1", SEATS, "cus1") == []
+
+
+def test_foreign_lock_is_a_conflict_unless_locks_are_skipped(db):
+    db.lockedSeats.insert_one({"showtime_id": "st1", "seat_code": "A2", "user_id": "cus2",
+                               "expires_at": datetime.now(timezone.utc) + timedelta(minutes=5)})
+    assert find_seat_conflicts(db, "st1", SEATS, "cus1") == ["A2"]
+    assert find_seat_conflicts(db, "st1", SEATS, "cus1", check_locks=False) == []
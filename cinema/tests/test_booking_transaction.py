@@ -0,0 +1,199 @@
+import copy
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from services import booking_service
+from services.booking_service import commit_paid_booking, BookingConflictError
+
+SHOWTIME = {"_id": "st1", "movie_id": "mv1", "cinema_name": "Galaxy", "hall_id": "h1",
+            "date": "2099-01-01", "time": "19:00", "base_price": 90000}
+SEATS = [{"_id": "s1", "seat_code": "A1", "seat_type": "NORMAL"},
+         {"_id": "s2", "seat_code": "A2", "seat_type": "VIP"}]
+COLLECTIONS = ("bookings", "tickets", "ticket_views", "payments", "seatlocks", "lockedSeats")
+
+
+class TransientCommitError(PyMongoError):
+    def __init__(self):
+        super().__init__("commit aborted", error_labels=["TransientTransactionError"])
+
+
+class ReplicaSetSession:
+    """
+    Session giả lập transaction trên mongomock: snapshot các collection khi bắt đầu,
+    abort thì khôi phục, TransientTransactionError thì chạy lại callback như with_transaction
+    """
+
+    def __init__(self, db, transient_failures=0):
+        self.db = db
+        self.transient_failures = transient_failures
+        self.attempts = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _snapshot(self):
+        return {name: copy.deepcopy(list(self.db[name].find())) for name in COLLECTIONS}
+
+    def _restore(self, snapshot):
+        for name, docs in snapshot.items():
+            self.db[name].delete_many({})
+            if docs:
+                self.db[name].insert_many(docs)
+
+    def with_transaction(self, callback):
+        while True:
+            self.attempts += 1
+            snapshot = self._snapshot()
+            try:
+                result = callback(self)
+                if self.transient_failures:
+                    self.transient_failures -= 1
+                    raise TransientCommitError()
+                return result
+            except PyMongoError as e:
+                self._restore(snapshot)
+                if e.has_error_label("TransientTransactionError"):
+                    continue
+                raise
+            except Exception:
+                self._restore(snapshot)
+                raise
+
+
+class SessionCheckedCollection:
+    """Ghi lại session của mọi lệnh, lỗi giả lập theo (collection, method)"""
+
+    def __init__(self, collection, calls, failures):
+        self._collection = collection
+        self._calls = calls
+        self._failures = failures
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+        if not callable(method):
+            return method
+
+        def call(*args, session=None, **kwargs):
+            self._calls.append((self._collection.name, name, session))
+            if (self._collection.name, name) in self._failures:
+                raise OperationFailure(f"{self._collection.name}.{name} unavailable")
+            return method(*args, **kwargs)
+        return call
+
+
+class FakeClient:
+    def __init__(self, db, replica_set=True, transient_failures=0):
+        self._db = db
+        self.replica_set = replica_set
+        self.transient_failures = transient_failures
+        self.sessions = []
+
+    @property
+    def admin(self):
+        client = self
+
+        class Admin:
+            def command(self, name):
+                return {"setName": "rs0"} if client.replica_set else {"ismaster": True}
+        return Admin()
+
+    def start_session(self):
+        session = ReplicaSetSession(self._db, self.transient_failures)
+        self.sessions.append(session)
+        return session
+
+
+class FakeDb:
+    def __init__(self, replica_set=True, transient_failures=0):
+        self.raw = mongomock.MongoClient().cinema
+        self.client = FakeClient(self.raw, replica_set, transient_failures)
+        self.calls = []
+        self.failures = set()
+
+    def __getattr__(self, name):
+        return SessionCheckedCollection(self.raw[name], self.calls, self.failures)
+
+
+@pytest.fixture(autouse=True)
+def fresh_transaction_support(monkeypatch):
+    monkeypatch.setattr(booking_service, "_transaction_support", {})
+
+
+def _seat_lock(db):
+    db.raw.seatlocks.insert_one({"_id": "lk1", "session_id": "sess1", "status": "active"})
+    db.raw.lockedSeats.insert_many([
+        {"showtime_id": "st1", "seat_code": code, "user_id": "cus1", "session_id": "sess1",
+         "expires_at": datetime.now(timezone.utc) + timedelta(minutes=5)}
+        for code in ("A1", "A2")
+    ])
+    return {"_id": "lk1", "session_id": "sess1"}
+
+
+def test_commit_runs_in_one_transaction_and_retries_transient_errors():
+    db = FakeDb(transient_failures=1)
+    seat_lock = _seat_lock(db)
+
+    result = commit_paid_booking(db, SHOWTIME, "st1", SEATS, "cus1", "card", seat_lock=seat_lock)
+
+    session = db.client.sessions[0]
+    assert session.attempts == 2
+    # Lần chạy đầu bị rollback, chỉ còn kết quả của lần retry
+    assert db.raw.bookings.count_documents({}) == 1
+    assert db.raw.bookings.find_one()["_id"] == result["booking"]["_id"]
+    assert db.raw.tickets.count_documents({"booking_id": result["booking"]["_id"]}) == 2
+    assert db.raw.payments.count_documents({}) == 1
+    assert db.raw.payments.find_one()["amount"] == 90000 + 120000
+    assert db.raw.ticket_views.find_one({"_id": result["booking"]["_id"]})["status"] == "paid"
+    assert db.raw.seatlocks.find_one({"_id": "lk1"})["status"] == "completed"
+    assert db.raw.lockedSeats.count_documents({}) == 0
+    assert db.calls and all(call_session is session for _, _, call_session in db.calls)
+
+
+def test_conflict_rolls_back_and_keeps_the_seat_lock():
+    db = FakeDb()
+    seat_lock = _seat_lock(db)
+    db.raw.bookings.insert_one({"_id": "bk0", "showtime_id": "st1", "customer_id": "cus2",
+                                "status": "paid", "seats": ["s2"]})
+
+    with pytest.raises(BookingConflictError) as excinfo:
+        commit_paid_booking(db, SHOWTIME, "st1", SEATS, "cus1", "card", seat_lock=seat_lock)
+
+    assert excinfo.value.seat_codes == ["A2"]
+    assert [b["_id"] for b in db.raw.bookings.find()] == ["bk0"]
+    assert db.raw.tickets.count_documents({}) == 0
+    assert db.raw.payments.count_documents({}) == 0
+    assert db.raw.seatlocks.find_one({"_id": "lk1"})["status"] == "active"
+    assert db.raw.lockedSeats.count_documents({}) == 2
+
+
+def test_failure_after_writes_rolls_back_the_whole_pipeline():
+    db = FakeDb()
+    seat_lock = _seat_lock(db)
+    db.failures.add(("payments", "insert_one"))
+
+    with pytest.raises(OperationFailure):
+        commit_paid_booking(db, SHOWTIME, "st1", SEATS, "cus1", "card", seat_lock=seat_lock)
+
+    assert db.raw.bookings.count_documents({}) == 0
+    assert db.raw.tickets.count_documents({}) == 0
+    assert db.raw.ticket_views.count_documents({}) == 0
+    assert db.raw.lockedSeats.count_documents({}) == 2
+
+
+def test_standalone_server_runs_without_a_session():
+    db = FakeDb(replica_set=False)
+
+    result = commit_paid_booking(db, SHOWTIME, "st1", SEATS, "cus1", "card")
+
+    assert db.client.sessions == []
+    assert db.raw.bookings.find_one({"_id": result["booking"]["_id"]})["status"] == "paid"
+    assert db.raw.payments.count_documents({}) == 1
+    assert all(call_session is None for _, _, call_session in db.calls)
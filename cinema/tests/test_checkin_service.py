@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from services.checkin_service import build_checkin_manifest, verify_payload
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().cinema
+
+
+def test_manifest_includes_seeded_and_manager_showtimes(db):
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).strftime("%Y-%m-%d")
+    db.showtimes.insert_many([
+        {"_id": "st1", "cinema_name": "Galaxy", "hall_name": "Phòng 1", "date": tomorrow, "time": "08:00"},
+        {"_id": "st2", "cinema_id": "Galaxy", "hall_id": "h2", "start_date": today, "start_time": "21:00"},
+        {"_id": "st3", "cinema_id": "Other", "start_date": today, "start_time": "21:00"},
+        {"_id": "st4", "cinema_id": "Galaxy", "start_date": "2000-01-01", "start_time": "21:00"}
+    ])
+    db.ticket_views.insert_one({
+        "_id": "bk1", "showtime_id": "st2", "status": "paid", "booking_info": {"movie_title": "Dune"},
+        "tickets": [{"ticket_id": "tk1", "barcode_data": "bc1", "seat_code": "A1", "status": "valid"}]
+    })
+
+    result = build_checkin_manifest(db, "Galaxy")
+    manifest = result["manifest"]
+
+    assert [st["showtime_id"] for st in manifest["showtimes"]] == ["st2", "st1"]
+    assert manifest["showtimes"][0] == {"showtime_id": "st2", "movie_title": "Dune", "hall": "h2",
+                                        "date": today, "time": "21:00"}
+    assert manifest["tickets"] == [["bc1", "tk1", 0, "A1", "valid"]]
+    assert verify_payload(manifest, result["signature"])
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from services import dashboard_counters
+from services.dashboard_counters import get_dashboard_stats, record_paid_booking
+from services.ticket_view_service import build_ticket_view
+
+NOW = datetime(2026, 10, 18, 19, 0)
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().cinema
+
+
+@pytest.fixture
+def seed_calls(monkeypatch):
+    calls = []
+    seed_day = dashboard_counters.seed_day
+
+    def counting_seed_day(db, day):
+        calls.append(day)
+        return seed_day(db, day)
+
+    monkeypatch.setattr(dashboard_counters, "seed_day", counting_seed_day)
+    return calls
+
+
+def test_day_without_showtimes_is_seeded_once(db, seed_calls):
+    for _ in range(3):
+        stats = get_dashboard_stats(db, now=NOW)
+    assert stats == {"today_checkins": 0, "current_shows": 0, "waiting_customers": 0}
+    assert seed_calls == ["2026-10-18"]
+
+
+def test_unknown_cinema_is_seeded_once(db, seed_calls):
+    for _ in range(3):
+        get_dashboard_stats(db, cinema="Nowhere", now=NOW)
+    assert seed_calls == ["2026-10-18"]
+
+
+def test_paid_booking_after_seed_is_counted_without_reseeding(db, seed_calls):
+    db.showtimes.insert_one({"_id": "st1", "cinema": "Storia", "date": "2026-10-18", "time": "19:30"})
+    assert get_dashboard_stats(db, cinema="Storia", now=NOW)["current_shows"] == 1
+
+    record_paid_booking(db, {
+        "showtime_id": "st1", "customer_id": "cus1",
+        "booking_info": {"cinema": "Storia", "date": "2026-10-18", "time": "19:30"},
+        "tickets": [{"status": "valid"}, {"status": "valid"}]
+    })
+    stats = get_dashboard_stats(db, cinema="Storia", now=NOW)
+    assert stats["waiting_customers"] == 1
+    assert seed_calls == ["2026-10-18"]
+
+
+def test_manager_showtime_counts_on_its_real_day_and_cinema(db, seed_calls):
+    db.showtimes.insert_one({"_id": "st2", "cinema_id": "c2", "hall_id": "h1", "status": "active",
+                             "start_date": "2026-10-18", "start_time": "19:15"})
+    get_dashboard_stats(db, now=NOW)
+
+    view = build_ticket_view({"_id": "bk1", "customer_id": "cus1", "showtime_id": "st2"},
+                             [{"_id": "tk1", "seat_id": "s1", "status": "valid"}], [],
+                             db.showtimes.find_one({"_id": "st2"}), None)
+    record_paid_booking(db, view)
+
+    assert db.dashboardCounters.find_one({"_id": "2026-10-18:c2"})["showtimes"]["st2"]["waiting"] == {"cus1": 1}
+    assert db.dashboardCounters.count_documents({"day": "2024-01-01"}) == 0
+    assert get_dashboard_stats(db, cinema="c2", now=NOW)["waiting_customers"] == 1
+    assert get_dashboard_stats(db, now=NOW)["waiting_customers"] == 1
+    assert seed_calls == ["2026-10-18"]
+
+
+def test_all_cinemas_stats_read_only_the_day_aggregate(db):
+    db.showtimes.insert_many([
+        {"_id": "st1", "cinema_name": "Storia", "date": "2026-10-18", "time": "19:30"},
+        {"_id": "st2", "cinema_name": "Galaxy", "date": "2026-10-18", "time": "18:30"}
+    ])
+    assert get_dashboard_stats(db, now=NOW)["current_shows"] == 2
+
+    finds = []
+    find = db.dashboardCounters.find
+
+    def recording_find(query, *args, **kwargs):
+        finds.append(query)
+        return find(query, *args, **kwargs)
+
+    db.dashboardCounters.find = recording_find
+    get_dashboard_stats(db, now=NOW)
+    assert finds == [{"_id": {"$in": ["2026-10-18:*all", "2026-10-18:*seeded"]}}]
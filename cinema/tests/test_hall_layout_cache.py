@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("bson")
+
+from services.hall_layout_cache import HallLayout
+
+
+def make_layout():
+    return HallLayout("hall1", [
+        {"_id": "s1", "seat_code": "A1"},
+        {"_id": "s2", "seat_code": "A2"},
+        {"_id": "s3", "seat_code": "B1", "seat_type": "VIP"},
+    ])
+
+
+def test_seats_for_codes_removes_repeated_and_mixed_case_codes():
+    seats = make_layout().seats_for_codes(["A1", "a1", " A1 ", "b1"])
+    assert [seat["_id"] for seat in seats] == ["s1", "s3"]
+
+
+def test_seats_for_codes_skips_unknown_codes():
+    seats = make_layout().seats_for_codes(["Z9", "A2"])
+    assert [seat["_id"] for seat in seats] == ["s2"]
+
+
+def test_seats_for_ids_removes_repeated_ids():
+    seats = make_layout().seats_for_ids(["s2", "s2", "s1"])
+    assert [seat["_id"] for seat in seats] == ["s2", "s1"]
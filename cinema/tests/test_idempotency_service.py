@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from services.idempotency_service import IdempotencyStore
+
+
+@pytest.fixture
+def store():
+    return IdempotencyStore(mongomock.MongoClient().cinema)
+
+
+def expire_lease(store, key_id):
+    store.collection.update_one(
+        {"_id": key_id},
+        {"$set": {"lease_until": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+
+def test_retry_during_lease_sees_in_progress(store):
+    assert store.begin("cus1:payment:k1", "hash", "lease-a") is None
+    existing = store.begin("cus1:payment:k1", "hash", "lease-b")
+    assert existing["status"] == "in_progress"
+    assert existing["lease_id"] == "lease-a"
+
+
+def test_retry_takes_over_stale_in_progress_record(store):
+    store.begin("cus1:payment:k1", "hash", "lease-a")
+    expire_lease(store, "cus1:payment:k1")
+
+    assert store.begin("cus1:payment:k1", "hash", "lease-b") is None
+    assert store.collection.find_one({"_id": "cus1:payment:k1"})["lease_id"] == "lease-b"
+
+    # Worker cũ xong muộn không ghi đè kết quả của lần xử lý mới
+    store.complete("cus1:payment:k1", "lease-a", 200, '{"old": true}')
+    store.complete("cus1:payment:k1", "lease-b", 201, '{"new": true}')
+    record = store.collection.find_one({"_id": "cus1:payment:k1"})
+    assert record["status_code"] == 201
+
+
+def test_stale_record_is_not_taken_over_by_a_different_request(store):
+    store.begin("cus1:payment:k1", "hash", "lease-a")
+    expire_lease(store, "cus1:payment:k1")
+
+    existing = store.begin("cus1:payment:k1", "other-hash", "lease-b")
+    assert existing["request_hash"] == "hash"
+
+
+def test_completed_record_is_replayed_not_taken_over(store):
+    store.begin("cus1:payment:k1", "hash", "lease-a")
+    store.complete("cus1:payment:k1", "lease-a", 201, "{}")
+    expire_lease(store, "cus1:payment:k1")
+
+    existing = store.begin("cus1:payment:k1", "hash", "lease-b")
+    assert existing["status"] == "completed"
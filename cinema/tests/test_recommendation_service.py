@@ -0,0 +1,21 @@
+from services.recommendation_service import _showtime_entry, _showtime_slot, time_slot
+
+SEEDED = {"_id": "st1", "movie_id": "mv1", "cinema_name": "Galaxy", "cinema_id": "c1",
+          "hall_name": "Phòng 1", "hall_id": "h1", "date": "2026-10-19", "time": "19:00"}
+MANAGER = {"_id": "st2", "movie_id": "mv1", "cinema_id": "c2", "hall_id": "h2",
+           "start_date": "2026-10-19", "start_time": "09:00"}
+
+
+def test_showtime_entry_uses_real_schedule_fields():
+    movies = {"mv1": {"title": "Dune"}}
+    seeded = _showtime_entry(SEEDED, movies, 1.0)
+    manager = _showtime_entry(MANAGER, movies, 1.0)
+    assert (seeded["cinema"], seeded["hall"], seeded["date"], seeded["time"]) == ("Galaxy", "Phòng 1", "2026-10-19", "19:00")
+    assert (manager["cinema"], manager["hall"], manager["date"], manager["time"]) == ("c2", "h2", "2026-10-19", "09:00")
+
+
+def test_showtime_slot_matches_ticket_view_slot():
+    # booking_info của view dựng từ cùng showtime: cinema = cinema_name, time = time
+    view_info = {"cinema": "Galaxy", "time": "19:00"}
+    assert _showtime_slot(SEEDED) == (view_info["cinema"], time_slot(view_info["time"])) == ("Galaxy", "evening")
+    assert _showtime_slot(MANAGER) == ("c2", "morning")
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("bson")
+
+from services.hall_layout_cache import HallLayout
+from services.seat_occupancy import SeatOccupancyStore, ShowtimeOccupancy
+
+LAYOUT = HallLayout("h1", [{"_id": f"s{i}", "seat_code": code} for i, code in enumerate(["A1", "A2", "A3"])])
+
+
+class RecordingBroker:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, showtime_id, event):
+        self.events.append(event)
+
+
+def _store(state):
+    broker = RecordingBroker()
+    store = SeatOccupancyStore(None, None, event_broker=broker)
+    loads = []
+
+    def load(showtime_id):
+        loads.append(showtime_id)
+        return ShowtimeOccupancy.from_state({"_id": showtime_id, "hall_id": "h1", **state}, LAYOUT)
+    store.get = load
+    return store, broker, loads
+
+
+def test_uncached_release_publishes_only_seats_that_are_free_in_db():
+    # A2 đã được booking khác giữ sau khi lock hết hạn
+    store, broker, loads = _store({"active_bookings": [{"status": "pending", "seats": ["s1"]}]})
+    store.release("st1", ["A1", "A2"])
+    assert loads == ["st1"]
+    assert broker.events == [{"type": "seats", "showtime_id": "st1", "seats": ["A1"], "status": "available"}]
+
+
+def test_uncached_release_of_taken_seats_publishes_nothing():
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    store, broker, _ = _store({"active_locks": [{"seat_code": "A3", "user_id": "cus2", "expires_at": expires_at}],
+                               "active_bookings": [{"status": "paid", "seats": ["s0"]}]})
+    store.release("st1", ["A1", "A3"])
+    assert broker.events == []
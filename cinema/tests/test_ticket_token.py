@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("jwt")
+
+from services.ticket_token import showtime_expiry, TICKET_TOKEN_GRACE_HOURS
+
+
+def _expected(day, time):
+    starts_at = datetime.strptime(f"{day} {time}", "%Y-%m-%d %H:%M")
+    return int((starts_at + timedelta(hours=TICKET_TOKEN_GRACE_HOURS)).timestamp())
+
+
+def test_expiry_follows_seeded_showtime():
+    assert showtime_expiry({"date": "2026-10-18", "time": "19:30"}) == _expected("2026-10-18", "19:30")
+
+
+def test_expiry_follows_manager_showtime():
+    showtime = {"start_date": "2026-10-19", "start_time": "09:15", "end_date": "2026-10-25"}
+    assert showtime_expiry(showtime) == _expected("2026-10-19", "09:15")
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from services.ticket_view_service import build_ticket_view, refresh_ticket_view_schedules, repair_customer_ticket_views
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().cinema
+    db.showtimes.insert_one({"_id": "st1", "movie_id": "mv1", "cinema": "Storia", "hall": "Hall 1",
+                             "date": "2026-10-18", "time": "19:30"})
+    db.movies.insert_one({"_id": "mv1", "title": "Dune"})
+    db.seats.insert_one({"_id": "s1", "seat_code": "A1"})
+    return db
+
+
+def _paid_booking(db, booking_id, customer_id="cus1"):
+    db.bookings.insert_one({"_id": booking_id, "customer_id": customer_id, "showtime_id": "st1",
+                            "status": "paid", "seats": ["s1"], "created_at": datetime(2026, 10, 1)})
+    db.tickets.insert_one({"_id": f"tk-{booking_id}", "booking_id": booking_id, "seat_id": "s1",
+                           "status": "valid", "barcode_data": f"bc-{booking_id}"})
+
+
+def test_booking_without_view_is_rebuilt(db):
+    _paid_booking(db, "bk1")
+    assert repair_customer_ticket_views(db, "cus1") == 1
+    view = db.ticket_views.find_one({"_id": "bk1"})
+    assert view["customer_id"] == "cus1"
+    assert view["booking_info"]["movie_title"] == "Dune"
+    assert [t["seat_code"] for t in view["tickets"]] == ["A1"]
+
+
+def test_existing_views_and_other_customers_are_left_alone(db):
+    _paid_booking(db, "bk1")
+    _paid_booking(db, "bk2", customer_id="cus2")
+    db.ticket_views.insert_one({"_id": "bk1", "customer_id": "cus1", "marker": "kept"})
+    assert repair_customer_ticket_views(db, "cus1") == 0
+    assert db.ticket_views.find_one({"_id": "bk1"})["marker"] == "kept"
+    assert db.ticket_views.find_one({"_id": "bk2"}) is None
+
+
+def test_view_uses_seeded_showtime_schedule_fields():
+    showtime = {"_id": "st2", "movie_id": "mv1", "cinema_name": "CGV Vincom", "cinema_id": "c1",
+                "hall_name": "Phòng 3", "hall_id": "h3", "date": "2026-10-18", "time": "20:00"}
+    view = build_ticket_view({"_id": "bk9", "customer_id": "cus1", "showtime_id": "st2"}, [], [], showtime, None)
+    info = view["booking_info"]
+    assert (info["cinema"], info["cinema_id"], info["hall"], info["hall_id"]) == ("CGV Vincom", "c1", "Phòng 3", "h3")
+    assert (info["date"], info["time"]) == ("2026-10-18", "20:00")
+
+
+def test_view_uses_manager_showtime_schedule_fields_without_placeholders():
+    showtime = {"_id": "st3", "movie_id": "mv1", "cinema_id": "c2", "hall_id": "h1",
+                "start_date": "2026-10-19", "start_time": "09:30"}
+    view = build_ticket_view({"_id": "bk9", "customer_id": "cus1", "showtime_id": "st3"}, [], [], showtime, None)
+    info = view["booking_info"]
+    assert (info["cinema"], info["hall"], info["date"], info["time"]) == ("c2", "h1", "2026-10-19", "09:30")
+
+    view = build_ticket_view({"_id": "bk9", "customer_id": "cus1", "showtime_id": "st4"}, [], [],
+                             {"_id": "st4", "movie_id": "mv1"}, None)
+    assert all(view["booking_info"][field] is None for field in ("cinema", "hall", "date", "time"))
+
+
+def test_refresh_schedules_rewrites_placeholder_views(db):
+    db.ticket_views.insert_one({"_id": "bk1", "showtime_id": "st5",
+                                "booking_info": {"cinema": "Storia Cinema", "hall": "Hall 1",
+                                                 "date": "2024-01-01", "time": "20:00", "movie_title": "Dune"}})
+    showtime = {"_id": "st5", "cinema_id": "c2", "hall_id": "h1", "start_date": "2026-10-19", "start_time": "09:30"}
+    assert refresh_ticket_view_schedules(db, showtime) == 1
+    info = db.ticket_views.find_one({"_id": "bk1"})["booking_info"]
+    assert (info["cinema"], info["hall"], info["date"], info["time"]) == ("c2", "h1", "2026-10-19", "09:30")
+    assert info["movie_title"] == "Dune"
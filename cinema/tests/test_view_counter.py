@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from services.view_counter import ViewCounterBuffer
+
+
+class FakeMovies:
+    """Collection ghi lại các lệnh bulk_write, lỗi theo kịch bản của test"""
+
+    def __init__(self):
+        self.applied = {}
+        self.error = None
+
+    def bulk_write(self, operations, ordered=True):
+        if isinstance(self.error, AutoReconnect):
+            raise self.error
+        failed = self.error or set()
+        errors = []
+        for index, operation in enumerate(operations):
+            movie_id = operation._filter["_id"]
+            if movie_id in failed:
+                errors.append({"index": index, "code": 11000, "errmsg": "write failed"})
+                continue
+            self.applied[movie_id] = self.applied.get(movie_id, 0) + operation._doc["$inc"]["views"]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": 0})
+
+
+class FakeDb:
+    def __init__(self):
+        self.movies = FakeMovies()
+
+
+@pytest.fixture
+def db():
+    return FakeDb()
+
+
+def test_flush_sends_aggregated_counts(db):
+    buffer = ViewCounterBuffer(db)
+    for movie_id in ["m1", "m1", "m2"]:
+        buffer.record(movie_id)
+    assert buffer.flush() == 2
+    assert db.movies.applied == {"m1": 2, "m2": 1}
+    assert buffer.pending() == 0
+    assert buffer.flush() == 0
+
+
+def test_connection_error_requeues_everything(db):
+    buffer = ViewCounterBuffer(db)
+    buffer.record("m1", 3)
+    db.movies.error = AutoReconnect("down")
+    assert buffer.flush() == 0
+    assert buffer.pending() == 3
+
+    db.movies.error = None
+    assert buffer.flush() == 1
+    assert db.movies.applied == {"m1": 3}
+
+
+def test_partial_bulk_failure_requeues_only_failed_movies(db):
+    buffer = ViewCounterBuffer(db)
+    buffer.record("m1", 2)
+    buffer.record("m2", 5)
+    db.movies.error = {"m2"}
+    assert buffer.flush() == 1
+    assert db.movies.applied == {"m1": 2}
+    assert buffer.pending() == 5
+
+    db.movies.error = None
+    buffer.flush()
+    # m1 không bị cộng hai lần
+    assert db.movies.applied == {"m1": 2, "m2": 5}
+
+
+def test_buffer_is_capped_while_database_is_down(db):
+    buffer = ViewCounterBuffer(db, max_movies=2)
+    db.movies.error = AutoReconnect("down")
+    for movie_id in ["m1", "m2", "m3", "m1"]:
+        buffer.record(movie_id)
+    buffer.flush()
+    buffer.record("m4")
+    assert buffer.pending() == 3
+    assert buffer.dropped == 2